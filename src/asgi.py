@@ -9,8 +9,20 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'src.settings')
 
 application = get_asgi_application()
+
+from src.storage.jobs import start_workers  # noqa: E402
+
+if settings.STORAGE_JOB_WORKERS:
+    # Фоновые задачи выполняются в потоках процесса приложения
+    start_workers()
+
+if settings.DEBUG:
+    # Как и runserver, в режиме отладки статику отдаёт сам Django
+    application = ASGIStaticFilesHandler(application)
@@ -4,10 +4,18 @@
 echo "Запуск миграций..."
 python manage.py migrate
 
+# Создаём бакет MinIO, если его ещё нет
+echo "Проверка бакета MinIO..."
+python manage.py ensure_bucket
+
 # Собираем статику
 echo "Сборка статических файлов..."
 python manage.py collectstatic --noinput
 
 # Запускаем сервер
 echo "Запуск сервера..."
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+if [ "$STORAGE_ASYNC_VIEWS" = "true" ]; then
+    uvicorn src.asgi:application --host 0.0.0.0 --port 8000
+else
+    python manage.py runserver 0.0.0.0:8000
+fi
\ No newline at end of file
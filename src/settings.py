@@ -11,9 +11,11 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv("DJANGO_SECRET_KEY", "fallback-secret-key")
 
-DEBUG = os.getenv("DJANGO_DEBUG", "False")
+DEBUG = os.getenv("DJANGO_DEBUG", "false").lower() == "true"
 
-ALLOWED_HOSTS = []
+# Без отладки Django отвечает только на перечисленные через запятую хосты
+ALLOWED_HOSTS = [host for host in os.getenv("DJANGO_ALLOWED_HOSTS", "").split(",")
+                 if host]
 
 
 # Application definition
@@ -26,6 +28,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     # local applications
     'src.users',
+    'src.storage',
     # external application
     'rest_framework',
     'django_htmx',
@@ -40,6 +43,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'src.storage.middleware.StorageMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'src.urls'
@@ -158,3 +162,118 @@ AWS_S3_ENDPOINT_URL = os.getenv("MINIO_ENDPOINT", "http://cs_minio:9000")
 AWS_STORAGE_BUCKET_NAME = "user-files"
 AWS_S3_ADDRESSING_STYLE = "path"  # Используется путь для файлов
 AWS_QUERYSTRING_AUTH = False  # Без аутентификации для URL
+
+# Клиент S3: размер пула соединений (не меньше числа потоков, работающих
+# с MinIO одновременно), режим и число повторов, таймауты в секундах
+STORAGE_S3_MAX_POOL_CONNECTIONS = int(os.getenv("STORAGE_S3_MAX_POOL_CONNECTIONS", 50))
+STORAGE_S3_RETRY_MODE = os.getenv("STORAGE_S3_RETRY_MODE", "standard")
+STORAGE_S3_MAX_ATTEMPTS = int(os.getenv("STORAGE_S3_MAX_ATTEMPTS", 5))
+STORAGE_S3_CONNECT_TIMEOUT = int(os.getenv("STORAGE_S3_CONNECT_TIMEOUT", 5))
+STORAGE_S3_READ_TIMEOUT = int(os.getenv("STORAGE_S3_READ_TIMEOUT", 60))
+STORAGE_S3_TCP_KEEPALIVE = os.getenv("STORAGE_S3_TCP_KEEPALIVE", "true").lower() == "true"
+
+# Прямая передача файлов между браузером и MinIO по подписанным ссылкам
+STORAGE_DIRECT_TRANSFER = os.getenv("STORAGE_DIRECT_TRANSFER", "false").lower() == "true"
+
+# Асинхронные views загрузки и скачивания (aiobotocore).
+# Включается при запуске под ASGI-сервером (uvicorn src.asgi:application)
+STORAGE_ASYNC_VIEWS = os.getenv("STORAGE_ASYNC_VIEWS", "false").lower() == "true"
+
+# Адрес MinIO, доступный из браузера (по умолчанию совпадает с внутренним)
+AWS_S3_PUBLIC_ENDPOINT_URL = os.getenv("MINIO_PUBLIC_ENDPOINT", AWS_S3_ENDPOINT_URL)
+STORAGE_PRESIGNED_URL_EXPIRES = 300  # seconds
+# Файлы больше порога загружаются по частям (multipart)
+STORAGE_MULTIPART_THRESHOLD = 64 * 1024 * 1024
+STORAGE_MULTIPART_PART_SIZE = 16 * 1024 * 1024
+# Загрузка файла в MinIO по частям прямо во время приёма запроса
+FILE_UPLOAD_HANDLERS = [
+    "src.storage.upload_handlers.S3MultipartUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+# Пакетная загрузка (несколько файлов или папка одним запросом):
+# файлов в одном запросе и количество одновременных загрузок в MinIO
+STORAGE_BATCH_UPLOAD_MAX_FILES = 100
+STORAGE_BATCH_UPLOAD_CONCURRENCY = 8
+DATA_UPLOAD_MAX_NUMBER_FILES = STORAGE_BATCH_UPLOAD_MAX_FILES
+# Количество записей на одной странице списка файлов
+STORAGE_LIST_PAGE_SIZE = 100
+
+# Удаление папок: ключей в одном запросе DeleteObjects (максимум S3 - 1000)
+# и количество одновременных запросов
+STORAGE_DELETE_BATCH_SIZE = 1000
+STORAGE_DELETE_CONCURRENCY = 8
+
+# Параметры передачи файлов (boto3 TransferConfig) по операциям:
+# upload - загрузка принятых файлов в MinIO,
+# copy - копирование при переносе и переименовании папок
+# (объекты больше порога копируются частями через upload_part_copy)
+STORAGE_TRANSFER_CONFIG = {
+    "upload": {
+        "multipart_threshold": STORAGE_MULTIPART_THRESHOLD,
+        "multipart_chunksize": STORAGE_MULTIPART_PART_SIZE,
+        "max_concurrency": 4,
+    },
+    "copy": {
+        "multipart_threshold": 512 * 1024 * 1024,  # 512 MB
+        "multipart_chunksize": 128 * 1024 * 1024,  # 128 MB
+        "max_concurrency": 8,
+    },
+}
+
+# Хранение с дедупликацией: содержимое файлов записывается в блобы
+# по SHA-256, одинаковые файлы хранятся один раз. Мгновенная загрузка
+# по хэшу находит блобы других пользователей, только если включён
+# STORAGE_DEDUP_CROSS_USER. Блобы без ссылок удаляются командой
+# purge_blobs не раньше чем через STORAGE_BLOB_GC_GRACE
+STORAGE_DEDUP = os.getenv("STORAGE_DEDUP", "false").lower() == "true"
+STORAGE_DEDUP_CROSS_USER = os.getenv("STORAGE_DEDUP_CROSS_USER", "false").lower() == "true"
+STORAGE_BLOB_GC_GRACE = 60 * 60  # seconds
+
+# Квота пользователя в байтах по умолчанию (0 - без ограничения);
+# для отдельных пользователей задаётся в StorageUsage.quota
+STORAGE_DEFAULT_QUOTA = int(os.getenv("STORAGE_DEFAULT_QUOTA", 0)) or None
+
+# Заголовок Server-Timing с временем запросов к PostgreSQL и MinIO
+# в каждом ответе (для отладки медленных страниц в браузере)
+STORAGE_SERVER_TIMING = os.getenv("STORAGE_SERVER_TIMING", "false").lower() == "true"
+
+# Фоновые задачи (удаление, перенос и архивация папок, сверка каталога).
+# STORAGE_JOB_WORKERS - потоков-воркеров в каждом процессе приложения;
+# 0 - задачи выполняет только отдельный процесс `manage.py run_jobs`.
+# Задача, воркер которой не продлевал аренду STORAGE_JOB_LEASE секунд,
+# возвращается в очередь; после STORAGE_JOB_MAX_ATTEMPTS ошибок - failed
+STORAGE_JOB_WORKERS = int(os.getenv("STORAGE_JOB_WORKERS", 2))
+STORAGE_JOB_LEASE = 5 * 60  # seconds
+STORAGE_JOB_MAX_ATTEMPTS = 3
+# Сколько хранится состояние задачи
+STORAGE_JOB_TTL = 24 * 60 * 60  # seconds
+# Сколько дней хранятся архивы папок, собранные фоновыми задачами
+STORAGE_EXPORT_TTL_DAYS = 1
+
+# Журнал изменений для клиентов синхронизации: размер страницы
+# и сколько дней хранятся записи (команда `manage.py prune_changes`)
+STORAGE_CHANGES_PAGE_SIZE = 500
+STORAGE_CHANGE_LOG_TTL_DAYS = 30
+
+# Уведомления MinIO о событиях бакета (см. `manage.py consume_notifications`):
+# очередь Redis, в которую их пишет webhook /storage/notifications/ или цель
+# Redis самого MinIO, и токен webhook (пусто - webhook отключён)
+STORAGE_NOTIFY_QUEUE = os.getenv("STORAGE_NOTIFY_QUEUE", "storage:notifications")
+STORAGE_NOTIFY_TOKEN = os.getenv("STORAGE_NOTIFY_TOKEN", "")
+STORAGE_NOTIFY_BATCH_SIZE = 500
+
+# Корзина: сколько дней хранятся удалённые файлы и окно (местное время),
+# в которое `manage.py purge_trash` удаляет их объекты из MinIO
+STORAGE_TRASH_TTL_DAYS = int(os.getenv("STORAGE_TRASH_TTL_DAYS", 30))
+STORAGE_TRASH_PURGE_WINDOW = os.getenv("STORAGE_TRASH_PURGE_WINDOW", "01:00-05:00")
+
+# Количество результатов поиска на странице
+STORAGE_SEARCH_PAGE_SIZE = 50
+# Время жизни закэшированной страницы списка файлов
+STORAGE_LISTING_CACHE_TTL = 5 * 60  # seconds
+# Cache-Control скачиваний и списков файлов: браузер хранит ответ,
+# но перед использованием сверяет ETag (ответ 304 без тела)
+STORAGE_CACHE_CONTROL = os.getenv("STORAGE_CACHE_CONTROL", "private, no-cache")
+# Время жизни сессии возобновляемой загрузки
+STORAGE_UPLOAD_SESSION_TTL = 24 * 60 * 60  # seconds
@@ -1,10 +1,63 @@
 document.addEventListener("DOMContentLoaded", function () {
+    const jobStatus = document.getElementById("job-status");
+
+    // Ожидание фоновой задачи (удаление, перенос, архивация папки):
+    // сервер отвечает 202 со ссылкой на состояние задачи
+    async function waitForJob(job) {
+        for (;;) {
+            const response = await fetch(job.status_url);
+            const data = await response.json();
+            if (!response.ok) throw new Error(data.error || response.statusText);
+            if (data.status === "done") {
+                jobStatus.textContent = "";
+                return data;
+            }
+            if (data.status === "failed") {
+                jobStatus.textContent = "";
+                throw new Error(data.error || "Ошибка фоновой задачи");
+            }
+            const progress = data.progress;
+            if (progress.total_objects && progress.objects !== undefined) {
+                jobStatus.textContent = `Выполняется: ${progress.objects} из ${progress.total_objects} файлов`;
+            } else if (progress.total_bytes && progress.bytes !== undefined) {
+                jobStatus.textContent = `Выполняется: ${Math.round(progress.bytes * 100 / progress.total_bytes)}%`;
+            } else {
+                jobStatus.textContent = "Выполняется...";
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    }
+
+    // Скачивание папки: архив собирается фоновой задачей
+    document.querySelectorAll('.export-link').forEach(link => {
+        link.addEventListener("click", function (e) {
+            e.preventDefault();
+            fetch(this.getAttribute("data-export-url"), {
+                method: "POST",
+                headers: {
+                    'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+                },
+            })
+            .then(response => response.json().then(data => {
+                if (!response.ok) throw new Error(data.error || response.statusText);
+                return waitForJob(data);
+            }))
+            .then(data => {
+                location.href = data.download_url;
+            })
+            .catch(error => {
+                alert(error.message || "Ошибка при скачивании папки.");
+                console.error("Ошибка:", error);
+            });
+        });
+    });
+
     // Удаление файла
     document.querySelectorAll('.delete-btn').forEach(button => {
         button.addEventListener("click", function (e) {
             const fileId = e.target.getAttribute("data-file-id");
 
-            if (confirm("Вы уверены, что хотите удалить этот файл?")) {
+            if (confirm("Переместить в корзину?")) {
                 fetch(`storage/files/delete/${fileId}/`, {
                     method: "DELETE", // Используем DELETE метод
                     headers: {
@@ -50,11 +103,14 @@ document.addEventListener("DOMContentLoaded", function () {
                 .then(data => {
                     if (data.error) {
                         alert("Ошибка при переименовании файла.");
+                    } else if (data.job_id) {
+                        // Папка переименовывается фоновой задачей
+                        return waitForJob(data).then(() => location.reload());
                     } else {
                         updateFileList(); // Обновить список файлов
                     }
                 })
-                .catch(error => alert("Ошибка при переименовании файла."));
+                .catch(error => alert(error.message || "Ошибка при переименовании файла."));
             }
         });
     });
@@ -14,7 +14,7 @@ async function updateFileList() {
                 <div class="dropdown">
                     <button class="btn menu-btn" type="button" data-bs-toggle="dropdown" aria-expanded="false">...</button>
                     <div class="dropdown-menu">
-                        <a class="dropdown-item" href="/files/download/${encodeURIComponent(file.id)}/">Скачать</a>
+                        <a class="dropdown-item" href="/files/${file.is_folder ? "download-folder" : "download"}/${encodeURIComponent(file.id)}/">Скачать</a>
                         <button class="dropdown-item text-danger" onclick="deleteFile('${file.id}')">Удалить</button>
                         <button class="dropdown-item text-warning" onclick="openRenameModal('${file.id}', '${file.name}')">Переименовать</button>
                     </div>
@@ -20,24 +20,304 @@ document.addEventListener("DOMContentLoaded", function () {
         dropZone.classList.remove("dragover");
     });
 
-    dropZone.addEventListener("drop", (e) => {
+    // Файлы с путями относительно текущей папки, выбранные перетаскиванием
+    // или через выбор папки; загружаются пакетами
+    let selectedFiles = [];
+
+    // Рекурсивный обход перетащенной папки
+    async function readEntry(entry, prefix) {
+        if (entry.isFile) {
+            const file = await new Promise((resolve, reject) => entry.file(resolve, reject));
+            return [{ file: file, path: prefix + file.name }];
+        }
+        const reader = entry.createReader();
+        const result = [];
+        // readEntries возвращает содержимое папки порциями
+        for (;;) {
+            const entries = await new Promise((resolve, reject) => reader.readEntries(resolve, reject));
+            if (!entries.length) break;
+            for (const child of entries) {
+                result.push(...await readEntry(child, `${prefix}${entry.name}/`));
+            }
+        }
+        return result;
+    }
+
+    dropZone.addEventListener("drop", async (e) => {
         e.preventDefault();
         dropZone.classList.remove("dragover");
 
+        const entries = [...e.dataTransfer.items]
+            .map(item => item.webkitGetAsEntry && item.webkitGetAsEntry())
+            .filter(Boolean);
+        if (entries.some(entry => entry.isDirectory)) {
+            selectedFiles = [];
+            for (const entry of entries) {
+                selectedFiles.push(...await readEntry(entry, ""));
+            }
+            uploadStatus.innerHTML = `<p>Выбрано файлов: ${selectedFiles.length}</p>`;
+            return;
+        }
+
         const files = e.dataTransfer.files;
         const dt = new DataTransfer();
         for (let i = 0; i < files.length; i++) {
             dt.items.add(files[i]);
         }
         fileInput.files = dt.files;
+        selectedFiles = [...dt.files].map(file => ({ file: file, path: file.name }));
+    });
+
+    fileInput.addEventListener("change", () => {
+        selectedFiles = [...fileInput.files].map(file => ({ file: file, path: file.name }));
     });
 
+    document.getElementById("folder-input").addEventListener("change", (e) => {
+        selectedFiles = [...e.target.files].map(file => ({ file: file, path: file.webkitRelativePath }));
+        uploadStatus.innerHTML = `<p>Выбрано файлов: ${selectedFiles.length}</p>`;
+    });
+
+    // Сколько частей файла загружается одновременно и сколько раз повторяется упавшая
+    const PARALLEL_PARTS = 4;
+    const MAX_RETRIES = 5;
+
+    function csrfToken() {
+        return form.querySelector("[name=csrfmiddlewaretoken]").value;
+    }
+
+    function checkResponse(response) {
+        if (!response.ok) throw new Error(`Ошибка загрузки части файла: ${response.status}`);
+        return response;
+    }
+
+    // Повтор запроса с экспоненциальной задержкой
+    async function withRetry(request) {
+        for (let attempt = 1; ; attempt++) {
+            try {
+                return await request();
+            } catch (error) {
+                if (attempt >= MAX_RETRIES) throw error;
+                await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+            }
+        }
+    }
+
+    // Обработка элементов не более чем в `limit` параллельных задачах
+    async function runParallel(items, limit, task) {
+        const queue = [...items];
+        const workers = Array.from({ length: Math.min(limit, queue.length) }, async () => {
+            while (queue.length) {
+                await task(queue.shift());
+            }
+        });
+        await Promise.all(workers);
+    }
+
+    // JSON-запрос к серверу с CSRF-токеном формы
+    async function postJson(url, body) {
+        const response = await fetch(url, {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+                "X-CSRFToken": csrfToken()
+            },
+            body: JSON.stringify(body)
+        });
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || response.statusText);
+        return data;
+    }
+
+    // Прямая загрузка в MinIO по подписанным ссылкам, минуя сервер
+    async function directUpload(file) {
+        const target = await postJson(form.dataset.presignUrl, {
+            file_name: file.name,
+            current_path: form.querySelector("[name=current_path]").value,
+            size: file.size
+        });
+
+        if (!target.upload_id) {
+            const response = await fetch(target.url, { method: "PUT", body: file });
+            if (!response.ok) throw new Error("Ошибка загрузки в хранилище");
+            return postJson(form.dataset.completeUrl, { file_name: target.file_name });
+        }
+
+        try {
+            const parts = [];
+            await runParallel(target.parts, PARALLEL_PARTS, async (part) => {
+                const start = (part.part_number - 1) * target.part_size;
+                const response = await withRetry(() => fetch(part.url, {
+                    method: "PUT",
+                    body: file.slice(start, start + target.part_size)
+                }).then(checkResponse));
+                parts.push({ part_number: part.part_number, etag: response.headers.get("ETag") });
+            });
+            return await postJson(form.dataset.completeUrl, {
+                file_name: target.file_name,
+                upload_id: target.upload_id,
+                parts: parts
+            });
+        } catch (error) {
+            postJson(form.dataset.abortUrl, {
+                file_name: target.file_name,
+                upload_id: target.upload_id
+            }).catch(() => {});
+            throw error;
+        }
+    }
+
+    // Возобновляемая загрузка через сервер: файл режется на части,
+    // части загружаются параллельно, повторяются только упавшие.
+    // Сессия хранится в localStorage, поэтому после обрыва связи
+    // или перезагрузки страницы догружаются только недостающие части.
+    async function resumableUpload(file) {
+        const sessionsUrl = form.dataset.sessionsUrl;
+        const currentPath = form.querySelector("[name=current_path]").value;
+        const storageKey = `upload-session:${currentPath}${file.name}:${file.size}:${file.lastModified}`;
+        const received = new Set();
+
+        let session = JSON.parse(localStorage.getItem(storageKey) || "null");
+        if (session) {
+            const response = await fetch(`${sessionsUrl}${session.session_id}/`);
+            if (response.ok) {
+                const data = await response.json();
+                data.parts.forEach(part => received.add(part.part_number));
+            } else {
+                session = null;
+            }
+        }
+        if (!session) {
+            session = await postJson(sessionsUrl, {
+                file_name: file.name,
+                current_path: currentPath,
+                size: file.size
+            });
+            localStorage.setItem(storageKey, JSON.stringify(session));
+        }
+
+        const pending = [];
+        for (let number = 1; number <= session.parts_count; number++) {
+            if (!received.has(number)) pending.push(number);
+        }
+        let done = session.parts_count - pending.length;
+        await runParallel(pending, PARALLEL_PARTS, async (number) => {
+            const start = (number - 1) * session.part_size;
+            await withRetry(() => fetch(`${sessionsUrl}${session.session_id}/parts/${number}/`, {
+                method: "PUT",
+                headers: { "X-CSRFToken": csrfToken() },
+                body: file.slice(start, start + session.part_size)
+            }).then(checkResponse));
+            done += 1;
+            uploadStatus.innerHTML = `<p>Загружено ${Math.round(done * 100 / session.parts_count)}%</p>`;
+        });
+
+        const data = await postJson(`${sessionsUrl}${session.session_id}/complete/`, {});
+        localStorage.removeItem(storageKey);
+        return data;
+    }
+
+    // Загрузка многих файлов пакетами по data-batch-size файлов;
+    // сервер отправляет файлы пакета в хранилище параллельно
+    async function batchUpload(items) {
+        const batchSize = Number(form.dataset.batchSize);
+        const batches = [];
+        for (let i = 0; i < items.length; i += batchSize) {
+            batches.push(items.slice(i, i + batchSize));
+        }
+        const failed = [];
+        let done = 0;
+        await runParallel(batches, 2, async (batch) => {
+            const formData = new FormData();
+            formData.append("current_path", form.querySelector("[name=current_path]").value);
+            batch.forEach(item => {
+                formData.append("files", item.file);
+                formData.append("paths", item.path);
+            });
+            const response = await withRetry(() => fetch(form.dataset.batchUrl, {
+                method: "POST",
+                headers: { "X-CSRFToken": csrfToken() },
+                body: formData
+            }).then(checkResponse));
+            const data = await response.json();
+            data.results.filter(result => result.error).forEach(result => failed.push(result));
+            done += batch.length;
+            uploadStatus.innerHTML = `<p>Загружено файлов: ${done} из ${items.length}</p>`;
+        });
+        if (failed.length) {
+            throw new Error(failed.map(result => result.error).join("; "));
+        }
+        return { message: `Загружено файлов: ${items.length}` };
+    }
+
+    // Мгновенная загрузка: если файл с таким SHA-256 уже хранится,
+    // сервер записывает его без передачи содержимого
+    async function instantUpload(file) {
+        const digest = await crypto.subtle.digest("SHA-256", await file.arrayBuffer());
+        const sha256 = [...new Uint8Array(digest)]
+            .map(byte => byte.toString(16).padStart(2, "0"))
+            .join("");
+        const data = await postJson(form.dataset.instantUrl, {
+            file_name: file.name,
+            current_path: form.querySelector("[name=current_path]").value,
+            size: file.size,
+            sha256: sha256
+        });
+        return data.exists ? data : null;
+    }
+
     // Form submission for file upload
-    form.addEventListener("submit", (e) => {
+    form.addEventListener("submit", async (e) => {
         e.preventDefault();
+
+        const file = fileInput.files[0];
+        if (selectedFiles.length > 1 || selectedFiles.some(item => item.path.includes("/"))) {
+            batchUpload(selectedFiles)
+                .then(() => location.reload())
+                .catch(error => {
+                    uploadStatus.innerHTML = `<p>Ошибка загрузки: ${error.message}</p>`;
+                    console.error("Ошибка загрузки:", error);
+                });
+            return;
+        }
+        // Хэш считается в памяти браузера, поэтому только для файлов,
+        // которые и так загружаются одним запросом
+        if (file && form.dataset.instantUrl && window.crypto && crypto.subtle
+                && file.size <= Number(form.dataset.multipartThreshold)) {
+            try {
+                if (await instantUpload(file)) {
+                    location.reload();
+                    return;
+                }
+            } catch (error) {
+                console.error("Ошибка проверки файла:", error);
+            }
+        }
+        let upload = null;
+        if (file && form.dataset.presignUrl) {
+            upload = directUpload(file);
+        } else if (file && file.size > Number(form.dataset.multipartThreshold)) {
+            upload = resumableUpload(file);
+        }
+
+        if (upload) {
+            upload
+                .then(data => {
+                    location.reload();
+                    uploadStatus.innerHTML = `<p>${data.message}</p>`;
+                })
+                .catch(error => {
+                    uploadStatus.innerHTML = `<p>Ошибка загрузки: ${error.message}</p>`;
+                    console.error("Ошибка загрузки:", error);
+                });
+            return;
+        }
+
         let formData = new FormData(form);
+        // Путь в строке запроса нужен серверу, чтобы отправлять файл
+        // в хранилище по частям ещё во время его передачи
+        const currentPath = encodeURIComponent(formData.get("current_path") || "");
 
-        fetch(uploadUrl, {
+        fetch(`${uploadUrl}?current_path=${currentPath}`, {
             method: "POST",
             body: formData
         })
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from src.storage.models import StoredObject
+
+
+@admin.register(StoredObject)
+class StoredObjectAdmin(admin.ModelAdmin):
+    list_display = ("owner", "path", "is_folder", "size", "modified_at")
+    list_filter = ("is_folder",)
+    search_fields = ("path",)
+    raw_id_fields = ("owner",)
@@ -3,4 +3,4 @@ from django.apps import AppConfig
 
 class StorageConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "storage"
+    name = "src.storage"
@@ -0,0 +1,241 @@
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError, NoCredentialsError
+from django.conf import settings
+
+from src.storage import catalog
+from src.storage.blobs import get_blob_key
+from src.storage.clients import get_s3_client
+from src.storage.exceptions import FileDownloadError, FileNotfoundError
+from src.storage.services import (
+    get_user_file_path,
+    iter_file_chunks,
+)
+
+# Архивы папок, собранные фоновыми задачами, лежат вне папок пользователей
+EXPORT_PREFIX = "exports/"
+
+
+class ZipStreamBuffer:
+    """
+    Приёмник для zipfile, из которого записанные байты сразу забираются
+    в ответ клиенту. Буфер не поддерживает tell/seek, поэтому zipfile
+    пишет размеры и CRC после данных файла (data descriptor) и не
+    возвращается к уже отданным байтам.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        """
+        Забрать накопленные байты.
+        :return:
+        """
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def open_object(key: str, bucket_name: str):
+    """
+    Открытие потока на чтение объекта MinIO.
+    :param key:
+    :param bucket_name:
+    :return: тело ответа get_object
+    """
+    return get_s3_client().get_object(Bucket=bucket_name, Key=key)["Body"]
+
+
+def open_export(key: str, bucket_name: str):
+    """
+    Открытие потока на чтение архива, собранного фоновой задачей.
+    :param key:
+    :param bucket_name:
+    :return: тело ответа get_object
+    """
+    try:
+        return open_object(key, bucket_name)
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            # Архив удалён правилом жизненного цикла бакета
+            raise FileNotfoundError(key, exc)
+        raise FileDownloadError(key, exc)
+    except NoCredentialsError as exc:
+        raise FileDownloadError(key, exc)
+
+
+def get_zip_info(name: str, obj: dict) -> zipfile.ZipInfo:
+    """
+    Заголовок записи архива для файла.
+    :param name: путь внутри архива
+    :param obj: описание объекта из ``iter_file_objects``
+    :return:
+    """
+    info = zipfile.ZipInfo(name, date_time=obj["LastModified"].timetuple()[:6])
+    # По размеру zipfile решает, нужен ли записи формат ZIP64
+    info.file_size = obj["Size"]
+    info.external_attr = 0o100644 << 16
+    return info
+
+
+def iter_file_objects(user_id: int, folder: str, prefix: str):
+    """
+    Файлы папки по каталогу в виде описаний объектов: ``Key`` - путь
+    в папке пользователя, ``ObjectKey`` - ключ объекта с содержимым
+    (блоб или тот же путь). Метки папок и файлы в корзине в каталоге
+    не числятся среди файлов папки и в архив не попадают.
+    :param user_id:
+    :param folder: путь папки с "/" в конце
+    :param prefix: ключ папки в MinIO
+    :return:
+    """
+    for entry in catalog.iter_folder_files(user_id, folder):
+        key = prefix + entry["path"].removeprefix(folder)
+        yield {
+            "Key": key,
+            "ObjectKey": get_blob_key(entry["blob_id"]) if entry["blob_id"] else key,
+            "Size": entry["size"],
+            "LastModified": entry["modified_at"],
+        }
+
+
+def iter_folder_archive(
+        user_id: int,
+        folder: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+):
+    """
+    ZIP-архив файлов папки из каталога, собираемый на лету по мере
+    чтения объектов из MinIO.
+    Временные файлы не создаются, в памяти держится не больше одного
+    куска файла. Пока текущий файл пишется в архив, следующий уже
+    открывается в отдельном потоке. Файлы не сжимаются, архивы
+    больше 4 ГБ и с большим числом файлов записываются в формате ZIP64.
+    :param user_id:
+    :param folder: путь папки без "/" в конце
+    :param bucket_name:
+    :return: куски архива
+    """
+    prefix = get_user_file_path(user_id, folder + "/")
+    root = os.path.basename(folder) + "/"
+    objects = iter_file_objects(user_id, folder + "/", prefix)
+    buffer = ZipStreamBuffer()
+    archive = zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED,
+                              allowZip64=True)
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def prefetch():
+        obj = next(objects, None)
+        if obj is None:
+            return obj, None
+        return obj, executor.submit(open_object, obj["ObjectKey"], bucket_name)
+
+    current, opening = prefetch()
+    try:
+        while current is not None:
+            info = get_zip_info(root + current["Key"].removeprefix(prefix), current)
+            body = opening.result()
+            current, opening = prefetch()
+            with archive.open(info, mode="w") as dest:
+                for chunk in iter_file_chunks(body):
+                    dest.write(chunk)
+                    yield buffer.drain()
+            if data := buffer.drain():
+                yield data
+        archive.close()
+        yield buffer.drain()
+    finally:
+        if opening is not None:
+            opening.add_done_callback(
+                lambda future: future.exception() or future.result().close()
+            )
+        executor.shutdown(wait=False)
+
+
+def get_export_key(job_id: str) -> str:
+    return f"{EXPORT_PREFIX}{job_id}.zip"
+
+
+def export_folder_archive(
+        user_id: int,
+        folder: str,
+        key: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME,
+        on_progress=None
+) -> int:
+    """
+    Запись ZIP-архива папки в MinIO составной загрузкой по мере его
+    сборки; в памяти держится не больше одной части. Повторный вызов
+    с тем же ключом перезаписывает архив целиком.
+    :param user_id:
+    :param folder: путь папки без "/" в конце
+    :param key: ключ объекта архива
+    :param bucket_name:
+    :param on_progress: вызывается после каждой части с количеством
+    записанных байт ``bytes``
+    :return: размер архива в байтах
+    """
+    client = get_s3_client()
+    part_size = settings.STORAGE_MULTIPART_PART_SIZE
+    upload_id = client.create_multipart_upload(
+        Bucket=bucket_name, Key=key, ContentType="application/zip"
+    )["UploadId"]
+    parts = []
+    buffer = bytearray()
+    written = 0
+
+    def send(data: bytes) -> None:
+        nonlocal written
+        response = client.upload_part(Bucket=bucket_name, Key=key,
+                                      UploadId=upload_id, Body=data,
+                                      PartNumber=len(parts) + 1)
+        parts.append({"PartNumber": len(parts) + 1, "ETag": response["ETag"]})
+        written += len(data)
+        if on_progress is not None:
+            on_progress({"bytes": written})
+
+    try:
+        for chunk in iter_folder_archive(user_id, folder, bucket_name):
+            buffer += chunk
+            if len(buffer) >= part_size:
+                send(bytes(buffer[:part_size]))
+                del buffer[:part_size]
+        send(bytes(buffer))
+        client.complete_multipart_upload(Bucket=bucket_name, Key=key,
+                                         UploadId=upload_id,
+                                         MultipartUpload={"Parts": parts})
+    except Exception:
+        client.abort_multipart_upload(Bucket=bucket_name, Key=key,
+                                      UploadId=upload_id)
+        raise
+    return written
+
+
+def set_export_expiration(bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME) -> None:
+    """
+    Правило жизненного цикла бакета: архивы папок и их незавершённые
+    составные загрузки удаляются через STORAGE_EXPORT_TTL_DAYS дней.
+    :param bucket_name:
+    :return:
+    """
+    days = settings.STORAGE_EXPORT_TTL_DAYS
+    get_s3_client().put_bucket_lifecycle_configuration(
+        Bucket=bucket_name,
+        LifecycleConfiguration={"Rules": [{
+            "ID": "expire-exports",
+            "Filter": {"Prefix": EXPORT_PREFIX},
+            "Status": "Enabled",
+            "Expiration": {"Days": days},
+            "AbortIncompleteMultipartUpload": {"DaysAfterInitiation": days},
+        }]},
+    )
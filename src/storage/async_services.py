@@ -0,0 +1,212 @@
+from asgiref.sync import sync_to_async
+from botocore.exceptions import ClientError, NoCredentialsError
+from django.conf import settings
+
+from src.storage import catalog, services
+from src.storage.clients import get_async_s3_client
+from src.storage.exceptions import (
+    FileDownloadError,
+    FileNotfoundError,
+    FileUploadError,
+)
+from src.storage.listing_cache import get_parent_paths, invalidate_listing
+from src.storage.services import (
+    DOWNLOAD_CHUNK_SIZE,
+    ensure_bucket,
+    get_object_key,
+    get_object_metadata,
+    get_user_file_path,
+    is_no_such_bucket,
+    ready_buckets,
+)
+
+
+async def retry_on_missing_bucket(operation, bucket_name: str):
+    """
+    Асинхронный вариант ``services.retry_on_missing_bucket``.
+    :param operation: функция без аргументов, возвращающая корутину запроса
+    :param bucket_name:
+    :return: результат запроса
+    """
+    try:
+        return await operation()
+    except ClientError as exc:
+        if not is_no_such_bucket(exc):
+            raise
+    ready_buckets.discard(bucket_name)
+    await sync_to_async(ensure_bucket)(bucket_name)
+    return await operation()
+
+
+async def download_file(
+        user_id: int,
+        file_name: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME,
+        byte_range: tuple[int, int] | None = None,
+        if_match: str | None = None
+) -> dict:
+    """
+    Открытие потока на чтение файла из MinIO без блокировки потока.
+    :param user_id:
+    :param file_name:
+    :param bucket_name:
+    :param byte_range: диапазон байт (start, end) включительно
+    :param if_match: ETag версии файла, которую нужно прочитать
+    :return: асинхронный поток ``body`` и метаданные объекта
+    """
+    key = await sync_to_async(get_object_key)(user_id, file_name)
+    params = {"Bucket": bucket_name, "Key": key}
+    if byte_range is not None:
+        params["Range"] = "bytes={}-{}".format(*byte_range)
+    if if_match is not None:
+        params["IfMatch"] = if_match
+
+    client = await get_async_s3_client()
+    try:
+        response = await client.get_object(**params)
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            raise FileNotfoundError(file_name, exc)
+        raise FileDownloadError(file_name, exc)
+    except NoCredentialsError as exc:
+        raise FileDownloadError(file_name, exc)
+
+    return {
+        "body": iter_file_chunks(response["Body"]),
+        **get_object_metadata(response),
+    }
+
+
+async def stat_file(
+        user_id: int,
+        file_name: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> dict:
+    """
+    Метаданные файла в MinIO без чтения его содержимого.
+    :param user_id:
+    :param file_name:
+    :param bucket_name:
+    :return:
+    """
+    key = await sync_to_async(get_object_key)(user_id, file_name)
+    client = await get_async_s3_client()
+    try:
+        response = await client.head_object(Bucket=bucket_name, Key=key)
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            raise FileNotfoundError(file_name, exc)
+        raise FileDownloadError(file_name, exc)
+    except NoCredentialsError as exc:
+        raise FileDownloadError(file_name, exc)
+
+    return get_object_metadata(response)
+
+
+async def iter_file_chunks(body, chunk_size: int = DOWNLOAD_CHUNK_SIZE):
+    """
+    Асинхронное чтение потока объекта MinIO кусками.
+    Поток закрывается и при полном чтении, и при обрыве соединения клиентом.
+    :param body:
+    :param chunk_size:
+    :return:
+    """
+    try:
+        async for chunk in body.iter_chunks(chunk_size):
+            yield chunk
+    finally:
+        body.close()
+
+
+async def upload_file(
+        file,
+        user_id: int,
+        file_name: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> str:
+    """
+    Загрузка принятого файла в MinIO без блокировки потока.
+    Файл до STORAGE_MULTIPART_PART_SIZE отправляется одним запросом,
+    больший - составной загрузкой по частям; в памяти держится
+    не больше одной части.
+    :param file:
+    :param user_id:
+    :param file_name:
+    :param bucket_name:
+    :return:
+    """
+    if settings.STORAGE_DEDUP:
+        # Файл хэшируется и записывается в блоб синхронной реализацией
+        return await sync_to_async(services.upload_file)(
+            file, user_id, file_name, bucket_name
+        )
+    client = await get_async_s3_client()
+    key = get_user_file_path(user_id, file_name)
+    content_type = getattr(file, "content_type", None) or "application/octet-stream"
+    part_size = settings.STORAGE_MULTIPART_PART_SIZE
+    read = sync_to_async(file.read, thread_sensitive=False)
+
+    try:
+        await sync_to_async(file.seek, thread_sensitive=False)(0)
+        if file.size <= part_size:
+            data = await read()
+            response = await retry_on_missing_bucket(
+                lambda: client.put_object(Bucket=bucket_name, Key=key,
+                                          Body=data, ContentType=content_type),
+                bucket_name,
+            )
+        else:
+            response = await upload_multipart(client, read, key, content_type,
+                                              part_size, bucket_name)
+    except (NoCredentialsError, ClientError) as exc:
+        raise FileUploadError(file_name, exc)
+
+    await sync_to_async(catalog.record_file)(
+        user_id, file_name, size=file.size, etag=response["ETag"],
+        content_type=content_type,
+    )
+    await sync_to_async(invalidate_listing)(user_id, get_parent_paths(file_name))
+    return file_name
+
+
+async def upload_multipart(
+        client,
+        read,
+        key: str,
+        content_type: str,
+        part_size: int,
+        bucket_name: str
+) -> dict:
+    """
+    Составная загрузка потока частями по part_size байт.
+    При ошибке загрузка отменяется, части в MinIO не остаются.
+    :param client:
+    :param read: корутина чтения следующей части
+    :param key:
+    :param content_type:
+    :param part_size:
+    :param bucket_name:
+    :return: ответ complete_multipart_upload
+    """
+    upload_id = (await retry_on_missing_bucket(
+        lambda: client.create_multipart_upload(Bucket=bucket_name, Key=key,
+                                               ContentType=content_type),
+        bucket_name,
+    ))["UploadId"]
+    parts = []
+    try:
+        while data := await read(part_size):
+            part_number = len(parts) + 1
+            response = await client.upload_part(
+                Bucket=bucket_name, Key=key, UploadId=upload_id,
+                PartNumber=part_number, Body=data,
+            )
+            parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+        return await client.complete_multipart_upload(
+            Bucket=bucket_name, Key=key, UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except BaseException:
+        await client.abort_multipart_upload(Bucket=bucket_name, Key=key,
+                                            UploadId=upload_id)
+        raise
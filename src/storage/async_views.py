@@ -0,0 +1,141 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_GET, require_POST
+
+from src.storage.async_services import download_file, stat_file, upload_file
+from src.storage.exceptions import (
+    FileDownloadError,
+    FileNotfoundError,
+    FileUploadError,
+    QuotaExceededError,
+)
+from src.storage.presigned import generate_download_url
+from src.storage.quotas import check_quota
+from src.storage.ranges import (
+    aiter_multipart_byteranges,
+    if_range_matches,
+    parse_range_header,
+)
+from src.storage.services import is_safe_file_name
+from src.storage.views import (
+    build_file_response,
+    build_partial_response,
+    get_not_modified_response,
+    is_conditional_request,
+)
+
+
+@csrf_exempt
+@login_required
+@require_POST
+async def upload_file_view(request):
+    """
+    Асинхронная загрузка файла.
+    Под ASGI тело запроса уже принято сервером целиком, поэтому файл
+    разбирается стандартными обработчиками Django в отдельном потоке,
+    а в MinIO отправляется асинхронным клиентом.
+    Обработчики загрузки задаются до разбора тела, поэтому CSRF
+    проверяется не middleware, а уже после разбора.
+    :param request:
+    :return:
+    """
+    request.upload_handlers = [MemoryFileUploadHandler(request),
+                               TemporaryFileUploadHandler(request)]
+    await sync_to_async(lambda: (request.POST, request.FILES))()
+    return await receive_file_view(request)
+
+
+@csrf_protect
+async def receive_file_view(request):
+    """
+    Приём разобранного файла асинхронной загрузки после проверки CSRF.
+    :param request:
+    :return:
+    """
+    data, files = request.POST, request.FILES
+    current_path = data.get("current_path") or request.GET.get("current_path", "")
+    file = files.get("file")
+    if not file:
+        return JsonResponse({"error": "Файл не найден"}, status=400)
+    user = await request.auser()
+    file_name = file.name
+    full_file_name = f"{current_path}{file_name}" if current_path else file_name
+    if not is_safe_file_name(full_file_name) or full_file_name.endswith("/"):
+        file.close()
+        return JsonResponse({"error": "Некорректное имя файла"}, status=400)
+    try:
+        await sync_to_async(check_quota)(user.id, file.size, [full_file_name])
+        await upload_file(file, user.id, full_file_name)
+        return JsonResponse({
+            "message": f"Файл {file_name} загружен.",
+            "file_url": full_file_name,
+            "file_name": file_name
+        }, status=201)
+    except QuotaExceededError as exc:
+        return JsonResponse({"error": str(exc)}, status=413)
+    except FileUploadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    finally:
+        file.close()
+
+
+@login_required
+@require_GET
+async def download_file_view(request, file_name):
+    """
+    Асинхронная потоковая отдача файла с поддержкой Range, If-Range
+    и условных запросов (If-None-Match, If-Modified-Since).
+    Ожидание MinIO и медленного клиента не занимает поток: один процесс
+    под ASGI обслуживает тысячи одновременных скачиваний.
+    :param request:
+    :param file_name:
+    :return:
+    """
+    user = await request.auser()
+    range_header = request.headers.get("Range")
+    try:
+        if settings.STORAGE_DIRECT_TRANSFER:
+            # Браузер скачивает файл из MinIO сам, минуя воркер Django
+            # Ключ объекта берётся из каталога - запрос к базе в потоке
+            url = await sync_to_async(generate_download_url)(user.id, file_name)
+            return redirect(url)
+        if range_header or is_conditional_request(request):
+            stored_file = await stat_file(user.id, file_name)
+            not_modified = get_not_modified_response(request, stored_file)
+            if not_modified is not None:
+                return not_modified
+        if range_header:
+            ranges = parse_range_header(range_header, stored_file["size"])
+            if ranges is not None and if_range_matches(
+                    request.headers.get("If-Range"),
+                    stored_file["etag"],
+                    stored_file["last_modified"]):
+
+                async def open_range(start, end):
+                    part = await download_file(
+                        user.id, file_name,
+                        byte_range=(start, end),
+                        if_match=stored_file["etag"]
+                    )
+                    async for chunk in part["body"]:
+                        yield chunk
+
+                return build_partial_response(
+                    file_name, stored_file, ranges, open_range,
+                    iter_multipart=aiter_multipart_byteranges
+                )
+        stored_file = await download_file(user.id, file_name)
+    except FileNotfoundError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+    except FileDownloadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return build_file_response(stored_file, file_name)
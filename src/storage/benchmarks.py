@@ -0,0 +1,256 @@
+import math
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from src.storage import catalog
+from src.storage.clients import get_s3_client
+from src.storage.listing_cache import invalidate_listing
+from src.storage.moves import rename_file
+from src.storage.services import (
+    create_bucket,
+    delete_file,
+    download_file,
+    get_user_file_path,
+    iter_batches,
+    list_user_files,
+    search_files,
+    upload_file,
+)
+
+DEFAULT_OBJECT_COUNTS = (1000, 10000, 100000)
+DEFAULT_FILE_SIZES = (1024, 1024 * 1024, 16 * 1024 * 1024)
+# Набор данных раскладывается по папкам data/dNNNN/ по FOLDER_SIZE файлов;
+# список папки замеряется на первой из них
+FOLDER_SIZE = 1000
+SEED_FILE_SIZE = 128
+SEED_BATCH_SIZE = 1000
+BENCHMARK_USERNAME = "storage-benchmark"
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """
+    Перцентиль по ближайшему рангу.
+    :param samples: замеры
+    :param fraction: доля от 0 до 1 (0.99 - p99)
+    :return:
+    """
+    ordered = sorted(samples)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(samples: list[float], size: int = 0) -> dict:
+    """
+    Сводка замеров одной операции.
+    :param samples: длительности вызовов в секундах
+    :param size: размер файла, если операция передаёт содержимое
+    :return: число вызовов, p50 и p99 в секундах, пропускная способность
+    в операциях и байтах в секунду
+    """
+    total = sum(samples)
+    ops_per_sec = len(samples) / total if total else 0.0
+    return {
+        "count": len(samples),
+        "p50": percentile(samples, 0.5),
+        "p99": percentile(samples, 0.99),
+        "ops_per_sec": ops_per_sec,
+        "bytes_per_sec": ops_per_sec * size,
+    }
+
+
+def get_result_key(operation: str, objects: int, size: int = 0) -> str:
+    return f"{operation}/{objects}/{size}"
+
+
+def measure(operation, arguments, prepare=None) -> list[float]:
+    """
+    Замер длительности вызовов операции.
+    :param operation: замеряемая функция
+    :param arguments: аргументы вызовов, по одному кортежу на вызов
+    :param prepare: функция, вызываемая перед каждым вызовом
+    с теми же аргументами вне замера
+    :return: длительности в секундах
+    """
+    samples = []
+    for args in arguments:
+        if prepare is not None:
+            prepare(*args)
+        started = time.perf_counter()
+        operation(*args)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def get_seed_name(index: int) -> str:
+    return f"data/d{index // FOLDER_SIZE:04d}/f{index:07d}.bin"
+
+
+def seed_objects(user_id: int, count: int, bucket_name: str) -> None:
+    """
+    Заполнение папки пользователя набором данных: объекты пишутся
+    в MinIO параллельно, каталог - пакетами.
+    :param user_id:
+    :param count: число файлов
+    :param bucket_name:
+    :return:
+    """
+    body = b"x" * SEED_FILE_SIZE
+
+    def put(file_name: str) -> dict:
+        response = get_s3_client().put_object(
+            Bucket=bucket_name, Key=get_user_file_path(user_id, file_name),
+            Body=body,
+        )
+        return {"file_name": file_name, "size": SEED_FILE_SIZE,
+                "etag": response["ETag"]}
+
+    names = (get_seed_name(index) for index in range(count))
+    with ThreadPoolExecutor(settings.STORAGE_BATCH_UPLOAD_CONCURRENCY) as executor:
+        for batch in iter_batches(names, SEED_BATCH_SIZE):
+            catalog.record_files(user_id, list(executor.map(put, batch)))
+
+
+def download_whole(user_id: int, file_name: str, bucket_name: str) -> None:
+    for _ in download_file(user_id, file_name, bucket_name)["body"]:
+        pass
+
+
+def run_dataset(user_id: int, objects: int, file_sizes, iterations: int,
+                bucket_name: str) -> dict:
+    """
+    Замеры операций на папке пользователя с ``objects`` файлами.
+    Набор данных удаляется в конце; удаление всей папки тоже замеряется.
+    :param user_id:
+    :param objects: число файлов в наборе данных
+    :param file_sizes: размеры загружаемых файлов
+    :param iterations: число вызовов каждой операции
+    :param bucket_name:
+    :return: сводки замеров по ключам ``get_result_key``
+    """
+    results = {}
+    seed_objects(user_id, objects, bucket_name)
+
+    listed = "data/d0000/"
+    samples = measure(
+        lambda path: list_user_files(user_id, path, bucket_name),
+        [(listed,)] * iterations,
+        # Замеряется чтение из каталога, а не из кэша списков
+        prepare=lambda path: invalidate_listing(user_id, [path]),
+    )
+    results[get_result_key("list_user_files", objects)] = summarize(samples)
+
+    queries = [(f"f{random.randrange(objects):07d}",) for _ in range(iterations)]
+    samples = measure(lambda query: search_files(user_id, query), queries)
+    results[get_result_key("search_files", objects)] = summarize(samples)
+
+    for size in file_sizes:
+        payload = bytearray(os.urandom(size))
+        names = [f"bench/{size}/u{number}.bin" for number in range(iterations)]
+        renamed = [f"r{number}.bin" for number in range(iterations)]
+
+        def upload(number: int, file_name: str) -> None:
+            # Содержимое каждого файла своё, чтобы при STORAGE_DEDUP
+            # загрузка не сводилась к записи ссылки на блоб
+            payload[:8] = number.to_bytes(8, "big")
+            file = SimpleUploadedFile(os.path.basename(file_name), bytes(payload),
+                                      "application/octet-stream")
+            upload_file(file, user_id, file_name, bucket_name)
+
+        operations = [
+            ("upload_file", upload, list(enumerate(names))),
+            ("download_file",
+             lambda file_name: download_whole(user_id, file_name, bucket_name),
+             [(name,) for name in names]),
+            ("rename_file",
+             lambda file_name, new_name: rename_file(user_id, file_name,
+                                                     new_name, bucket_name),
+             list(zip(names, renamed))),
+            ("delete_file",
+             lambda file_name: delete_file(user_id, file_name, bucket_name),
+             [(f"bench/{size}/{name}",) for name in renamed]),
+        ]
+        for operation, function, arguments in operations:
+            samples = measure(function, arguments)
+            results[get_result_key(operation, objects, size)] = summarize(
+                samples, size if operation in ("upload_file", "download_file") else 0
+            )
+
+    samples = measure(lambda path: delete_file(user_id, path, bucket_name),
+                      [("data/",)])
+    summary = summarize(samples)
+    # Пропускная способность удаления папки - в файлах в секунду
+    summary["ops_per_sec"] = objects / samples[0]
+    results[get_result_key("delete_folder", objects)] = summary
+    delete_file(user_id, "bench/", bucket_name)
+    return results
+
+
+def run_benchmarks(
+        object_counts=DEFAULT_OBJECT_COUNTS,
+        file_sizes=DEFAULT_FILE_SIZES,
+        iterations: int = 20,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME,
+        on_result=None
+) -> dict:
+    """
+    Замеры операций хранилища на наборах данных разного размера.
+    Замеры идут от имени временного пользователя, который удаляется
+    вместе со своими файлами в конце.
+    :param object_counts: размеры наборов данных (файлов у пользователя)
+    :param file_sizes: размеры загружаемых и скачиваемых файлов
+    :param iterations: число вызовов каждой операции
+    :param bucket_name:
+    :param on_result: функция, получающая ключ и сводку каждого замера
+    :return: сводки замеров по ключам ``get_result_key``
+    """
+    create_bucket(bucket_name)
+    user_model = get_user_model()
+    user_model.objects.filter(username=BENCHMARK_USERNAME).delete()
+    user = user_model.objects.create_user(username=BENCHMARK_USERNAME)
+    results = {}
+    try:
+        for objects in object_counts:
+            dataset = run_dataset(user.id, objects, file_sizes, iterations,
+                                  bucket_name)
+            for key, summary in dataset.items():
+                if on_result is not None:
+                    on_result(key, summary)
+            results.update(dataset)
+    finally:
+        # Остатки прерванного прогона; записи каталога удаляются с пользователем
+        for folder in ("data/", "bench/"):
+            delete_file(user.id, folder, bucket_name)
+        user.delete()
+    return results
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    Сравнение замеров с сохранённой базовой линией.
+    Регрессия - p50 больше базового или пропускная способность меньше
+    базовой более чем на долю ``tolerance``. Замеры, которых нет
+    в базовой линии, не сравниваются.
+    :param results: сводки замеров
+    :param baseline: сводки базовой линии
+    :param tolerance: допустимое отклонение (0.2 - 20%)
+    :return: регрессии: ключ замера, метрика, базовое и текущее значения
+    """
+    regressions = []
+    for key, summary in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if summary["p50"] > base["p50"] * (1 + tolerance):
+            regressions.append({"key": key, "metric": "p50",
+                                "baseline": base["p50"], "current": summary["p50"]})
+        if summary["ops_per_sec"] < base["ops_per_sec"] * (1 - tolerance):
+            regressions.append({"key": key, "metric": "ops_per_sec",
+                                "baseline": base["ops_per_sec"],
+                                "current": summary["ops_per_sec"]})
+    return regressions
@@ -0,0 +1,129 @@
+import hashlib
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from src.storage.models import Blob
+
+# Блобы лежат в общем бакете вне папок пользователей
+BLOB_PREFIX = "blobs/"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_blob_key(sha256: str) -> str:
+    """
+    Ключ объекта MinIO с содержимым блоба.
+    Первые символы хэша - отдельный уровень, чтобы блобы
+    не лежали одним плоским списком.
+    :param sha256:
+    :return:
+    """
+    return f"{BLOB_PREFIX}{sha256[:2]}/{sha256}"
+
+
+def is_valid_sha256(value: str) -> bool:
+    return (isinstance(value, str) and len(value) == 64
+            and all(char in "0123456789abcdef" for char in value))
+
+
+def hash_file(file) -> str:
+    """
+    SHA-256 содержимого принятого файла.
+    Файл читается кусками и возвращается в начало.
+    :param file:
+    :return: хэш в шестнадцатеричном виде
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    while chunk := file.read(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def find_blob(sha256: str, size: int, user_id: int) -> Blob | None:
+    """
+    Записанный блоб с данным содержимым.
+    Без STORAGE_DEDUP_CROSS_USER ищутся только блобы, на которые
+    уже ссылаются файлы пользователя: знание хэша чужого файла
+    не должно давать доступ к его содержимому.
+    :param sha256:
+    :param size:
+    :param user_id:
+    :return:
+    """
+    blobs = Blob.objects.filter(sha256=sha256, size=size, stored=True,
+                                refcount__gt=0)
+    if not settings.STORAGE_DEDUP_CROSS_USER:
+        blobs = blobs.filter(entries__owner_id=user_id)
+    return blobs.first()
+
+
+def acquire_blob(sha256: str, size: int) -> Blob:
+    """
+    Новая ссылка на блоб; запись блоба создаётся, если её ещё нет.
+    Если ``stored`` у результата ложно, содержимое нужно записать
+    в MinIO и вызвать ``mark_stored``.
+    :param sha256:
+    :param size:
+    :return:
+    """
+    with transaction.atomic():
+        blob, _ = Blob.objects.select_for_update().get_or_create(
+            sha256=sha256, defaults={"size": size}
+        )
+        blob.refcount = F("refcount") + 1
+        blob.save(update_fields=["refcount", "updated_at"])
+        blob.refresh_from_db()
+    return blob
+
+
+def mark_stored(sha256: str, etag: str) -> None:
+    Blob.objects.filter(sha256=sha256).update(stored=True, etag=etag,
+                                              updated_at=timezone.now())
+
+
+def release_blobs(blob_ids) -> None:
+    """
+    Снятие ссылок на блобы (по одной на каждый элемент).
+    Блобы без ссылок не удаляются сразу: их объекты удаляет
+    ``purge_blobs`` после STORAGE_BLOB_GC_GRACE секунд.
+    :param blob_ids: хэши блобов, могут повторяться
+    :return:
+    """
+    counts = Counter(blob_id for blob_id in blob_ids if blob_id)
+    with transaction.atomic():
+        for blob_id, count in sorted(counts.items()):
+            Blob.objects.filter(sha256=blob_id).update(
+                refcount=Greatest(F("refcount") - count, 0),
+                updated_at=timezone.now()
+            )
+
+
+def get_unreferenced_blobs(limit: int):
+    """
+    Блобы без ссылок старше STORAGE_BLOB_GC_GRACE, заблокированные
+    до конца транзакции (вызывается внутри transaction.atomic).
+    :param limit:
+    :return:
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.STORAGE_BLOB_GC_GRACE)
+    return list(Blob.objects
+                .select_for_update(skip_locked=True)
+                .filter(refcount=0, updated_at__lt=deadline)
+                .order_by("updated_at")[:limit])
+
+
+def delete_blobs(blob_ids: list[str]) -> int:
+    """
+    Удаление записей блобов, на которые нет ссылок.
+    :param blob_ids:
+    :return: количество удалённых записей
+    """
+    deleted, _ = Blob.objects.filter(sha256__in=blob_ids, refcount=0).delete()
+    return deleted
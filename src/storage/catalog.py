@@ -0,0 +1,895 @@
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Concat, Length, Substr
+from django.utils import timezone
+
+from src.storage.blobs import release_blobs
+from src.storage.changes import log_changes
+from src.storage.exceptions import RestoreConflictError, TrashItemNotFoundError
+from src.storage.models import (
+    SearchTrigram,
+    StorageChange,
+    StorageUsage,
+    StoredObject,
+    TrashItem,
+)
+
+
+# Количество записей в одном запросе при пакетной записи каталога
+BATCH_SIZE = 1000
+
+# Начало путей записей в корзине: "/trash/<id>/<исходный путь>".
+# Пути пользователя не начинаются с "/", поэтому записи корзины
+# не пересекаются с ними и не видны в списках папок
+TRASH_PREFIX = "/trash/"
+
+# Поля, которые обновляются при повторной записи существующего файла
+UPSERT_FIELDS = ["parent", "name", "is_folder", "size", "etag",
+                 "content_type", "modified_at", "blob"]
+
+
+def split_path(path: str) -> tuple[str, str]:
+    """
+    Разделение пути на родительскую папку и имя.
+    "a/b/c.txt" -> ("a/b/", "c.txt"); "a/b/" -> ("a/", "b/")
+    :param path:
+    :return:
+    """
+    is_folder = path.endswith("/")
+    parts = path.rstrip("/").split("/")
+    parent = "/".join(parts[:-1]) + "/" if len(parts) > 1 else ""
+    return parent, parts[-1] + ("/" if is_folder else "")
+
+
+def get_ancestor_folders(path: str) -> list[str]:
+    """
+    Все папки, в которых лежит файл или папка.
+    "a/b/c.txt" -> ["a/", "a/b/"]
+    :param path:
+    :return:
+    """
+    parts = path.rstrip("/").split("/")[:-1]
+    return ["/".join(parts[:i]) + "/" for i in range(1, len(parts) + 1)]
+
+
+def build_entry(user_id: int, path: str, **fields) -> StoredObject:
+    parent, name = split_path(path)
+    return StoredObject(owner_id=user_id, path=path, parent=parent, name=name,
+                        is_folder=path.endswith("/"), **fields)
+
+
+def ensure_folders(user_id: int, folders: list[str]) -> None:
+    """
+    Создание записей папок, которых ещё нет в каталоге.
+    :param user_id:
+    :param folders: пути папок с "/" в конце
+    :return:
+    """
+    if folders:
+        StoredObject.objects.bulk_create(
+            [build_entry(user_id, folder) for folder in folders],
+            ignore_conflicts=True,
+        )
+
+
+def upsert_entries(entries: list[StoredObject]) -> None:
+    """
+    Вставка или обновление записей одним запросом (INSERT ... ON CONFLICT).
+    Счётчики места обновляются на разницу размеров, ссылки заменённых
+    записей на блобы снимаются.
+    :param entries:
+    :return:
+    """
+    if not entries:
+        return
+    new_entries = {(entry.owner_id, entry.path): entry for entry in entries}
+    existing = {
+        (owner_id, path): (size, is_folder, blob_id)
+        for owner_id, path, size, is_folder, blob_id in
+        StoredObject.objects
+        .filter(owner_id__in={owner_id for owner_id, _ in new_entries},
+                path__in=[path for _, path in new_entries])
+        .values_list("owner_id", "path", "size", "is_folder", "blob_id")
+    }
+    released = []
+    changes = defaultdict(list)
+    for (owner_id, path), entry in new_entries.items():
+        old = existing.get((owner_id, path))
+        if old is not None and old[2] is not None and old[2] != entry.blob_id:
+            released.append(old[2])
+        if entry.is_folder:
+            continue
+        if old is None or old[1]:
+            changes[owner_id].append((path, entry.size, 1))
+        else:
+            changes[owner_id].append((path, entry.size - old[0], 0))
+
+    with transaction.atomic():
+        StoredObject.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=["owner", "path"],
+            update_fields=UPSERT_FIELDS,
+            batch_size=BATCH_SIZE,
+        )
+        for owner_id, owner_changes in changes.items():
+            update_usage(owner_id, owner_changes)
+        release_blobs(released)
+
+
+def update_usage(user_id: int, changes: list[tuple[str, int, int]]) -> None:
+    """
+    Изменение счётчиков места пользователя и всех папок над изменёнными
+    путями. Папки с одинаковым изменением обновляются одним запросом.
+    :param user_id:
+    :param changes: тройки (путь файла или папки, изменение размера,
+    изменение количества файлов)
+    :return:
+    """
+    total_size, total_objects = 0, 0
+    folders = defaultdict(lambda: [0, 0])
+    for path, size, objects in changes:
+        total_size += size
+        total_objects += objects
+        for folder in get_ancestor_folders(path):
+            folders[folder][0] += size
+            folders[folder][1] += objects
+
+    groups = defaultdict(list)
+    for folder, delta in folders.items():
+        if delta != [0, 0]:
+            groups[tuple(delta)].append(folder)
+    with transaction.atomic():
+        for (size, objects), paths in groups.items():
+            StoredObject.objects.filter(owner_id=user_id, path__in=paths).update(
+                total_size=F("total_size") + size,
+                total_objects=F("total_objects") + objects,
+            )
+        if total_size or total_objects:
+            StorageUsage.objects.get_or_create(owner_id=user_id)
+            StorageUsage.objects.filter(owner_id=user_id).update(
+                bytes_used=F("bytes_used") + total_size,
+                objects_count=F("objects_count") + total_objects,
+            )
+
+
+def recompute_usage(user_id: int) -> dict:
+    """
+    Пересчёт счётчиков места пользователя и его папок по каталогу.
+    :param user_id:
+    :return: счётчики пользователя до и после пересчёта
+    """
+    files = StoredObject.objects.filter(owner_id=user_id, is_folder=False)
+    subtree = (files.filter(path__startswith=OuterRef("path"))
+               .order_by().values("owner_id"))
+    totals = files.aggregate(objects=Count("id"), bytes=Sum("size"))
+    with transaction.atomic():
+        usage, _ = (StorageUsage.objects.select_for_update()
+                    .get_or_create(owner_id=user_id))
+        before = {"bytes": usage.bytes_used, "objects": usage.objects_count}
+        usage.bytes_used = totals["bytes"] or 0
+        usage.objects_count = totals["objects"]
+        usage.save(update_fields=["bytes_used", "objects_count"])
+        StoredObject.objects.filter(owner_id=user_id, is_folder=True).update(
+            total_size=Coalesce(Subquery(
+                subtree.annotate(total=Sum("size")).values("total")
+            ), 0),
+            total_objects=Coalesce(Subquery(
+                subtree.annotate(total=Count("id")).values("total")
+            ), 0),
+        )
+    return {"before": before,
+            "after": {"bytes": usage.bytes_used, "objects": usage.objects_count}}
+
+
+def get_trigrams(name: str) -> set[str]:
+    """
+    Триграммы имени в нижнем регистре.
+    "Отчёт.txt" -> {"отч", "тчё", "чёт", ...}
+    :param name:
+    :return:
+    """
+    name = name.rstrip("/").lower()
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+
+def index_entries(user_id: int, paths: list[str]) -> None:
+    """
+    Добавление в поисковый индекс записей, которых в нём ещё нет.
+    :param user_id:
+    :param paths:
+    :return:
+    """
+    entries = (StoredObject.objects
+               .filter(owner_id=user_id, path__in=paths, trigrams__isnull=True)
+               .values_list("id", "name"))
+    SearchTrigram.objects.bulk_create(
+        [
+            SearchTrigram(owner_id=user_id, entry_id=entry_id, trigram=trigram)
+            for entry_id, name in entries
+            for trigram in get_trigrams(name)
+        ],
+        ignore_conflicts=True,
+        batch_size=BATCH_SIZE,
+    )
+
+
+def record_file(
+        user_id: int,
+        file_name: str,
+        size: int,
+        etag: str = "",
+        content_type: str = "",
+        modified_at: datetime | None = None,
+        blob_id: str | None = None
+) -> None:
+    """
+    Запись загруженного файла в каталог вместе с недостающими папками.
+    :param user_id:
+    :param file_name:
+    :param size:
+    :param etag:
+    :param content_type:
+    :param modified_at:
+    :param blob_id: хэш блоба, если файл хранится с дедупликацией
+    :return:
+    """
+    record_files(user_id, [{
+        "file_name": file_name, "size": size, "etag": etag,
+        "content_type": content_type, "modified_at": modified_at,
+        "blob_id": blob_id,
+    }])
+
+
+def record_files(user_id: int, files: list[dict]) -> None:
+    """
+    Запись нескольких загруженных файлов в каталог одной транзакцией.
+    :param user_id:
+    :param files: описания файлов (file_name, size и необязательные
+    etag, content_type, modified_at, blob_id)
+    :return:
+    """
+    now = timezone.now()
+    entries = [
+        build_entry(
+            user_id, file["file_name"], size=file["size"],
+            etag=file.get("etag") or "",
+            content_type=file.get("content_type") or "",
+            modified_at=file.get("modified_at") or now,
+            blob_id=file.get("blob_id"),
+        )
+        for file in files
+    ]
+    folders = sorted({folder for file in files
+                      for folder in get_ancestor_folders(file["file_name"])})
+    with transaction.atomic():
+        ensure_folders(user_id, folders)
+        upsert_entries(entries)
+        index_entries(user_id, folders + [file["file_name"] for file in files])
+        drop_overwritten_trash(user_id, [entry.path for entry in entries
+                                         if entry.blob_id is None])
+        # Недостающие родительские папки клиент создаёт сам по пути файла
+        log_changes(user_id, [
+            {"action": StorageChange.UPLOAD, "path": entry.path,
+             "size": entry.size, "etag": entry.etag}
+            for entry in entries
+        ])
+
+
+def record_folder(user_id: int, folder: str) -> None:
+    """
+    Запись папки в каталог вместе с родительскими папками.
+    :param user_id:
+    :param folder: путь папки с "/" в конце
+    :return:
+    """
+    folders = get_ancestor_folders(folder) + [folder]
+    with transaction.atomic():
+        ensure_folders(user_id, folders)
+        index_entries(user_id, folders)
+        log_changes(user_id, [{"action": StorageChange.CREATE_FOLDER,
+                               "path": folder}])
+
+
+def get_subtree_filter(path: str) -> Q:
+    """
+    Условие на запись и всё её содержимое (для папок).
+    :param path:
+    :return:
+    """
+    if path.endswith("/"):
+        return Q(path__startswith=path)
+    return Q(path=path) | Q(path__startswith=path + "/")
+
+
+def get_subtree_totals(user_id: int, path: str) -> dict:
+    """
+    Количество и общий размер файлов в папке со всеми вложенными
+    (или одного файла).
+    :param user_id:
+    :param path:
+    :return: словарь с ключами ``objects`` и ``bytes``
+    """
+    totals = (StoredObject.objects
+              .filter(owner_id=user_id, is_folder=False)
+              .filter(get_subtree_filter(path))
+              .aggregate(objects=Count("id"), bytes=Sum("size")))
+    return {"objects": totals["objects"], "bytes": totals["bytes"] or 0}
+
+
+def get_root_paths(path: str) -> list[str]:
+    """
+    Записи, которые удаляет ``remove_path``, без их содержимого:
+    путь с "/" в конце - папка, без него - файл и одноимённая папка.
+    :param path:
+    :return:
+    """
+    if path.endswith("/"):
+        return [path]
+    return [path, path + "/"]
+
+
+def get_existing_paths(user_id: int, paths: list[str]) -> list[str]:
+    """
+    Пути из списка, которые есть в каталоге.
+    :param user_id:
+    :param paths:
+    :return:
+    """
+    return sorted(StoredObject.objects.filter(owner_id=user_id, path__in=paths)
+                  .values_list("path", flat=True))
+
+
+def remove_path(user_id: int, path: str, roots: list[str] | None = None) -> int:
+    """
+    Удаление файла или папки со всем содержимым из каталога.
+    В журнал изменений попадает одна запись на удалённый корень,
+    а не на каждый вложенный файл.
+    :param user_id:
+    :param path:
+    :param roots: удалённые корни для журнала, если их записи уже
+    убраны из каталога по частям (по умолчанию - найденные в каталоге)
+    :return: количество удалённых записей
+    """
+    entries = (StoredObject.objects
+               .filter(owner_id=user_id)
+               .filter(get_subtree_filter(path)))
+    with transaction.atomic():
+        if roots is None:
+            roots = get_existing_paths(user_id, get_root_paths(path))
+        totals = get_subtree_totals(user_id, path)
+        update_usage(user_id, [(path, -totals["bytes"], -totals["objects"])])
+        blob_ids = list(entries.filter(blob__isnull=False)
+                        .values_list("blob_id", flat=True))
+        SearchTrigram.objects.filter(
+            owner_id=user_id, entry__in=entries.values("id")
+        ).delete()
+        deleted, _ = entries.delete()
+        release_blobs(blob_ids)
+        log_changes(user_id, [{"action": StorageChange.DELETE, "path": root}
+                              for root in roots])
+    return deleted
+
+
+def remove_entries(user_id: int, paths: list[str]) -> int:
+    """
+    Удаление из каталога конкретных записей (без содержимого папок).
+    В журнал изменений записи не попадают: их удаление - часть
+    удаления папки, которое записывает ``remove_path``.
+    :param user_id:
+    :param paths:
+    :return: количество удалённых записей
+    """
+    entries = StoredObject.objects.filter(owner_id=user_id, path__in=paths)
+    with transaction.atomic():
+        update_usage(user_id, [
+            (file_path, -size, -1) for file_path, size in
+            entries.filter(is_folder=False).values_list("path", "size")
+        ])
+        blob_ids = list(entries.filter(blob__isnull=False)
+                        .values_list("blob_id", flat=True))
+        SearchTrigram.objects.filter(
+            owner_id=user_id, entry__in=entries.values("id")
+        ).delete()
+        deleted, _ = entries.delete()
+        release_blobs(blob_ids)
+    return deleted
+
+
+def move_path(user_id: int, old_path: str, new_path: str) -> None:
+    """
+    Перенос файла или папки в каталоге.
+    Содержимое папки переносится одним UPDATE с заменой префикса пути.
+    :param user_id:
+    :param old_path:
+    :param new_path:
+    :return:
+    """
+    parent, name = split_path(new_path)
+    entries = StoredObject.objects.filter(owner_id=user_id)
+    with transaction.atomic():
+        totals = get_subtree_totals(user_id, old_path)
+        folders = get_ancestor_folders(new_path)
+        ensure_folders(user_id, folders)
+        update_usage(user_id, [
+            (old_path, -totals["bytes"], -totals["objects"]),
+            (new_path, totals["bytes"], totals["objects"]),
+        ])
+        entries.filter(path=old_path).update(
+            path=new_path, parent=parent, name=name,
+            modified_at=timezone.now(),
+        )
+        # Имена вложенных записей не меняются, переиндексируется только корень
+        SearchTrigram.objects.filter(
+            owner_id=user_id, entry__in=entries.filter(path=new_path).values("id")
+        ).delete()
+        index_entries(user_id, folders + [new_path])
+        if old_path.endswith("/"):
+            offset = len(old_path) + 1
+            entries.filter(path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr("path", offset)),
+                parent=Concat(Value(new_path), Substr("parent", offset)),
+            )
+        drop_overwritten_trash(user_id, [new_path])
+        log_changes(user_id, [{"action": StorageChange.MOVE, "path": old_path,
+                               "new_path": new_path}])
+
+
+def get_trash_prefix(item_id: int) -> str:
+    return f"{TRASH_PREFIX}{item_id}/"
+
+
+def get_root_filter(path: str) -> Q:
+    # Одна запись файла или папка со всем содержимым
+    return Q(path__startswith=path) if path.endswith("/") else Q(path=path)
+
+
+def trash_path(user_id: int, path: str) -> list[TrashItem]:
+    """
+    Перенос файла или папки в корзину. Записи каталога получают путь
+    в корзине одним UPDATE, MinIO не затрагивается. Счётчики папок
+    над удалённой записью уменьшаются, а общий счётчик пользователя -
+    нет: корзина занимает место до очистки.
+    :param user_id:
+    :param path: путь с "/" в конце - папка; без него - файл
+    и одноимённая папка
+    :return: созданные записи корзины
+    """
+    items = []
+    with transaction.atomic():
+        for root in get_existing_paths(user_id, get_root_paths(path)):
+            totals = get_subtree_totals(user_id, root)
+            item = TrashItem.objects.create(owner_id=user_id, path=root,
+                                            objects_count=totals["objects"],
+                                            size=totals["bytes"])
+            prefix = get_trash_prefix(item.id)
+            update_usage(user_id, [
+                (root, -totals["bytes"], -totals["objects"]),
+                (prefix + root, totals["bytes"], totals["objects"]),
+            ])
+            (StoredObject.objects.filter(owner_id=user_id)
+             .filter(get_root_filter(root))
+             .update(path=Concat(Value(prefix), F("path")),
+                     parent=Concat(Value(prefix), F("parent"))))
+            items.append(item)
+        log_changes(user_id, [{"action": StorageChange.DELETE, "path": item.path}
+                              for item in items])
+    return items
+
+
+def restore_trash_item(user_id: int, item_id: int) -> TrashItem:
+    """
+    Восстановление файла или папки из корзины по исходному пути -
+    обратный перенос записей одним UPDATE.
+    :param user_id:
+    :param item_id:
+    :return: восстановленная запись корзины
+    """
+    with transaction.atomic():
+        item = (TrashItem.objects.select_for_update()
+                .filter(owner_id=user_id, id=item_id).first())
+        if item is None:
+            raise TrashItemNotFoundError(item_id)
+        if StoredObject.objects.filter(owner_id=user_id, path=item.path).exists():
+            raise RestoreConflictError(item.path)
+        prefix = get_trash_prefix(item.id)
+        folders = get_ancestor_folders(item.path)
+        ensure_folders(user_id, folders)
+        offset = len(prefix) + 1
+        StoredObject.objects.filter(owner_id=user_id, path__startswith=prefix).update(
+            path=Substr("path", offset), parent=Substr("parent", offset),
+        )
+        index_entries(user_id, folders)
+        # Перезаписанные файлы из корзины уже убраны - итоги считаются заново
+        totals = get_subtree_totals(user_id, item.path)
+        update_usage(user_id, [
+            (prefix + item.path, -totals["bytes"], -totals["objects"]),
+            (item.path, totals["bytes"], totals["objects"]),
+        ])
+        # Удаление запросом, а не item.delete(): у возвращаемой записи
+        # остаётся id, по которому клиент её восстанавливал
+        TrashItem.objects.filter(id=item.id).delete()
+        if item.path.endswith("/"):
+            # Клиенту синхронизации нужно прочитать папку заново
+            change = {"action": StorageChange.RESCAN, "path": item.path}
+        else:
+            entry = get_entry(user_id, item.path)
+            change = {"action": StorageChange.UPLOAD, "path": item.path,
+                      "size": entry.size, "etag": entry.etag}
+        log_changes(user_id, [change])
+    return item
+
+
+def drop_overwritten_trash(user_id: int, paths: list[str]) -> int:
+    """
+    Удаление из корзины файлов, объекты которых только что перезаписаны:
+    у файла в корзине и живого файла с тем же путём общий объект MinIO.
+    Без этого восстановление вернуло бы новое содержимое, а очистка
+    корзины удалила бы живой файл.
+    :param user_id:
+    :param paths: записанные пути файлов (хранящихся не в блобах)
+    или папок, содержимое которых записано целиком
+    :return: количество удалённых из корзины записей
+    """
+    if not paths:
+        return 0
+    folders = [path for path in paths if path.endswith("/")]
+    condition = Q(path__in={folder for path in paths
+                            for folder in get_ancestor_folders(path)} | set(paths))
+    for folder in folders:
+        condition |= Q(path__startswith=folder)
+    items = list(TrashItem.objects.filter(owner_id=user_id).filter(condition)
+                 .values_list("id", flat=True))
+    if not items:
+        return 0
+    written = Q()
+    for path in paths:
+        written |= get_root_filter(path)
+    plain_files = StoredObject.objects.filter(owner_id=user_id, is_folder=False,
+                                              blob__isnull=True)
+    overwritten = []
+    for item_id in items:
+        prefix = get_trash_prefix(item_id)
+        live = (plain_files.filter(written)
+                .annotate(trash_path=Concat(Value(prefix), F("path")))
+                .values("trash_path"))
+        overwritten += plain_files.filter(path__startswith=prefix, path__in=live) \
+            .values_list("path", flat=True)
+    return remove_entries(user_id, overwritten) if overwritten else 0
+
+
+def iter_trash_files(user_id: int, item_id: int):
+    """
+    Файлы записи корзины, объекты которых нужно удалить при очистке:
+    хранящиеся под своим путём и не перезаписанные живыми файлами.
+    :param user_id:
+    :param item_id:
+    :return: пути файлов в корзине
+    """
+    prefix = get_trash_prefix(item_id)
+    live = StoredObject.objects.filter(
+        owner_id=user_id, blob__isnull=True,
+        path=Substr(OuterRef("path"), len(prefix) + 1),
+    )
+    return (StoredObject.objects
+            .filter(owner_id=user_id, path__startswith=prefix,
+                    is_folder=False, blob__isnull=True)
+            .exclude(Exists(live))
+            .order_by("path")
+            .values_list("path", flat=True)
+            .iterator())
+
+
+def get_entry(user_id: int, path: str) -> StoredObject | None:
+    """
+    Запись каталога по пути файла или папки.
+    :param user_id:
+    :param path:
+    :return:
+    """
+    return StoredObject.objects.filter(owner_id=user_id, path=path).first()
+
+
+def get_live_file(user_id: int, path: str) -> dict | None:
+    """
+    Запись файла, который можно прочитать: не папки и не файла в корзине.
+    :param user_id:
+    :param path:
+    :return: словарь с ``blob_id`` или None, если такого файла нет
+    """
+    if path.startswith(TRASH_PREFIX):
+        return None
+    return (StoredObject.objects
+            .filter(owner_id=user_id, path=path, is_folder=False)
+            .values("blob_id").first())
+
+
+def get_blob_id(user_id: int, path: str) -> str | None:
+    """
+    Хэш блоба, в котором хранится файл (None - файл хранится
+    под своим путём или его нет в каталоге).
+    :param user_id:
+    :param path:
+    :return:
+    """
+    return (StoredObject.objects.filter(owner_id=user_id, path=path)
+            .values_list("blob_id", flat=True).first())
+
+
+def get_entry_versions(user_id: int, paths: list[str]) -> dict[str, dict]:
+    """
+    ETag, дата изменения и блоб записей каталога по путям.
+    :param user_id:
+    :param paths:
+    :return: словарь путь -> etag, modified_at, blob_id
+    """
+    return {
+        row["path"]: row for row in
+        StoredObject.objects.filter(owner_id=user_id, path__in=paths)
+        .values("path", "etag", "modified_at", "blob_id")
+    }
+
+
+def get_trashed_paths(user_id: int, paths: list[str]) -> set[str]:
+    """
+    Пути из списка, по которым лежат записи корзины: объекты MinIO
+    остаются на исходных путях до очистки корзины.
+    :param user_id:
+    :param paths:
+    :return:
+    """
+    if not paths:
+        return set()
+    condition = Q()
+    for path in paths:
+        condition |= Q(path__endswith=f"/{path}")
+    trashed = (StoredObject.objects
+               .filter(condition, owner_id=user_id, path__startswith=TRASH_PREFIX)
+               .values_list("path", flat=True))
+    return {path.split("/", 3)[3] for path in trashed} & set(paths)
+
+
+def get_plain_files(user_id: int, paths: list[str]) -> list[str]:
+    """
+    Пути из списка, по которым в каталоге есть файлы,
+    хранящиеся под своим путём (не в блобах).
+    :param user_id:
+    :param paths:
+    :return:
+    """
+    if not paths:
+        return []
+    return list(StoredObject.objects
+                .filter(owner_id=user_id, path__in=paths,
+                        is_folder=False, blob__isnull=True)
+                .values_list("path", flat=True))
+
+
+def iter_folder_files(user_id: int, folder: str):
+    """
+    Файлы папки со всеми вложенными, без записей папок и корзины.
+    :param user_id:
+    :param folder: путь папки с "/" в конце
+    :return: пути, хэши блобов (None - файл под своим путём),
+    размеры и даты изменения
+    """
+    return (StoredObject.objects
+            .filter(owner_id=user_id, path__startswith=folder,
+                    is_folder=False)
+            .order_by("path")
+            .values("path", "blob_id", "size", "modified_at")
+            .iterator())
+
+
+def encode_cursor(entry: dict) -> str:
+    raw = json.dumps([entry["is_folder"], entry["name"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[bool, str]:
+    """
+    Ключ (is_folder, name) последней записи из курсора страницы.
+    :param cursor:
+    :return: ValueError, если курсор выдан не ``encode_cursor``
+    """
+    value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if (not isinstance(value, list) or len(value) != 2
+            or not isinstance(value[0], bool) or not isinstance(value[1], str)):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    is_folder, name = value
+    return is_folder, name
+
+
+def list_folder_page(
+        user_id: int,
+        path: str,
+        cursor: str | None,
+        limit: int
+) -> dict:
+    """
+    Страница содержимого папки из каталога.
+    Пагинация по ключу (is_folder, name) идёт по индексу
+    stored_object_listing, поэтому стоимость страницы не зависит
+    ни от её номера, ни от размера вложенных папок.
+    :param user_id:
+    :param path: путь папки с "/" в конце (пустая строка - корень)
+    :param cursor: курсор следующей страницы из предыдущего ответа
+    :param limit: максимальное количество записей на странице
+    :return: словарь со списком ``files`` и курсором ``next_cursor``
+    """
+    entries = (StoredObject.objects
+               .filter(owner_id=user_id, parent=path)
+               .order_by("-is_folder", "name"))
+    if cursor:
+        try:
+            is_folder, name = decode_cursor(cursor)
+        except ValueError:
+            is_folder, name = True, ""
+        entries = entries.filter(
+            Q(is_folder__lt=is_folder) | Q(is_folder=is_folder, name__gt=name)
+        )
+    rows = list(entries.values("path", "name", "is_folder")[:limit + 1])
+
+    files = [
+        {"id": row["path"], "name": row["name"], "is_folder": row["is_folder"]}
+        for row in rows[:limit]
+    ]
+    return {
+        "files": files,
+        "next_cursor": encode_cursor(rows[limit - 1]) if len(rows) > limit
+        else None,
+    }
+
+
+def search_entries(user_id: int, query: str, page: int, limit: int) -> dict:
+    """
+    Поиск файлов и папок пользователя по части имени.
+    Кандидаты отбираются по триграммному индексу: запись должна содержать
+    все триграммы запроса. Запросы короче трёх символов триграмм не имеют
+    и проверяются по всем записям пользователя.
+    Результаты упорядочены по релевантности: точное совпадение имени,
+    совпадение с начала имени, затем более короткие имена.
+    :param user_id:
+    :param query:
+    :param page: номер страницы, начиная с 1
+    :param limit: количество результатов на странице
+    :return: словарь со списком ``files`` и признаком ``has_next``
+    """
+    entries = (StoredObject.objects
+               .filter(owner_id=user_id, name__icontains=query)
+               .exclude(path__startswith=TRASH_PREFIX))
+    trigrams = get_trigrams(query)
+    if trigrams:
+        candidates = (SearchTrigram.objects
+                      .filter(owner_id=user_id, trigram__in=trigrams)
+                      .values("entry")
+                      .annotate(matched=Count("trigram"))
+                      .filter(matched=len(trigrams))
+                      .values("entry"))
+        entries = entries.filter(id__in=candidates)
+
+    entries = entries.annotate(
+        rank=Case(
+            When(Q(name__iexact=query) | Q(name__iexact=query.rstrip("/") + "/"),
+                 then=Value(0)),
+            When(name__istartswith=query, then=Value(1)),
+            default=Value(2),
+        ),
+        name_length=Length("name"),
+    ).order_by("rank", "name_length", "name", "id")
+    offset = (page - 1) * limit
+    rows = list(entries.values("name", "parent", "is_folder")
+                [offset:offset + limit + 1])
+
+    files = [
+        {
+            "name": row["name"],
+            "folder_path": row["parent"].rstrip("/"),  # Родительская папка
+            "is_folder": row["is_folder"],
+        }
+        for row in rows[:limit]
+    ]
+    return {"files": files, "has_next": len(rows) > limit}
+
+
+def reconcile_user(user_id: int, objects) -> dict:
+    """
+    Сверка каталога пользователя с содержимым бакета.
+    Недостающие записи создаются, изменившиеся обновляются,
+    лишние (объектов уже нет в MinIO) удаляются. Файлы, хранящиеся
+    в блобах, и записи корзины не удаляются.
+    :param user_id:
+    :param objects: объекты MinIO в виде пар (путь, метаданные),
+    где путь указан относительно папки пользователя
+    :return: количество созданных/обновлённых и удалённых записей
+    """
+    existing = {
+        row["path"]: row for row in
+        StoredObject.objects.filter(owner_id=user_id)
+        .values("path", *UPSERT_FIELDS)
+    }
+    # Объекты файлов в корзине лежат на исходных путях до очистки
+    # корзины: живыми файлами они не считаются
+    trashed = {path.split("/", 3)[3] for path in existing
+               if path.startswith(TRASH_PREFIX)}
+
+    expected = {}
+    for path, metadata in objects:
+        if path in trashed and path not in existing:
+            continue
+        for folder in get_ancestor_folders(path):
+            expected.setdefault(folder, build_entry(user_id, folder))
+        if path.endswith("/.keep") or path == ".keep":
+            # Пустой объект-метка папки
+            continue
+        if path.endswith("/"):
+            expected.setdefault(path, build_entry(user_id, path))
+            continue
+        expected[path] = build_entry(
+            user_id, path,
+            size=metadata["size"],
+            etag=metadata["etag"] or "",
+            content_type=metadata.get("content_type") or "",
+            modified_at=metadata["last_modified"],
+        )
+
+    changed = [
+        entry for path, entry in expected.items()
+        if path not in existing or any(
+            existing[path][field] != getattr(entry, field)
+            for field in ("size", "etag", "is_folder")
+        )
+    ]
+    # Файлы с дедупликацией лежат вне папки пользователя и среди
+    # её объектов не видны: они и их папки не считаются лишними
+    kept = {path for path, row in existing.items()
+            if (row["blob"] is not None or path.startswith(TRASH_PREFIX))
+            and path not in expected}
+    kept.update(folder for path in list(kept)
+                for folder in get_ancestor_folders(path))
+    stale = [path for path in existing
+             if path not in expected and path not in kept]
+
+    with transaction.atomic():
+        for start in range(0, len(changed), BATCH_SIZE):
+            upsert_entries(changed[start:start + BATCH_SIZE])
+        # Индексируются и записи, созданные до появления поискового индекса
+        paths = list(expected)
+        for start in range(0, len(paths), BATCH_SIZE):
+            index_entries(user_id, paths[start:start + BATCH_SIZE])
+        for start in range(0, len(stale), BATCH_SIZE):
+            stale_entries = StoredObject.objects.filter(
+                owner_id=user_id, path__in=stale[start:start + BATCH_SIZE]
+            )
+            blob_ids = list(stale_entries.filter(blob__isnull=False)
+                            .values_list("blob_id", flat=True))
+            SearchTrigram.objects.filter(
+                owner_id=user_id, entry__in=stale_entries.values("id")
+            ).delete()
+            stale_entries.delete()
+            release_blobs(blob_ids)
+        # Изменения, сделанные в MinIO в обход приложения
+        log_changes(user_id, [
+            {"action": StorageChange.CREATE_FOLDER, "path": entry.path}
+            if entry.is_folder else
+            {"action": StorageChange.UPLOAD, "path": entry.path,
+             "size": entry.size, "etag": entry.etag}
+            for entry in changed
+        ] + [{"action": StorageChange.DELETE, "path": path} for path in stale])
+    return {"upserted": len(changed), "deleted": len(stale)}
@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from src.storage.exceptions import ChangeCursorExpiredError
+from src.storage.models import StorageChange, StorageUsage
+
+# Количество записей в одном запросе при удалении устаревшего журнала
+PRUNE_BATCH_SIZE = 10000
+
+
+def log_changes(user_id: int, changes: list[dict]) -> None:
+    """
+    Запись изменений в журнал пользователя.
+    Номера выдаются из счётчика ``StorageUsage.change_seq``: строка
+    счётчика остаётся заблокированной до конца транзакции, поэтому
+    записи пользователя фиксируются строго в порядке номеров и клиент,
+    прочитавший журнал до номера N, не пропустит запись с меньшим
+    номером. Вызывается в конце транзакции каталога, после
+    ``update_usage``, чтобы строки блокировались в одном порядке.
+    :param user_id:
+    :param changes: изменения (action, path и необязательные new_path,
+    size, etag)
+    :return:
+    """
+    if not changes:
+        return
+    with transaction.atomic():
+        StorageUsage.objects.get_or_create(owner_id=user_id)
+        usage = StorageUsage.objects.filter(owner_id=user_id)
+        usage.update(change_seq=F("change_seq") + len(changes))
+        last_seq = usage.values_list("change_seq", flat=True).get()
+        now = timezone.now()
+        StorageChange.objects.bulk_create([
+            StorageChange(
+                owner_id=user_id, seq=seq, action=change["action"],
+                path=change["path"], new_path=change.get("new_path") or "",
+                size=change.get("size") or 0, etag=change.get("etag") or "",
+                created_at=now,
+            )
+            for seq, change in enumerate(changes, last_seq - len(changes) + 1)
+        ], batch_size=1000)
+
+
+def get_head(user_id: int) -> int:
+    """
+    Номер последней записи журнала пользователя.
+    :param user_id:
+    :return:
+    """
+    return (StorageUsage.objects.filter(owner_id=user_id)
+            .values_list("change_seq", flat=True).first()) or 0
+
+
+def serialize_change(change: dict) -> dict:
+    """
+    Компактное представление записи журнала: пустые поля опускаются,
+    папки отличаются "/" в конце пути.
+    :param change:
+    :return:
+    """
+    data = {"action": change["action"], "path": change["path"]}
+    if change["new_path"]:
+        data["new_path"] = change["new_path"]
+    if change["action"] == StorageChange.UPLOAD:
+        data["size"] = change["size"]
+        data["etag"] = change["etag"]
+    return data
+
+
+def get_changes(user_id: int, since: int, limit: int) -> dict:
+    """
+    Страница журнала изменений после курсора.
+    Запрос идёт по индексу (owner, seq), поэтому стоимость
+    синхронизации зависит от числа изменений, а не от числа файлов.
+    :param user_id:
+    :param since: номер последней записи, которую клиент уже применил
+    :param limit: максимальное количество записей на странице
+    :return: изменения ``changes``, курсор следующего запроса ``cursor``
+    и признак ``has_more`` - есть ли ещё записи после страницы
+    """
+    head = get_head(user_id)
+    if since > head:
+        raise ChangeCursorExpiredError(since)
+    rows = list(StorageChange.objects
+                .filter(owner_id=user_id, seq__gt=since)
+                .order_by("seq")
+                .values("seq", "action", "path", "new_path", "size", "etag")
+                [:limit])
+    # Номера идут подряд: разрыв означает, что нужные клиенту записи
+    # уже удалены из журнала
+    first_seq = rows[0]["seq"] if rows else head + 1
+    if since < head and first_seq != since + 1:
+        raise ChangeCursorExpiredError(since)
+    cursor = rows[-1]["seq"] if rows else since
+    return {
+        "changes": [serialize_change(row) for row in rows],
+        "cursor": str(cursor),
+        "has_more": cursor < head,
+    }
+
+
+def prune_changes(days: int = settings.STORAGE_CHANGE_LOG_TTL_DAYS) -> int:
+    """
+    Удаление записей журнала старше ``days`` дней. Клиентам с курсором
+    старше оставшихся записей нужна полная синхронизация.
+    :param days:
+    :return: количество удалённых записей
+    """
+    threshold = timezone.now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        ids = list(StorageChange.objects.filter(created_at__lt=threshold)
+                   .values_list("id", flat=True)[:PRUNE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += StorageChange.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import threading
+import weakref
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from django.conf import settings
+
+from src.storage.metrics import instrument_client
+
+# Клиенты текущего процесса; после fork дочерний процесс создаёт свои,
+# чтобы не делить с родителем пул соединений
+clients: dict[str, object] = {}
+clients_lock = threading.Lock()
+
+# Асинхронные клиенты по циклам событий: соединения aiohttp
+# привязаны к циклу, в котором созданы
+async_clients = weakref.WeakKeyDictionary()
+
+
+def reset_clients() -> None:
+    """
+    Сброс клиентов (вызывается в дочернем процессе после fork).
+    :return:
+    """
+    global clients_lock
+    clients.clear()
+    async_clients.clear()
+    clients_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_clients)
+
+
+def get_client_options(**overrides) -> dict:
+    """
+    Параметры клиента S3 из настроек: пул соединений, повторы,
+    таймауты и TCP keepalive.
+    :param overrides: параметры, заменяющие значения из настроек
+    :return: аргументы для botocore Config
+    """
+    options = {
+        "max_pool_connections": settings.STORAGE_S3_MAX_POOL_CONNECTIONS,
+        "retries": {
+            "mode": settings.STORAGE_S3_RETRY_MODE,
+            "max_attempts": settings.STORAGE_S3_MAX_ATTEMPTS,
+        },
+        "connect_timeout": settings.STORAGE_S3_CONNECT_TIMEOUT,
+        "read_timeout": settings.STORAGE_S3_READ_TIMEOUT,
+        "tcp_keepalive": settings.STORAGE_S3_TCP_KEEPALIVE,
+        "signature_version": "s3v4",
+        "s3": {"addressing_style": settings.AWS_S3_ADDRESSING_STYLE},
+    }
+    options.update(overrides)
+    return options
+
+
+def create_s3_client(endpoint_url: str):
+    return instrument_client(boto3.session.Session().client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        config=Config(**get_client_options()),
+    ))
+
+
+def get_client(name: str, endpoint_url: str):
+    """
+    Клиент S3, созданный при первом обращении в текущем процессе.
+    Клиент boto3 потокобезопасен и используется всеми потоками.
+    :param name:
+    :param endpoint_url:
+    :return:
+    """
+    client = clients.get(name)
+    if client is None:
+        with clients_lock:
+            client = clients.get(name)
+            if client is None:
+                client = clients[name] = create_s3_client(endpoint_url)
+    return client
+
+
+def get_s3_client():
+    """
+    Клиент S3 (MinIO) для запросов сервера к хранилищу.
+    :return:
+    """
+    return get_client("s3", settings.AWS_S3_ENDPOINT_URL)
+
+
+def get_presign_client():
+    """
+    Клиент для подписи ссылок: адрес MinIO, доступный из браузера
+    пользователя. Ссылки подписываются локально, запросов к MinIO нет.
+    :return:
+    """
+    return get_client("presign", settings.AWS_S3_PUBLIC_ENDPOINT_URL)
+
+
+async def get_async_s3_client():
+    """
+    Асинхронный клиент S3 (aiobotocore) текущего цикла событий.
+    Создаётся при первом обращении и живёт до конца процесса.
+    :return:
+    """
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+
+    loop = asyncio.get_running_loop()
+    client = async_clients.get(loop)
+    if client is None:
+        client = await get_session().create_client(
+            "s3",
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            config=AioConfig(**get_client_options()),
+        ).__aenter__()
+        instrument_client(client)
+        # Пока клиент создавался, его мог создать другой запрос
+        client = async_clients.setdefault(loop, client)
+    return client
+
+
+def get_transfer_config(operation: str) -> TransferConfig:
+    """
+    Параметры передачи файлов (порог и размер частей составной загрузки,
+    количество потоков) для операции из STORAGE_TRANSFER_CONFIG.
+    :param operation: "upload" или "copy"
+    :return:
+    """
+    return TransferConfig(**settings.STORAGE_TRANSFER_CONFIG[operation])
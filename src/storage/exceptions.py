@@ -34,3 +34,56 @@ class FileDeleteError(StorageError):
 
     def __init__(self, filename, error=None):
         super().__init__(f"Не удалось удалить файл: {filename}. '{error}'")
+
+class UploadSessionNotFoundError(StorageError):
+    """Сессия загрузки не найдена или принадлежит другому пользователю."""
+
+    def __init__(self, session_id):
+        super().__init__(f"Сессия загрузки '{session_id}' не найдена.")
+
+class UploadPartError(StorageError):
+    """Ошибка при загрузке части файла."""
+
+    def __init__(self, part_number, error):
+        super().__init__(f"Ошибка при загрузке части {part_number}: {error}")
+
+class FileMoveError(StorageError):
+    """Ошибка при переносе или переименовании файла."""
+
+    def __init__(self, filename, error):
+        super().__init__(f"Не удалось переместить '{filename}': {error}")
+
+class QuotaExceededError(StorageError):
+    """Загрузка превысит квоту пользователя."""
+
+    def __init__(self, required, available):
+        super().__init__(
+            f"Недостаточно места в хранилище: нужно {required} байт, "
+            f"доступно {max(available, 0)} байт."
+        )
+
+class JobNotFoundError(StorageError):
+    """Фоновая задача не найдена или принадлежит другому пользователю."""
+
+    def __init__(self, job_id):
+        super().__init__(f"Задача '{job_id}' не найдена.")
+
+class ChangeCursorExpiredError(StorageError):
+    """Курсор журнала изменений устарел: нужные записи уже удалены."""
+
+    def __init__(self, cursor):
+        super().__init__(
+            f"Курсор '{cursor}' устарел, нужна полная синхронизация."
+        )
+
+class TrashItemNotFoundError(StorageError):
+    """Запись корзины не найдена или принадлежит другому пользователю."""
+
+    def __init__(self, item_id):
+        super().__init__(f"Запись корзины '{item_id}' не найдена.")
+
+class RestoreConflictError(StorageError):
+    """По исходному пути восстанавливаемого файла уже есть файл или папка."""
+
+    def __init__(self, path):
+        super().__init__(f"Не удалось восстановить '{path}': путь уже занят.")
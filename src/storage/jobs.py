@@ -0,0 +1,322 @@
+import hashlib
+import json
+import logging
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django_redis import get_redis_connection
+
+from src.storage import catalog
+from src.storage.archives import export_folder_archive, get_export_key
+from src.storage.exceptions import JobNotFoundError, TrashItemNotFoundError
+from src.storage.listing_cache import invalidate_user_listings
+from src.storage.moves import move_file
+from src.storage.services import iter_user_objects
+from src.storage.trash import get_trash_item, purge_trash_item
+
+logger = logging.getLogger(__name__)
+
+# Очередь задач и задачи, взятые воркерами; списки Redis
+QUEUE_KEY = "storage:jobs:queue"
+PROCESSING_KEY = "storage:jobs:processing"
+# Сколько секунд воркер ждёт задачу в одном запросе к Redis
+# (меньше SOCKET_TIMEOUT клиента Redis)
+POLL_TIMEOUT = 2
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def get_job_cache_key(job_id: str) -> str:
+    return f"storage:job:{job_id}"
+
+
+def get_dedup_cache_key(user_id: int, kind: str, params: dict) -> str:
+    params_hash = hashlib.md5(
+        json.dumps(params, sort_keys=True).encode()
+    ).hexdigest()
+    return f"storage:job-dedup:{user_id}:{kind}:{params_hash}"
+
+
+def save_job(job: dict) -> None:
+    job["updated_at"] = time.time()
+    cache.set(get_job_cache_key(job["job_id"]), job,
+              timeout=settings.STORAGE_JOB_TTL)
+
+
+def submit_job(user_id: int, kind: str, params: dict) -> dict:
+    """
+    Постановка задачи в очередь. Пока такая же задача пользователя
+    (тот же вид и параметры) не завершилась, повторный вызов
+    возвращает её, а не создаёт новую.
+    :param user_id:
+    :param kind: вид задачи - ключ JOB_HANDLERS
+    :param params: параметры обработчика
+    :return: состояние задачи
+    """
+    job = {
+        "job_id": secrets.token_urlsafe(16),
+        "user_id": user_id,
+        "kind": kind,
+        "params": params,
+        "status": QUEUED,
+        "progress": {},
+        "result": None,
+        "error": None,
+        "attempts": 0,
+        "lease_until": None,
+        "created_at": time.time(),
+    }
+    dedup_key = get_dedup_cache_key(user_id, kind, params)
+    if not cache.add(dedup_key, job["job_id"], timeout=settings.STORAGE_JOB_TTL):
+        existing = cache.get(get_job_cache_key(cache.get(dedup_key) or ""))
+        if existing is not None and existing["status"] in (QUEUED, RUNNING):
+            return existing
+        cache.set(dedup_key, job["job_id"], timeout=settings.STORAGE_JOB_TTL)
+    save_job(job)
+    get_redis_connection("default").lpush(QUEUE_KEY, job["job_id"])
+    return job
+
+
+def get_job(user_id: int, job_id: str) -> dict:
+    """
+    Задача текущего пользователя.
+    :param user_id:
+    :param job_id:
+    :return:
+    """
+    job = cache.get(get_job_cache_key(job_id))
+    if job is None or job["user_id"] != user_id:
+        raise JobNotFoundError(job_id)
+    return job
+
+
+def recover_jobs() -> int:
+    """
+    Возврат в очередь задач, воркер которых перестал продлевать аренду
+    (например, процесс перезапустили посреди задачи). Задачи, состояние
+    которых истекло, просто убираются из списка выполняемых.
+    :return: количество возвращённых задач
+    """
+    connection = get_redis_connection("default")
+    recovered = 0
+    for raw_id in connection.lrange(PROCESSING_KEY, 0, -1):
+        job_id = raw_id.decode()
+        job = cache.get(get_job_cache_key(job_id))
+        # Аренда ещё не выдана, если воркер упал сразу после взятия задачи
+        expired = (job is None or job["status"] in (DONE, FAILED)
+                   or (job["lease_until"] or job["updated_at"]
+                       + settings.STORAGE_JOB_LEASE) < time.time())
+        # Задачу возвращает только тот воркер, который убрал её из списка
+        if expired and connection.lrem(PROCESSING_KEY, 1, raw_id):
+            if job is not None and job["status"] in (QUEUED, RUNNING):
+                connection.rpush(QUEUE_KEY, job_id)
+                recovered += 1
+    return recovered
+
+
+def claim_job(timeout: int = POLL_TIMEOUT) -> dict | None:
+    """
+    Взятие задачи из очереди: задача переносится в список выполняемых
+    и получает аренду на STORAGE_JOB_LEASE секунд.
+    :param timeout: сколько секунд ждать задачу
+    :return: задача или None, если очередь пуста
+    """
+    connection = get_redis_connection("default")
+    raw_id = connection.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+    if raw_id is None:
+        return None
+    job = cache.get(get_job_cache_key(raw_id.decode()))
+    if job is None or job["status"] not in (QUEUED, RUNNING):
+        connection.lrem(PROCESSING_KEY, 1, raw_id)
+        return None
+    if job["status"] == RUNNING and (job["lease_until"] or 0) > time.time():
+        # Задачу ещё выполняет другой воркер. Она остаётся в списке
+        # выполняемых: если воркер перестанет продлевать аренду,
+        # recover_jobs вернёт её в очередь
+        return None
+    job["status"] = RUNNING
+    job["attempts"] += 1
+    job["lease_until"] = time.time() + settings.STORAGE_JOB_LEASE
+    save_job(job)
+    return job
+
+
+def finish_job(job: dict, status: str) -> None:
+    job["status"] = status
+    job["lease_until"] = None
+    save_job(job)
+    dedup_key = get_dedup_cache_key(job["user_id"], job["kind"], job["params"])
+    if cache.get(dedup_key) == job["job_id"]:
+        cache.delete(dedup_key)
+    get_redis_connection("default").lrem(PROCESSING_KEY, 1, job["job_id"])
+
+
+@contextmanager
+def hold_lease(job: dict):
+    """
+    Продление аренды задачи, пока выполняется обработчик: отдельный
+    поток продлевает её каждую треть STORAGE_JOB_LEASE, поэтому
+    долгий шаг без прогресса (копирование большого объекта, медленный
+    пакет удаления) не отдаёт задачу второму воркеру.
+    :param job:
+    :return: функция сохранения прогресса для обработчика
+    """
+    lock = threading.Lock()
+    stop_event = threading.Event()
+
+    def renew(progress: dict | None = None) -> None:
+        with lock:
+            job["progress"].update(progress or {})
+            job["lease_until"] = time.time() + settings.STORAGE_JOB_LEASE
+            save_job(job)
+
+    def heartbeat() -> None:
+        # Не чаще раза в секунду, даже при очень короткой аренде
+        while not stop_event.wait(max(settings.STORAGE_JOB_LEASE / 3, 1)):
+            try:
+                renew()
+            except Exception:
+                logger.exception("Не удалось продлить аренду задачи %s",
+                                 job["job_id"])
+
+    thread = threading.Thread(target=heartbeat, daemon=True,
+                              name=f"storage-job-lease-{job['job_id']}")
+    thread.start()
+    try:
+        yield renew
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+def run_job(job: dict) -> dict:
+    """
+    Выполнение взятой задачи. Прогресс сохраняется в Redis, аренда
+    продлевается, пока задача выполняется. Обработчики идемпотентны:
+    задача, прерванная на середине, после возврата в очередь
+    выполняется заново и доделывает работу.
+    :param job:
+    :return: задача с итоговым состоянием
+    """
+    try:
+        with hold_lease(job) as report:
+            job["result"] = JOB_HANDLERS[job["kind"]](job, report)
+    except Exception as exc:
+        logger.exception("Задача %s (%s) завершилась ошибкой",
+                         job["job_id"], job["kind"])
+        job["error"] = str(exc)
+        if job["attempts"] < settings.STORAGE_JOB_MAX_ATTEMPTS:
+            # Повтор - через очередь, после остальных задач
+            job["status"] = QUEUED
+            save_job(job)
+            connection = get_redis_connection("default")
+            connection.lrem(PROCESSING_KEY, 1, job["job_id"])
+            connection.lpush(QUEUE_KEY, job["job_id"])
+        else:
+            finish_job(job, FAILED)
+        return job
+    job["error"] = None
+    finish_job(job, DONE)
+    return job
+
+
+def run_next_job(timeout: int = POLL_TIMEOUT) -> dict | None:
+    """
+    Один шаг воркера: возврат брошенных задач и выполнение следующей.
+    :param timeout: сколько секунд ждать задачу
+    :return: выполненная задача или None
+    """
+    recover_jobs()
+    job = claim_job(timeout)
+    if job is None:
+        return None
+    return run_job(job)
+
+
+def run_worker(stop_event: threading.Event) -> None:
+    """
+    Цикл воркера до установки ``stop_event``.
+    :param stop_event:
+    :return:
+    """
+    while not stop_event.is_set():
+        try:
+            run_next_job()
+        except Exception:
+            # Недоступен Redis или база: повтор после паузы
+            logger.exception("Ошибка воркера фоновых задач")
+            stop_event.wait(POLL_TIMEOUT)
+        finally:
+            # Как после HTTP-запроса: соединение с базой не держится вечно
+            close_old_connections()
+
+
+def start_workers(count: int = settings.STORAGE_JOB_WORKERS) -> threading.Event:
+    """
+    Запуск воркеров в фоновых потоках текущего процесса.
+    :param count: количество потоков - сколько задач выполняется одновременно
+    :return: событие, установка которого останавливает воркеры
+    """
+    stop_event = threading.Event()
+    for number in range(count):
+        threading.Thread(target=run_worker, args=(stop_event,),
+                         name=f"storage-job-worker-{number}", daemon=True).start()
+    return stop_event
+
+
+def run_move_job(job: dict, report) -> dict:
+    user_id, params = job["user_id"], job["params"]
+    if (catalog.get_entry(user_id, params["file_name"]) is None
+            and catalog.get_entry(user_id, params["new_file_name"]) is not None):
+        # Перенос уже завершился, но воркер не успел записать результат
+        return {"path": params["new_file_name"], "errors": []}
+    return move_file(user_id, params["file_name"], params["new_file_name"],
+                     on_progress=report)
+
+
+def run_export_job(job: dict, report) -> dict:
+    folder = job["params"]["folder"]
+    report({"bytes": 0, **get_total_progress(job["user_id"], folder + "/")})
+    key = get_export_key(job["job_id"])
+    size = export_folder_archive(job["user_id"], folder, key, on_progress=report)
+    return {"key": key, "size": size}
+
+
+def run_reconcile_job(job: dict, report) -> dict:
+    user_id = job["user_id"]
+    result = catalog.reconcile_user(user_id, iter_user_objects(user_id))
+    usage = catalog.recompute_usage(user_id)
+    invalidate_user_listings(user_id)
+    return {**result, "bytes": usage["after"]["bytes"]}
+
+
+def run_purge_job(job: dict, report) -> dict:
+    try:
+        item = get_trash_item(job["user_id"], job["params"]["item_id"])
+    except TrashItemNotFoundError:
+        # Запись уже очищена прерванной попыткой или очисткой корзины
+        return {"deleted": 0, "errors": []}
+    report({"objects": 0, "total_objects": item.objects_count,
+            "total_bytes": item.size})
+    return purge_trash_item(item, on_progress=report)
+
+
+def get_total_progress(user_id: int, path: str) -> dict:
+    totals = catalog.get_subtree_totals(user_id, path)
+    return {"total_objects": totals["objects"], "total_bytes": totals["bytes"]}
+
+
+JOB_HANDLERS = {
+    "move": run_move_job,
+    "export": run_export_job,
+    "reconcile": run_reconcile_job,
+    "purge": run_purge_job,
+}
@@ -0,0 +1,123 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def get_generation_key(user_id: int) -> str:
+    return f"storage:listing-gen:{user_id}"
+
+
+def get_version_key(user_id: int, path: str) -> str:
+    path_hash = hashlib.md5(path.encode()).hexdigest()
+    return f"storage:listing-ver:{user_id}:{path_hash}"
+
+
+def get_listing_key(
+        user_id: int,
+        path: str,
+        cursor: str | None,
+        limit: int,
+        generation: int,
+        version: int
+) -> str:
+    page_hash = hashlib.md5(f"{path}\0{cursor or ''}\0{limit}".encode()).hexdigest()
+    return f"storage:listing:{user_id}:{generation}:{version}:{page_hash}"
+
+
+def get_parent_paths(file_name: str) -> list[str]:
+    """
+    Папки, в списках которых виден файл или папка: родитель и все предки.
+    :param file_name: путь файла ("a/b/c.txt") или папки ("a/b/")
+    :return: например ["a/b/", "a/", ""]
+    """
+    parts = file_name.rstrip("/").split("/")[:-1]
+    paths = ["/".join(parts[:i]) + "/" for i in range(len(parts), 0, -1)]
+    return paths + [""]
+
+
+def get_listing_versions(user_id: int, path: str) -> tuple[int, int]:
+    """
+    Текущие версии списков пользователя и конкретной папки.
+    Версии входят в ключ кэша, поэтому после изменения папки
+    старые записи просто перестают читаться и истекают по TTL.
+    :param user_id:
+    :param path:
+    :return: (поколение пользователя, версия папки)
+    """
+    generation_key = get_generation_key(user_id)
+    version_key = get_version_key(user_id, path)
+    versions = cache.get_many([generation_key, version_key])
+    return versions.get(generation_key, 0), versions.get(version_key, 0)
+
+
+def get_cached_listing(
+        user_id: int,
+        path: str,
+        cursor: str | None,
+        limit: int
+) -> tuple[dict | None, str]:
+    """
+    Страница списка файлов из кэша.
+    :param user_id:
+    :param path:
+    :param cursor:
+    :param limit:
+    :return: (страница или None, ключ для сохранения свежей страницы)
+    """
+    generation, version = get_listing_versions(user_id, path)
+    key = get_listing_key(user_id, path, cursor, limit, generation, version)
+    return cache.get(key), key
+
+
+def get_page_etag(page: dict) -> str:
+    """
+    Хэш содержимого страницы списка для заголовка ETag. Считается
+    по самим данным, а не по версиям кэша: вытеснение ключа версии
+    из Redis не приведёт к совпадению ETag разных страниц.
+    :param page:
+    :return:
+    """
+    return hashlib.md5(
+        json.dumps(page, sort_keys=True, ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+def set_cached_listing(key: str, page: dict) -> None:
+    cache.set(key, page, timeout=settings.STORAGE_LISTING_CACHE_TTL)
+
+
+def bump_version(key: str) -> None:
+    """
+    Увеличение версии; ключ версии создаётся без срока жизни.
+    :param key:
+    :return:
+    """
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ успел истечь или быть вытесненным между add и incr
+        cache.set(key, 1, timeout=None)
+
+
+def invalidate_listing(user_id: int, paths: list[str]) -> None:
+    """
+    Сброс кэша списков конкретных папок пользователя.
+    :param user_id:
+    :param paths:
+    :return:
+    """
+    for path in set(paths):
+        bump_version(get_version_key(user_id, path))
+
+
+def invalidate_user_listings(user_id: int) -> None:
+    """
+    Сброс кэша всех списков пользователя. Нужен, когда меняется
+    целое поддерево (удаление или переименование папки).
+    :param user_id:
+    :return:
+    """
+    bump_version(get_generation_key(user_id))
@@ -0,0 +1,138 @@
+import json
+import logging
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from src.storage.benchmarks import (
+    DEFAULT_FILE_SIZES,
+    DEFAULT_OBJECT_COUNTS,
+    compare_results,
+    run_benchmarks,
+)
+from src.storage.clients import reset_clients
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "baseline.json"
+
+
+class Command(BaseCommand):
+    help = ("Замеры скорости операций хранилища (список, поиск, загрузка, "
+            "скачивание, переименование, удаление) на наборах данных "
+            "разного размера и сравнение с базовой линией.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--objects", type=int, nargs="+", default=list(DEFAULT_OBJECT_COUNTS),
+            help="Размеры наборов данных - число файлов у пользователя "
+                 "(по умолчанию 1000 10000 100000).",
+        )
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=list(DEFAULT_FILE_SIZES),
+            help="Размеры загружаемых файлов в байтах "
+                 "(по умолчанию 1 КБ, 1 МБ и 16 МБ).",
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=20,
+            help="Число вызовов каждой операции (по умолчанию 20).",
+        )
+        parser.add_argument(
+            "--bucket", default="storage-benchmark",
+            help="Отдельный бакет для замеров (по умолчанию storage-benchmark).",
+        )
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument(
+            "--moto", action="store_true",
+            help="Запустить S3-совместимый сервер moto в процессе "
+                 "вместо MinIO.",
+        )
+        target.add_argument(
+            "--endpoint",
+            help="Адрес S3-совместимого хранилища, например локального MinIO "
+                 "(по умолчанию - AWS_S3_ENDPOINT_URL).",
+        )
+        parser.add_argument(
+            "--baseline", type=Path, default=DEFAULT_BASELINE,
+            help="Файл базовой линии (по умолчанию benchmarks/baseline.json).",
+        )
+        parser.add_argument(
+            "--save-baseline", action="store_true",
+            help="Сохранить результаты как новую базовую линию.",
+        )
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2,
+            help="Допустимое ухудшение относительно базовой линии "
+                 "(по умолчанию 0.2 - 20%%).",
+        )
+        parser.add_argument(
+            "--output", type=Path,
+            help="Файл для сохранения результатов в JSON.",
+        )
+
+    def handle(self, *args, **options):
+        with ExitStack() as stack:
+            endpoint = options["endpoint"]
+            if options["moto"]:
+                endpoint = self.start_moto(stack)
+            if endpoint:
+                stack.enter_context(override_settings(AWS_S3_ENDPOINT_URL=endpoint))
+                # Клиенты создаются заново уже с адресом тестового хранилища
+                reset_clients()
+                stack.callback(reset_clients)
+
+            self.stdout.write(f"{'операция':<40}{'p50, мс':>10}{'p99, мс':>10}"
+                              f"{'оп/с':>10}{'МБ/с':>10}")
+            results = run_benchmarks(
+                options["objects"], options["sizes"], options["iterations"],
+                options["bucket"], on_result=self.write_result,
+            )
+
+        if options["output"]:
+            options["output"].write_text(json.dumps(results, indent=2))
+        baseline_path = options["baseline"]
+        if options["save_baseline"]:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Базовая линия сохранена в {baseline_path}")
+            return
+        if not baseline_path.exists():
+            self.stdout.write("Базовая линия не найдена, сравнение пропущено")
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        regressions = compare_results(results, baseline, options["tolerance"])
+        for regression in regressions:
+            self.stderr.write(
+                f"{regression['key']}: {regression['metric']} "
+                f"{regression['baseline']:.6g} -> {regression['current']:.6g}"
+            )
+        if regressions:
+            raise CommandError(f"Обнаружены регрессии: {len(regressions)}")
+        self.stdout.write("Регрессий относительно базовой линии нет")
+
+    def start_moto(self, stack: ExitStack) -> str:
+        """
+        Запуск сервера moto в отдельном потоке на свободном порту.
+        :param stack: остановка сервера при выходе
+        :return: адрес сервера
+        """
+        try:
+            from moto.server import ThreadedMotoServer
+        except ImportError:
+            raise CommandError("Для --moto нужен пакет moto[server]")
+        # Журнал запросов к серверу перемешивался бы с результатами
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+        server.start()
+        stack.callback(server.stop)
+        host, port = server.get_host_and_port()
+        return f"http://{host}:{port}"
+
+    def write_result(self, key: str, summary: dict) -> None:
+        self.stdout.write(
+            f"{key:<40}{summary['p50'] * 1000:>10.2f}{summary['p99'] * 1000:>10.2f}"
+            f"{summary['ops_per_sec']:>10.1f}"
+            f"{summary['bytes_per_sec'] / 1024 / 1024:>10.1f}"
+        )
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from src.storage.notifications import consume_batch, recover_notifications
+
+
+class Command(BaseCommand):
+    help = ("Применение уведомлений MinIO о создании и удалении объектов "
+            "к каталогу, поисковому индексу, счётчикам места и кэшу списков. "
+            "Уведомления читаются из очереди Redis, в которую их пишет "
+            "webhook /storage/notifications/ или цель Redis самого MinIO.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.STORAGE_NOTIFY_BATCH_SIZE,
+            help="Сколько сообщений применяется одним пакетом "
+                 "(по умолчанию - STORAGE_NOTIFY_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            "--consumer", default="default",
+            help="Имя потребителя; у одновременно работающих потребителей "
+                 "имена должны различаться.",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Применить уже накопленные уведомления и завершиться.",
+        )
+
+    def handle(self, *args, **options):
+        consumer = options["consumer"]
+        recovered = recover_notifications(consumer)
+        if recovered:
+            self.stdout.write(f"Возвращено в очередь сообщений: {recovered}")
+        while True:
+            try:
+                result = consume_batch(consumer, options["batch_size"],
+                                       timeout=1 if options["once"] else 2)
+            except KeyboardInterrupt:
+                return
+            except Exception as exc:
+                if options["once"]:
+                    raise
+                # Недоступна база или Redis: пакет применится заново
+                self.stderr.write(f"Ошибка применения уведомлений: {exc}")
+                close_old_connections()
+                time.sleep(2)
+                recover_notifications(consumer)
+                continue
+            if result is None:
+                if options["once"]:
+                    return
+                continue
+            self.stdout.write(
+                f"Сообщений: {result['messages']}, создано: {result['created']}, "
+                f"удалено: {result['deleted']}, пропущено: {result['skipped']}"
+            )
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from src.storage.archives import set_export_expiration
+from src.storage.services import create_bucket
+
+
+class Command(BaseCommand):
+    help = "Создание бакета MinIO для файлов пользователей, если его ещё нет."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bucket", default=settings.AWS_STORAGE_BUCKET_NAME,
+            help="Имя бакета (по умолчанию - AWS_STORAGE_BUCKET_NAME).",
+        )
+
+    def handle(self, *args, **options):
+        create_bucket(options["bucket"])
+        # Архивы папок из фоновых задач удаляются самим MinIO
+        set_export_expiration(options["bucket"])
+        self.stdout.write(f"Бакет {options['bucket']} готов")
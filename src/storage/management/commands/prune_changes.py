@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from src.storage.changes import prune_changes
+
+
+class Command(BaseCommand):
+    help = ("Удаление устаревших записей журнала изменений, по которому "
+            "синхронизируются клиенты.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.STORAGE_CHANGE_LOG_TTL_DAYS,
+            help="Сколько дней хранить записи "
+                 "(по умолчанию - STORAGE_CHANGE_LOG_TTL_DAYS).",
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(options["days"])
+        self.stdout.write(f"Удалено записей журнала: {deleted}")
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from src.storage.services import purge_blobs
+
+
+class Command(BaseCommand):
+    help = ("Удаление из MinIO блобов, на которые больше не ссылается "
+            "ни один файл (хранилище с дедупликацией).")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bucket", default=settings.AWS_STORAGE_BUCKET_NAME,
+            help="Имя бакета (по умолчанию - AWS_STORAGE_BUCKET_NAME).",
+        )
+
+    def handle(self, *args, **options):
+        result = purge_blobs(options["bucket"])
+        for error in result["errors"]:
+            self.stderr.write(f"{error['key']}: {error['code']} {error['message']}")
+        self.stdout.write(f"Удалено блобов: {result['deleted']}")
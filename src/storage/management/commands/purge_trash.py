@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from src.storage.trash import get_window_end, purge_trash
+
+
+class Command(BaseCommand):
+    help = ("Очистка корзин: объекты файлов, удалённых больше "
+            "STORAGE_TRASH_TTL_DAYS дней назад, удаляются из MinIO пакетами. "
+            "Работает только в окне STORAGE_TRASH_PURGE_WINDOW - команду "
+            "удобно запускать по расписанию, например раз в час.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bucket", default=settings.AWS_STORAGE_BUCKET_NAME,
+            help="Имя бакета (по умолчанию - AWS_STORAGE_BUCKET_NAME).",
+        )
+        parser.add_argument(
+            "--now", action="store_true",
+            help="Очистить корзины сразу, без ожидания окна очистки.",
+        )
+        parser.add_argument(
+            "--days", type=int, default=settings.STORAGE_TRASH_TTL_DAYS,
+            help="Сколько дней хранить удалённые файлы "
+                 "(по умолчанию - STORAGE_TRASH_TTL_DAYS).",
+        )
+
+    def handle(self, *args, **options):
+        deadline = None
+        if not options["now"]:
+            deadline = get_window_end(settings.STORAGE_TRASH_PURGE_WINDOW,
+                                      timezone.now())
+            if deadline is None:
+                self.stdout.write("Вне окна очистки корзины, очистка пропущена")
+                return
+        result = purge_trash(options["bucket"], deadline, options["days"])
+        for error in result["errors"]:
+            self.stderr.write(f"{error['key']}: {error['code']} {error['message']}")
+        self.stdout.write(f"Очищено записей корзины: {result['items']}, "
+                          f"удалено объектов: {result['deleted']}")
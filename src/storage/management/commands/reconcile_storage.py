@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from src.storage.catalog import recompute_usage, reconcile_user
+from src.storage.jobs import submit_job
+from src.storage.listing_cache import invalidate_user_listings
+from src.storage.services import iter_user_objects
+
+
+class Command(BaseCommand):
+    help = ("Сверка каталога файлов в PostgreSQL с содержимым MinIO: "
+            "восстанавливает пропущенные записи, удаляет устаревшие "
+            "и пересчитывает счётчики занятого места.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=int, action="append", dest="user_ids",
+            help="ID пользователя (можно указать несколько раз). "
+                 "По умолчанию - все пользователи.",
+        )
+        parser.add_argument(
+            "--background", action="store_true",
+            help="Поставить сверку в очередь фоновых задач вместо "
+                 "выполнения в этой команде.",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"] or (
+            get_user_model().objects.order_by("pk").values_list("pk", flat=True)
+        )
+        for user_id in user_ids:
+            if options["background"]:
+                job = submit_job(user_id, "reconcile", {})
+                self.stdout.write(f"Пользователь {user_id}: задача {job['job_id']}")
+                continue
+            result = reconcile_user(user_id, iter_user_objects(user_id))
+            usage = recompute_usage(user_id)
+            invalidate_user_listings(user_id)
+            drift = usage["after"]["bytes"] - usage["before"]["bytes"]
+            self.stdout.write(
+                f"Пользователь {user_id}: записано {result['upserted']}, "
+                f"удалено {result['deleted']}, занято {usage['after']['bytes']} "
+                f"байт (расхождение счётчика {drift:+d})"
+            )
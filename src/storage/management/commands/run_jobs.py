@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from src.storage.jobs import start_workers
+
+
+class Command(BaseCommand):
+    help = ("Воркер фоновых задач хранилища (удаление, перенос и архивация "
+            "папок, сверка каталога) в отдельном процессе.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=max(settings.STORAGE_JOB_WORKERS, 1),
+            help="Сколько задач выполняется одновременно "
+                 "(по умолчанию - STORAGE_JOB_WORKERS).",
+        )
+
+    def handle(self, *args, **options):
+        stop_event = start_workers(options["workers"])
+        self.stdout.write(f"Воркеров запущено: {options['workers']}")
+        try:
+            # Задачи, прерванные остановкой, вернутся в очередь
+            # по истечении аренды
+            while not stop_event.wait(1):
+                pass
+        except KeyboardInterrupt:
+            stop_event.set()
@@ -0,0 +1,229 @@
+import contextvars
+import functools
+import threading
+import time
+from collections import defaultdict
+
+from django.db.backends.signals import connection_created
+from prometheus_client import Counter, Histogram
+
+BYTES_BUCKETS = tuple(4 ** power * 1024 for power in range(12))
+CALLS_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+S3_CALL_DURATION = Histogram(
+    "storage_s3_call_duration_seconds",
+    "Длительность запросов к S3 (MinIO) с учётом повторов",
+    ["operation"],
+)
+S3_CALL_ERRORS = Counter(
+    "storage_s3_call_errors",
+    "Запросы к S3, завершившиеся ошибкой",
+    ["operation"],
+)
+S3_BYTES = Counter(
+    "storage_s3_bytes",
+    "Байты, переданные в S3 (sent) и полученные из S3 (received)",
+    ["operation", "direction"],
+)
+REQUEST_DURATION = Histogram(
+    "storage_request_duration_seconds",
+    "Длительность обработки HTTP-запроса",
+    ["view", "method"],
+)
+REQUEST_S3_DURATION = Histogram(
+    "storage_request_s3_duration_seconds",
+    "Суммарное время запросов к S3 за HTTP-запрос",
+    ["view"],
+)
+REQUEST_S3_CALLS = Histogram(
+    "storage_request_s3_calls",
+    "Количество запросов к S3 за HTTP-запрос",
+    ["view"],
+    buckets=CALLS_BUCKETS,
+)
+REQUEST_S3_BYTES = Histogram(
+    "storage_request_s3_bytes",
+    "Байты, переданные в S3 и полученные из S3 за HTTP-запрос",
+    ["view"],
+    buckets=BYTES_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "storage_request_db_duration_seconds",
+    "Суммарное время запросов к PostgreSQL за HTTP-запрос",
+    ["view"],
+)
+
+
+class RequestStats:
+    """
+    Запросы к S3 и PostgreSQL, выполненные при обработке одного
+    HTTP-запроса. Пополняется из потоков пула, поэтому под блокировкой.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # operation -> [calls, seconds, bytes]
+        self.s3 = defaultdict(lambda: [0, 0.0, 0])
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+    def add_s3_call(self, operation: str, seconds: float) -> None:
+        with self.lock:
+            stats = self.s3[operation]
+            stats[0] += 1
+            stats[1] += seconds
+
+    def add_s3_bytes(self, operation: str, size: int) -> None:
+        with self.lock:
+            self.s3[operation][2] += size
+
+    def add_db_query(self, seconds: float) -> None:
+        with self.lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def get_s3_totals(self) -> tuple[int, float, int]:
+        """
+        Итоги по всем операциям S3.
+        :return: количество запросов, секунды, байты
+        """
+        with self.lock:
+            values = list(self.s3.values())
+        return (sum(value[0] for value in values),
+                sum(value[1] for value in values),
+                sum(value[2] for value in values))
+
+
+# Статистика текущего HTTP-запроса (None вне запроса)
+request_stats = contextvars.ContextVar("storage_request_stats", default=None)
+
+
+def bind_context(function):
+    """
+    Функция для пула потоков, выполняемая в копии контекста вызывающего
+    потока: запросы к S3 из пула учитываются в статистике HTTP-запроса.
+    Копия делается на каждую задачу - один контекст нельзя выполнять
+    в нескольких потоках одновременно.
+    :param function:
+    :return:
+    """
+    return functools.partial(contextvars.copy_context().run, function)
+
+
+def on_before_call(context, **kwargs) -> None:
+    context["storage_started"] = time.perf_counter()
+
+
+def observe_call(operation: str, context, failed: bool) -> None:
+    seconds = time.perf_counter() - context.get("storage_started", time.perf_counter())
+    S3_CALL_DURATION.labels(operation).observe(seconds)
+    if failed:
+        S3_CALL_ERRORS.labels(operation).inc()
+    stats = request_stats.get()
+    if stats is not None:
+        stats.add_s3_call(operation, seconds)
+
+
+def on_after_call(model, context, http_response, **kwargs) -> None:
+    observe_call(model.name, context, failed=http_response.status_code >= 400)
+    if model.http.get("method") == "HEAD" or http_response.status_code >= 300:
+        return
+    # Тело ответа читается потом, но его длина известна из заголовка
+    size = int(http_response.headers.get("content-length") or 0)
+    if size:
+        S3_BYTES.labels(model.name, "received").inc(size)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.add_s3_bytes(model.name, size)
+
+
+def on_after_call_error(context, event_name: str, **kwargs) -> None:
+    # Ошибка соединения: ответа от S3 нет
+    observe_call(event_name.rsplit(".", 1)[-1], context, failed=True)
+
+
+def on_before_send(request, event_name: str, **kwargs) -> None:
+    # Вызывается на каждую попытку, поэтому учитываются и повторы
+    size = int(request.headers.get("Content-Length") or 0)
+    if size:
+        operation = event_name.rsplit(".", 1)[-1]
+        S3_BYTES.labels(operation, "sent").inc(size)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.add_s3_bytes(operation, size)
+
+
+def instrument_client(client):
+    """
+    Подписка клиента S3 (boto3 или aiobotocore) на события botocore
+    для учёта количества, длительности и объёма запросов.
+    :param client:
+    :return: тот же клиент
+    """
+    events = client.meta.events
+    events.register("before-call.s3", on_before_call)
+    events.register("after-call.s3", on_after_call)
+    events.register("after-call-error.s3", on_after_call_error)
+    events.register("before-send.s3", on_before_send)
+    return client
+
+
+def time_query(execute, sql, params, many, context):
+    stats = request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_db_query(time.perf_counter() - started)
+
+
+def instrument_connection(sender, connection, **kwargs) -> None:
+    # Обёртка ставится на каждое новое соединение: под ASGI запросы
+    # к базе выполняются в другом потоке, чем сам запрос
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(instrument_connection)
+
+
+def observe_request(view: str, method: str, seconds: float,
+                    stats: RequestStats) -> None:
+    """
+    Запись статистики завершённого HTTP-запроса в гистограммы.
+    :param view: имя маршрута
+    :param method:
+    :param seconds: длительность обработки
+    :param stats:
+    :return:
+    """
+    calls, s3_seconds, size = stats.get_s3_totals()
+    REQUEST_DURATION.labels(view, method).observe(seconds)
+    REQUEST_S3_CALLS.labels(view).observe(calls)
+    REQUEST_S3_DURATION.labels(view).observe(s3_seconds)
+    REQUEST_S3_BYTES.labels(view).observe(size)
+    REQUEST_DB_DURATION.labels(view).observe(stats.db_seconds)
+
+
+def get_server_timing(seconds: float, stats: RequestStats) -> str:
+    """
+    Значение заголовка Server-Timing: общее время, время запросов
+    к PostgreSQL и к S3 - всего и по операциям.
+    :param seconds: длительность обработки
+    :param stats:
+    :return:
+    """
+    calls, s3_seconds, size = stats.get_s3_totals()
+    metrics = [
+        f"total;dur={seconds * 1000:.1f}",
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_queries} queries"',
+        f's3;dur={s3_seconds * 1000:.1f};desc="{calls} calls, {size} bytes"',
+    ]
+    with stats.lock:
+        operations = sorted(stats.s3.items())
+    for operation, (op_calls, op_seconds, _) in operations:
+        metrics.append(f's3.{operation};dur={op_seconds * 1000:.1f};'
+                       f'desc="{op_calls} calls"')
+    return ", ".join(metrics)
@@ -0,0 +1,69 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from src.storage.metrics import (
+    RequestStats,
+    get_server_timing,
+    observe_request,
+    request_stats,
+)
+
+
+class StorageMetricsMiddleware:
+    """
+    Учёт запросов к S3 и PostgreSQL за время обработки HTTP-запроса:
+    итоги попадают в гистограммы /metrics по имени маршрута, а при
+    STORAGE_SERVER_TIMING - ещё и в заголовок Server-Timing ответа.
+    Работает и с синхронными, и с асинхронными views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, stats)
+
+    def finish(self, request, response, seconds: float, stats: RequestStats):
+        """
+        Запись статистики запроса и заголовка Server-Timing.
+        Для потоковых ответов учитываются только запросы, сделанные
+        до начала отправки тела.
+        :param request:
+        :param response:
+        :param seconds:
+        :param stats:
+        :return:
+        """
+        match = request.resolver_match
+        view = match.view_name if match is not None else "unmatched"
+        observe_request(view, request.method, seconds, stats)
+        if settings.STORAGE_SERVER_TIMING:
+            response["Server-Timing"] = get_server_timing(seconds, stats)
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredObject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=1024)),
+                ('parent', models.CharField(blank=True, max_length=1024)),
+                ('name', models.CharField(max_length=1024)),
+                ('is_folder', models.BooleanField(default=False)),
+                ('size', models.BigIntegerField(default=0)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=255)),
+                ('modified_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stored_objects', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'parent', '-is_folder', 'name'], name='stored_object_listing'), models.Index(fields=['owner', 'path'], name='stored_object_path_prefix', opclasses=['int4_ops', 'varchar_pattern_ops'])],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'path'), name='stored_object_owner_path')],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Начальные значения счётчиков по уже существующему каталогу.
+    """
+    StoredObject = apps.get_model("storage", "StoredObject")
+    StorageUsage = apps.get_model("storage", "StorageUsage")
+    files = StoredObject.objects.filter(is_folder=False)
+    StorageUsage.objects.bulk_create([
+        StorageUsage(owner_id=row["owner_id"], bytes_used=row["bytes"] or 0,
+                     objects_count=row["objects"])
+        for row in files.order_by().values("owner_id")
+        .annotate(bytes=Sum("size"), objects=Count("id"))
+    ])
+    subtree = (files.filter(owner_id=OuterRef("owner_id"),
+                            path__startswith=OuterRef("path"))
+               .order_by().values("owner_id"))
+    StoredObject.objects.filter(is_folder=True).update(
+        total_size=Coalesce(Subquery(
+            subtree.annotate(total=Sum("size")).values("total")
+        ), 0),
+        total_objects=Coalesce(Subquery(
+            subtree.annotate(total=Count("id")).values("total")
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('storage', '0003_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageUsage',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='storage_usage', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('objects_count', models.BigIntegerField(default=0)),
+                ('bytes_used', models.BigIntegerField(default=0)),
+                ('quota', models.BigIntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='storedobject',
+            name='total_objects',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='storedobject',
+            name='total_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0004_storage_usage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storageusage',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='StorageChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('upload', 'upload'), ('create_folder', 'create_folder'), ('delete', 'delete'), ('move', 'move'), ('rescan', 'rescan')], max_length=16)),
+                ('path', models.CharField(max_length=1024)),
+                ('new_path', models.CharField(blank=True, max_length=1024)),
+                ('size', models.BigIntegerField(default=0)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='storage_change_created')],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'seq'), name='storage_change_owner_seq')],
+            },
+        ),
+    ]
@@ -0,0 +1,230 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Blob(models.Model):
+    """
+    Содержимое файла в хранилище с дедупликацией: объект MinIO
+    с ключом по SHA-256 содержимого, общий для всех одинаковых файлов.
+    ``refcount`` - количество записей каталога, ссылающихся на блоб;
+    блобы без ссылок удаляет команда ``purge_blobs``.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    etag = models.CharField(max_length=255, blank=True)
+    refcount = models.PositiveIntegerField(default=0)
+    # Объект уже записан в MinIO
+    stored = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Поиск блобов без ссылок для удаления
+            models.Index(fields=["refcount", "updated_at"],
+                         name="blob_unreferenced"),
+        ]
+
+    def __str__(self):
+        return self.sha256
+
+
+class StoredObject(models.Model):
+    """
+    Запись каталога хранилища: файл или папка пользователя в MinIO.
+    Каталог повторяет содержимое бакета, чтобы списки папок, поиск
+    и проверка существования файлов были запросами к индексам PostgreSQL,
+    а не обходом объектов в MinIO.
+    """
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="stored_objects",
+    )
+    # Путь внутри папки пользователя; у папок - с "/" в конце
+    path = models.CharField(max_length=1024)
+    # Путь родительской папки ("" - корень)
+    parent = models.CharField(max_length=1024, blank=True)
+    # Имя файла или папки (у папок - с "/" в конце)
+    name = models.CharField(max_length=1024)
+    is_folder = models.BooleanField(default=False)
+    size = models.BigIntegerField(default=0)
+    etag = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=255, blank=True)
+    modified_at = models.DateTimeField(default=timezone.now)
+    # У папок - количество и общий размер файлов во всём поддереве
+    total_objects = models.BigIntegerField(default=0)
+    total_size = models.BigIntegerField(default=0)
+    # Содержимое файла в хранилище с дедупликацией; пусто - файл
+    # хранится в MinIO под своим путём в папке пользователя
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="entries",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "path"], name="stored_object_owner_path"
+            ),
+        ]
+        indexes = [
+            # Список папки: сначала папки, затем файлы по имени
+            models.Index(
+                fields=["owner", "parent", "-is_folder", "name"],
+                name="stored_object_listing",
+            ),
+            # Поддерево папки: path LIKE 'prefix%'
+            models.Index(
+                fields=["owner", "path"],
+                name="stored_object_path_prefix",
+                opclasses=["int4_ops", "varchar_pattern_ops"],
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id}:{self.path}"
+
+
+class SearchTrigram(models.Model):
+    """
+    Триграмма имени файла или папки - поисковый индекс каталога.
+    Поиск подстроки сводится к поиску записей, у которых есть все
+    триграммы запроса, по индексу (owner, trigram), без обхода всех
+    файлов пользователя. Записи удаляются вместе с записью каталога
+    явно (см. ``catalog.remove_path``), чтобы удаление больших папок
+    оставалось пакетным запросом.
+    """
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    entry = models.ForeignKey(
+        StoredObject,
+        on_delete=models.DO_NOTHING,
+        related_name="trigrams",
+    )
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["entry", "trigram"], name="search_trigram_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["owner", "trigram", "entry"],
+                name="search_trigram_lookup",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_id}:{self.trigram}"
+
+
+class StorageUsage(models.Model):
+    """
+    Счётчики занятого пользователем места: обновляются вместе
+    с каталогом при каждой загрузке, удалении и переносе, поэтому
+    проверка квоты не требует обхода файлов.
+    """
+    owner = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="storage_usage",
+    )
+    objects_count = models.BigIntegerField(default=0)
+    bytes_used = models.BigIntegerField(default=0)
+    # Квота в байтах; пусто - STORAGE_DEFAULT_QUOTA
+    quota = models.BigIntegerField(null=True, blank=True)
+    # Номер последней записи журнала изменений пользователя
+    change_seq = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.owner_id}:{self.bytes_used}"
+
+
+class StorageChange(models.Model):
+    """
+    Запись журнала изменений пользователя: загрузка, создание папки,
+    удаление или перенос. Журнал только дополняется; номера ``seq``
+    идут у каждого пользователя подряд и служат курсором клиентам
+    синхронизации, которые забирают изменения после своего курсора
+    вместо повторного обхода всех файлов.
+    """
+    UPLOAD = "upload"
+    CREATE_FOLDER = "create_folder"
+    DELETE = "delete"
+    MOVE = "move"
+    # Часть содержимого папки изменилась (например, удаление папки
+    # прервалось на ошибке): клиенту нужно перечитать её список
+    RESCAN = "rescan"
+    ACTIONS = [(UPLOAD, UPLOAD), (CREATE_FOLDER, CREATE_FOLDER),
+               (DELETE, DELETE), (MOVE, MOVE), (RESCAN, RESCAN)]
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    seq = models.BigIntegerField()
+    action = models.CharField(max_length=16, choices=ACTIONS)
+    # У папок - с "/" в конце
+    path = models.CharField(max_length=1024)
+    # Новый путь при переносе
+    new_path = models.CharField(max_length=1024, blank=True)
+    size = models.BigIntegerField(default=0)
+    etag = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # Он же индекс чтения журнала после курсора
+            models.UniqueConstraint(
+                fields=["owner", "seq"], name="storage_change_owner_seq"
+            ),
+        ]
+        indexes = [
+            # Удаление устаревших записей
+            models.Index(fields=["created_at"], name="storage_change_created"),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id}:{self.seq}:{self.action}"
+
+
+class TrashItem(models.Model):
+    """
+    Файл или папка в корзине пользователя. Записи каталога удалённого
+    переносятся под путь "/trash/<id>/<исходный путь>", а объекты MinIO
+    остаются на месте до очистки корзины (команда ``purge_trash``),
+    поэтому и удаление, и восстановление не обращаются к MinIO.
+    """
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="trash_items",
+    )
+    # Исходный путь; у папок - с "/" в конце
+    path = models.CharField(max_length=1024)
+    # Количество и общий размер файлов на момент удаления
+    objects_count = models.BigIntegerField(default=0)
+    size = models.BigIntegerField(default=0)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Поиск корзины, в которую попадает перезаписанный путь
+            models.Index(fields=["owner", "path"], name="trash_item_owner_path"),
+            # Очистка корзины от старых записей
+            models.Index(fields=["deleted_at"], name="trash_item_deleted"),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id}:{self.path}"
@@ -0,0 +1,396 @@
+import math
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from botocore.exceptions import ClientError, NoCredentialsError
+from django.conf import settings
+
+from src.storage import catalog
+from src.storage.clients import get_s3_client, get_transfer_config
+from src.storage.exceptions import FileMoveError, FileNotfoundError
+from src.storage.listing_cache import (
+    get_parent_paths,
+    invalidate_listing,
+    invalidate_user_listings,
+)
+from src.storage.metrics import bind_context
+from src.storage.services import (
+    delete_objects,
+    get_user_file_path,
+    is_safe_file_name,
+    iter_batches,
+    iter_objects,
+)
+
+# Максимальное количество частей составной загрузки в S3
+MAX_PARTS_COUNT = 10000
+
+# Пустой объект, которым ``create_folder`` отмечает папку в MinIO
+FOLDER_MARKER = ".keep"
+
+
+def get_copy_part_ranges(size: int, part_size: int) -> list[tuple[int, int]]:
+    """
+    Диапазоны байт частей для копирования большого объекта.
+    :param size:
+    :param part_size: желаемый размер части
+    :return: пары (start, end) включительно
+    """
+    part_size = max(part_size, math.ceil(size / MAX_PARTS_COUNT))
+    return [(start, min(start + part_size, size) - 1)
+            for start in range(0, size, part_size)]
+
+
+def verify_copy(source: dict, key: str, bucket_name: str,
+                check_etag: bool = True) -> None:
+    """
+    Проверка копии: размер совпадает с исходным объектом,
+    ETag - если и оригинал, и копия записаны одним запросом
+    (у составных объектов ETag зависит от разбиения на части).
+    Неизменность оригинала во время копирования гарантирует
+    условие CopySourceIfMatch.
+    :param source: описание исходного объекта (Key, Size, ETag)
+    :param key: ключ копии
+    :param bucket_name:
+    :param check_etag: сравнивать ли ETag
+    :return:
+    """
+    response = get_s3_client().head_object(Bucket=bucket_name, Key=key)
+    etag = source.get("ETag") or ""
+    check_etag = check_etag and "-" not in etag
+    if (response["ContentLength"] != source["Size"]
+            or (check_etag and response["ETag"] != etag)):
+        raise FileMoveError(source["Key"], "копия не совпадает с оригиналом")
+
+
+def copy_single_object(source: dict, key: str, bucket_name: str) -> None:
+    """
+    Копирование объекта одним запросом на стороне MinIO.
+    :param source:
+    :param key:
+    :param bucket_name:
+    :return:
+    """
+    get_s3_client().copy_object(
+        Bucket=bucket_name,
+        Key=key,
+        CopySource={"Bucket": bucket_name, "Key": source["Key"]},
+        CopySourceIfMatch=source["ETag"],
+    )
+    verify_copy(source, key, bucket_name)
+
+
+def copy_object_part(
+        source: dict,
+        key: str,
+        upload_id: str,
+        part_number: int,
+        byte_range: tuple[int, int],
+        bucket_name: str
+) -> dict:
+    """
+    Копирование одной части большого объекта (upload_part_copy).
+    :param source:
+    :param key:
+    :param upload_id:
+    :param part_number:
+    :param byte_range:
+    :param bucket_name:
+    :return: описание части для complete_multipart_upload
+    """
+    response = get_s3_client().upload_part_copy(
+        Bucket=bucket_name,
+        Key=key,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        CopySource={"Bucket": bucket_name, "Key": source["Key"]},
+        CopySourceRange="bytes={}-{}".format(*byte_range),
+        CopySourceIfMatch=source["ETag"],
+    )
+    return {"PartNumber": part_number,
+            "ETag": response["CopyPartResult"]["ETag"]}
+
+
+def copy_objects(
+        sources,
+        old_prefix: str,
+        new_prefix: str,
+        bucket_name: str,
+        on_progress=None
+) -> list[str]:
+    """
+    Параллельное копирование объектов с заменой префикса ключа.
+    Небольшие объекты копируются целиком, большие - частями; части
+    и объекты выполняются в одном пуле потоков. Порог, размер частей
+    и число одновременных запросов - из STORAGE_TRANSFER_CONFIG["copy"].
+    Каждая копия проверяется. При любой ошибке уже созданные копии
+    удаляются, исходные объекты не затрагиваются.
+    :param sources: поток описаний исходных объектов (Key, Size, ETag)
+    :param old_prefix:
+    :param new_prefix:
+    :param bucket_name:
+    :param on_progress: вызывается в текущем потоке после каждого
+    скопированного объекта с количеством объектов и байт
+    :return: ключи скопированных исходных объектов
+    """
+    transfer_config = get_transfer_config("copy")
+    concurrency = transfer_config.max_concurrency
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = {}
+    uploads = {}
+    copied = []  # Пары (исходный ключ, ключ копии)
+    progress = {"objects": 0, "bytes": 0}
+
+    def report(source: dict) -> None:
+        progress["objects"] += 1
+        progress["bytes"] += source["Size"]
+        if on_progress is not None:
+            on_progress(dict(progress))
+
+    def collect(done) -> None:
+        for future in done:
+            kind, item = pending[future]
+            result = future.result()
+            del pending[future]
+            if kind == "object":
+                copied.append((item[0]["Key"], item[1]))
+                report(item[0])
+                continue
+            upload = uploads[item]
+            upload["parts"].append(result)
+            if len(upload["parts"]) == upload["parts_count"]:
+                get_s3_client().complete_multipart_upload(
+                    Bucket=bucket_name,
+                    Key=upload["key"],
+                    UploadId=item,
+                    MultipartUpload={"Parts": sorted(
+                        upload["parts"], key=lambda x: x["PartNumber"]
+                    )},
+                )
+                del uploads[item]
+                copied.append((upload["source"]["Key"], upload["key"]))
+                verify_copy(upload["source"], upload["key"], bucket_name,
+                            check_etag=False)
+                report(upload["source"])
+
+    def submit(kind: str, item, func, *args) -> None:
+        if len(pending) >= concurrency * 2:
+            collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        pending[executor.submit(bind_context(func), *args)] = (kind, item)
+
+    try:
+        for source in sources:
+            key = new_prefix + source["Key"].removeprefix(old_prefix)
+            if source["Size"] <= transfer_config.multipart_threshold:
+                submit("object", (source, key), copy_single_object,
+                       source, key, bucket_name)
+                continue
+            head = get_s3_client().head_object(Bucket=bucket_name, Key=source["Key"])
+            upload_id = get_s3_client().create_multipart_upload(
+                Bucket=bucket_name, Key=key,
+                ContentType=head.get("ContentType") or "application/octet-stream",
+            )["UploadId"]
+            ranges = get_copy_part_ranges(source["Size"],
+                                          transfer_config.multipart_chunksize)
+            uploads[upload_id] = {"source": source, "key": key, "parts": [],
+                                  "parts_count": len(ranges)}
+            for part_number, byte_range in enumerate(ranges, start=1):
+                submit("part", upload_id, copy_object_part, source, key,
+                       upload_id, part_number, byte_range, bucket_name)
+        while pending:
+            collect(wait(pending, return_when=FIRST_COMPLETED).done)
+    except Exception:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        rollback_copies(pending, uploads, copied, bucket_name)
+        raise
+    executor.shutdown()
+    return [source_key for source_key, _ in copied]
+
+
+def rollback_copies(
+        pending: dict,
+        uploads: dict,
+        copied: list[tuple[str, str]],
+        bucket_name: str
+) -> None:
+    """
+    Удаление копий и отмена незавершённых составных загрузок
+    после неудачного переноса.
+    :param pending: оставшиеся задачи копирования
+    :param uploads: незавершённые составные загрузки
+    :param copied: уже скопированные объекты
+    :param bucket_name:
+    :return:
+    """
+    keys = [key for _, key in copied]
+    for future, (kind, item) in pending.items():
+        # Копия могла появиться, даже если задача завершилась ошибкой проверки
+        if kind == "object" and not future.cancelled():
+            keys.append(item[1])
+    for upload_id, upload in uploads.items():
+        try:
+            get_s3_client().abort_multipart_upload(
+                Bucket=bucket_name, Key=upload["key"], UploadId=upload_id
+            )
+        except ClientError:
+            pass
+    delete_objects(keys, bucket_name)
+
+
+def iter_live_objects(user_id: int, folder: str, bucket_name: str):
+    """
+    Объекты папки, которые принадлежат записям каталога: файлы
+    под своим путём и метки папок. Объекты файлов из корзины лежат
+    под прежними ключами до очистки и с папкой не переносятся,
+    иначе восстановленный файл остался бы без содержимого.
+    :param user_id:
+    :param folder: путь папки с "/" в конце
+    :param bucket_name:
+    :return: описания объектов из ответа list_objects_v2
+    """
+    user_prefix = get_user_file_path(user_id, "")
+    objects = iter_objects(user_prefix + folder, bucket_name)
+    for page in iter_batches(objects, catalog.BATCH_SIZE):
+        owners = {}
+        for obj in page:
+            path = obj["Key"].removeprefix(user_prefix)
+            owners[obj["Key"]] = [path]
+            if path.rsplit("/", 1)[-1] == FOLDER_MARKER:
+                owners[obj["Key"]].append(path[:-len(FOLDER_MARKER)])
+        live = set(catalog.get_existing_paths(
+            user_id, [path for paths in owners.values() for path in paths]
+        ))
+        yield from (obj for obj in page
+                    if any(path in live for path in owners[obj["Key"]]))
+
+
+def get_move_sources(user_id: int, file_name: str, bucket_name: str):
+    """
+    Исходные объекты переноса: объекты папки, принадлежащие записям
+    каталога, или один файл.
+    :param user_id:
+    :param file_name:
+    :param bucket_name:
+    :return:
+    """
+    full_file_path = get_user_file_path(user_id, file_name)
+    if file_name.endswith("/"):
+        return iter_live_objects(user_id, file_name, bucket_name)
+    try:
+        response = get_s3_client().head_object(Bucket=bucket_name, Key=full_file_path)
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            raise FileNotfoundError(file_name, exc)
+        raise FileMoveError(file_name, exc)
+    return [{"Key": full_file_path, "Size": response["ContentLength"],
+             "ETag": response["ETag"]}]
+
+
+def check_move(user_id: int, file_name: str, new_file_name: str) -> None:
+    """
+    Проверка, что файл или папку можно перенести по новому пути.
+    :param user_id:
+    :param file_name:
+    :param new_file_name:
+    :return:
+    """
+    if (not is_safe_file_name(new_file_name)
+            or file_name.endswith("/") != new_file_name.endswith("/")):
+        raise FileMoveError(file_name, "некорректный новый путь")
+    if new_file_name.startswith(file_name.rstrip("/") + "/"):
+        raise FileMoveError(file_name, "нельзя переместить папку в саму себя")
+    if catalog.get_entry(user_id, file_name) is None:
+        # В том числе файл в корзине: его объект ещё лежит по старому пути
+        raise FileNotfoundError(file_name)
+    if (file_name != new_file_name
+            and catalog.get_entry(user_id, new_file_name) is not None):
+        raise FileMoveError(file_name, f"'{new_file_name}' уже существует")
+
+
+def move_file(
+        user_id: int,
+        file_name: str,
+        new_file_name: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME,
+        on_progress=None
+) -> dict:
+    """
+    Перенос файла или папки со всем содержимым на стороне MinIO.
+    Исходные объекты удаляются только после того, как все копии
+    созданы и проверены, поэтому ошибка на любом шаге не теряет данные.
+    :param user_id:
+    :param file_name: путь файла или папки (с "/" в конце)
+    :param new_file_name: новый путь (у папки - тоже с "/" в конце)
+    :param bucket_name:
+    :param on_progress: функция, получающая прогресс копирования:
+    ``objects``/``bytes`` и ожидаемые ``total_objects``/``total_bytes``
+    :return: новый путь, объём перенесённых данных и ошибки удаления
+    исходных объектов
+    """
+    check_move(user_id, file_name, new_file_name)
+    if file_name == new_file_name:
+        return {"path": new_file_name, "objects": 0, "bytes": 0, "errors": []}
+
+    totals = catalog.get_subtree_totals(user_id, file_name)
+    progress = {"objects": 0, "bytes": 0}
+
+    def report(copied: dict) -> None:
+        progress.update(copied)
+        if on_progress is not None:
+            on_progress({**copied, "total_objects": totals["objects"],
+                         "total_bytes": totals["bytes"]})
+
+    old_prefix = get_user_file_path(user_id, file_name)
+    new_prefix = get_user_file_path(user_id, new_file_name)
+    result = {"errors": []}
+    if file_name.endswith("/") or catalog.get_blob_id(user_id, file_name) is None:
+        # Файлы из блобов переносятся только в каталоге: их объекты
+        # лежат вне папки пользователя и от пути не зависят
+        try:
+            sources = get_move_sources(user_id, file_name, bucket_name)
+            source_keys = copy_objects(sources, old_prefix, new_prefix,
+                                       bucket_name, report)
+        except (NoCredentialsError, ClientError) as exc:
+            raise FileMoveError(file_name, exc)
+
+        # Все копии проверены - исходные объекты можно удалять
+        result = delete_objects(source_keys, bucket_name)
+    else:
+        report(totals)
+
+    catalog.move_path(user_id, file_name, new_file_name)
+    invalidate_listing(user_id, get_parent_paths(file_name)
+                       + get_parent_paths(new_file_name))
+    if file_name.endswith("/"):
+        # Изменились пути всех вложенных папок
+        invalidate_user_listings(user_id)
+    return {"path": new_file_name, **progress, "errors": result["errors"]}
+
+
+def rename_file(user_id: int, file_name: str, new_name: str,
+bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME) -> str:
+    """
+    Rename file in minio.
+    :param user_id:
+    :param file_name:
+    :param new_name:
+    :param bucket_name:
+    :return: новый путь файла
+    """
+    new_file_name = get_renamed_path(file_name, new_name)
+    return move_file(user_id, file_name, new_file_name, bucket_name)["path"]
+
+
+def get_renamed_path(file_name: str, new_name: str) -> str:
+    """
+    Путь файла или папки после переименования в той же папке.
+    :param file_name:
+    :param new_name: новое имя без пути
+    :return:
+    """
+    parent = "/".join(file_name.rstrip("/").split("/")[:-1])
+    new_file_name = f"{parent}/{new_name}" if parent else new_name
+    if file_name.endswith("/"):
+        new_file_name += "/"
+    return new_file_name
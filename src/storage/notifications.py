@@ -0,0 +1,262 @@
+import json
+import logging
+import re
+from collections import defaultdict
+from urllib.parse import unquote_plus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+
+from src.storage import catalog
+from src.storage.changes import log_changes
+from src.storage.listing_cache import get_parent_paths, invalidate_listing
+from src.storage.models import StorageChange
+
+logger = logging.getLogger(__name__)
+
+# Ключ объекта в папке пользователя: user-<id>-files/<путь>
+USER_KEY_RE = re.compile(r"^user-(\d+)-files/(.+)$")
+FOLDER_MARKER = ".keep"
+
+
+def get_processing_key(consumer: str) -> str:
+    return f"{settings.STORAGE_NOTIFY_QUEUE}:processing:{consumer}"
+
+
+def enqueue_notification(body: bytes) -> None:
+    """
+    Постановка уведомления MinIO (тело запроса webhook) в очередь.
+    :param body:
+    :return:
+    """
+    get_redis_connection("default").rpush(settings.STORAGE_NOTIFY_QUEUE, body)
+
+
+def parse_message(raw: bytes) -> list[dict]:
+    """
+    Записи событий S3 из сообщения очереди. Поддерживаются тело
+    webhook MinIO (``{"Records": [...]}``) и формат ``access``
+    цели Redis MinIO (``[{"Event": [...], "EventTime": ...}]``).
+    :param raw:
+    :return:
+    """
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        logger.warning("Уведомление MinIO не в формате JSON пропущено")
+        return []
+    if isinstance(message, dict):
+        records = message.get("Records")
+        return records if isinstance(records, list) else []
+    if isinstance(message, list):
+        return [record for item in message if isinstance(item, dict)
+                and isinstance(item.get("Event"), list)
+                for record in item["Event"]]
+    return []
+
+
+def parse_event(record: dict) -> dict | None:
+    """
+    Событие создания или удаления объекта в папке пользователя.
+    Некорректная запись пропускается: иначе пакет с ней не применился
+    бы никогда, и очередь уведомлений остановилась бы на нём.
+    :param record: запись события S3
+    :return: None для прочих событий, объектов вне папок пользователей
+    (блобы, архивы папок) и некорректных записей
+    """
+    try:
+        return build_event(record)
+    except (AttributeError, TypeError, ValueError):
+        logger.warning("Некорректная запись события S3 пропущена: %r", record)
+        return None
+
+
+def build_event(record: dict) -> dict | None:
+    """
+    Разбор записи события S3.
+    :param record:
+    :return:
+    """
+    name = record.get("eventName") or ""
+    if "ObjectCreated:" in name:
+        created = True
+    elif "ObjectRemoved:" in name:
+        created = False
+    else:
+        return None
+    obj = (record.get("s3") or {}).get("object") or {}
+    match = USER_KEY_RE.match(unquote_plus(obj.get("key") or ""))
+    if match is None:
+        return None
+    etag = obj.get("eTag") or ""
+    return {
+        "user_id": int(match.group(1)),
+        "path": match.group(2),
+        "created": created,
+        "size": int(obj.get("size") or 0),
+        # В каталоге ETag хранится в кавычках, как его отдаёт S3 API
+        "etag": f'"{etag}"' if etag and not etag.startswith('"') else etag,
+        "content_type": obj.get("contentType") or "",
+        "time": parse_datetime(record.get("eventTime") or "") or timezone.now(),
+        "sequencer": obj.get("sequencer") or "",
+    }
+
+
+def get_folder_path(path: str) -> str | None:
+    """
+    Путь папки, если объект - метка папки ("a/b/" или "a/b/.keep").
+    :param path:
+    :return: путь папки с "/" в конце ("" - корень) или None для файлов
+    """
+    if path.endswith("/"):
+        return path
+    if path.rsplit("/", 1)[-1] == FOLDER_MARKER:
+        return path[:-len(FOLDER_MARKER)]
+    return None
+
+
+def get_event_order(event: dict) -> tuple:
+    # sequencer - шестнадцатеричная строка; более длинная - более поздняя
+    return event["time"], len(event["sequencer"]), event["sequencer"]
+
+
+def apply_events(records: list[dict]) -> dict:
+    """
+    Применение пакета событий S3 к каталогу: вместе с ним обновляются
+    поисковый индекс, счётчики места, журнал изменений и кэш списков.
+    Обработка идемпотентна: по каждому объекту берётся последнее событие
+    пакета, и оно пропускается, если каталог уже отражает его или
+    изменён позже события. Поэтому повторная доставка и эхо операций
+    самого приложения ничего не меняют.
+    :param records: записи событий S3
+    :return: количество созданных или обновлённых файлов ``created``,
+    удалённых ``deleted`` и пропущенных событий ``skipped``
+    """
+    latest = {}
+    for event in filter(None, map(parse_event, records)):
+        key = (event["user_id"], event["path"])
+        if key not in latest or get_event_order(event) >= get_event_order(latest[key]):
+            latest[key] = event
+
+    by_user = defaultdict(list)
+    for event in latest.values():
+        by_user[event["user_id"]].append(event)
+
+    result = {"created": 0, "deleted": 0, "skipped": len(records) - len(latest)}
+    for user_id, events in by_user.items():
+        applied = apply_user_events(user_id, events)
+        result["created"] += applied["created"]
+        result["deleted"] += applied["deleted"]
+        result["skipped"] += len(events) - applied["created"] - applied["deleted"]
+    return result
+
+
+def apply_user_events(user_id: int, events: list[dict]) -> dict:
+    """
+    Применение последних событий по объектам одного пользователя.
+    :param user_id:
+    :param events:
+    :return: количество созданных ``created`` и удалённых ``deleted``
+    """
+    if not get_user_model().objects.filter(id=user_id).exists():
+        return {"created": 0, "deleted": 0}
+    files, folders, deleted = [], [], []
+    with transaction.atomic():
+        paths = [get_folder_path(event["path"]) or event["path"] for event in events]
+        existing = catalog.get_entry_versions(user_id, paths)
+        # Объекты файлов в корзине остаются на исходных путях: повторно
+        # доставленное событие их создания не должно оживить файл
+        trashed = catalog.get_trashed_paths(
+            user_id, [path for path in paths if path not in existing]
+        )
+        for event in events:
+            path = event["path"]
+            folder = get_folder_path(path)
+            if folder is not None:
+                # Метка папки; её удаление не трогает содержимое папки
+                if (event["created"] and folder and folder not in existing
+                        and folder not in trashed):
+                    folders.append(folder)
+                continue
+            if path in trashed:
+                continue
+            entry = existing.get(path)
+            if entry is not None and (entry["blob_id"] is not None
+                                      or entry["modified_at"] > event["time"]):
+                # Файл из блоба или запись изменена после события
+                continue
+            if event["created"]:
+                if entry is None or entry["etag"] != event["etag"]:
+                    files.append({
+                        "file_name": path, "size": event["size"],
+                        "etag": event["etag"],
+                        "content_type": event["content_type"],
+                        "modified_at": event["time"],
+                    })
+            elif entry is not None:
+                deleted.append(path)
+
+        if files:
+            catalog.record_files(user_id, files)
+        for folder in folders:
+            catalog.record_folder(user_id, folder)
+        if deleted:
+            catalog.remove_entries(user_id, deleted)
+            log_changes(user_id, [{"action": StorageChange.DELETE, "path": path}
+                                  for path in deleted])
+
+    changed = [file["file_name"] for file in files] + folders + deleted
+    if changed:
+        invalidate_listing(user_id, sorted({
+            parent for path in changed for parent in get_parent_paths(path)
+        }))
+    return {"created": len(files) + len(folders), "deleted": len(deleted)}
+
+
+def recover_notifications(consumer: str) -> int:
+    """
+    Возврат в начало очереди сообщений, взятых потребителем, но не
+    применённых (процесс остановился посреди пакета).
+    :param consumer: имя потребителя
+    :return: количество возвращённых сообщений
+    """
+    connection = get_redis_connection("default")
+    recovered = 0
+    while connection.lmove(get_processing_key(consumer),
+                           settings.STORAGE_NOTIFY_QUEUE, "RIGHT", "LEFT"):
+        recovered += 1
+    return recovered
+
+
+def consume_batch(consumer: str,
+                  batch_size: int = settings.STORAGE_NOTIFY_BATCH_SIZE,
+                  timeout: int = 2) -> dict | None:
+    """
+    Один пакет сообщений очереди. Сообщения переносятся в список
+    потребителя и удаляются из него только после применения пакета,
+    поэтому каждое сообщение применяется хотя бы один раз.
+    :param consumer: имя потребителя
+    :param batch_size: максимальное количество сообщений в пакете
+    :param timeout: сколько секунд ждать первое сообщение
+    :return: итог ``apply_events`` и количество сообщений ``messages``
+    или None, если очередь пуста
+    """
+    connection = get_redis_connection("default")
+    queue, processing = settings.STORAGE_NOTIFY_QUEUE, get_processing_key(consumer)
+    raw = connection.blmove(queue, processing, timeout, "LEFT", "RIGHT")
+    if raw is None:
+        return None
+    messages = [raw]
+    while len(messages) < batch_size:
+        raw = connection.lmove(queue, processing, "LEFT", "RIGHT")
+        if raw is None:
+            break
+        messages.append(raw)
+    result = apply_events([record for raw in messages
+                           for record in parse_message(raw)])
+    connection.delete(processing)
+    return {**result, "messages": len(messages)}
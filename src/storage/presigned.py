@@ -0,0 +1,160 @@
+from django.conf import settings
+from django.db import transaction
+
+from src.storage import catalog
+from src.storage.changes import log_changes
+from src.storage.clients import get_presign_client
+from src.storage.exceptions import QuotaExceededError
+from src.storage.listing_cache import get_parent_paths, invalidate_listing
+from src.storage.models import StorageChange
+from src.storage.quotas import check_quota
+from src.storage.services import (
+    delete_objects,
+    get_object_key,
+    get_user_file_path,
+    stat_file,
+)
+
+
+def generate_download_url(
+        user_id: int,
+        file_name: str,
+        expires: int = settings.STORAGE_PRESIGNED_URL_EXPIRES,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> str:
+    """
+    Подписанная ссылка на скачивание файла напрямую из MinIO.
+    :param user_id:
+    :param file_name:
+    :param expires: время жизни ссылки в секундах
+    :param bucket_name:
+    :return:
+    """
+    base_name = file_name.rstrip("/").split("/")[-1]
+    return get_presign_client().generate_presigned_url(
+        "get_object",
+        Params={
+            "Bucket": bucket_name,
+            "Key": get_object_key(user_id, file_name),
+            "ResponseContentDisposition": f'attachment; filename="{base_name}"',
+        },
+        ExpiresIn=expires,
+    )
+
+
+def generate_upload_url(
+        user_id: int,
+        file_name: str,
+        size: int,
+        expires: int = settings.STORAGE_PRESIGNED_URL_EXPIRES,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> str:
+    """
+    Подписанная ссылка на загрузку файла одним PUT-запросом напрямую в MinIO.
+    Заголовок Content-Length входит в подпись: по ссылке можно загрузить
+    только файл того размера, который проверен по квоте.
+    :param user_id:
+    :param file_name:
+    :param size: размер файла в байтах
+    :param expires: время жизни ссылки в секундах
+    :param bucket_name:
+    :return:
+    """
+    return get_presign_client().generate_presigned_url(
+        "put_object",
+        Params={
+            "Bucket": bucket_name,
+            "Key": get_user_file_path(user_id, file_name),
+            "ContentLength": size,
+        },
+        ExpiresIn=expires,
+    )
+
+
+def generate_upload_part_urls(
+        user_id: int,
+        file_name: str,
+        upload_id: str,
+        part_numbers: list[int],
+        expires: int = settings.STORAGE_PRESIGNED_URL_EXPIRES,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> list[dict]:
+    """
+    Подписанные ссылки на загрузку частей составной загрузки.
+    :param user_id:
+    :param file_name:
+    :param upload_id:
+    :param part_numbers: номера частей, начиная с 1
+    :param expires: время жизни ссылок в секундах
+    :param bucket_name:
+    :return:
+    """
+    key = get_user_file_path(user_id, file_name)
+    return [
+        {
+            "part_number": part_number,
+            "url": get_presign_client().generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": bucket_name,
+                    "Key": key,
+                    "UploadId": upload_id,
+                    "PartNumber": part_number,
+                },
+                ExpiresIn=expires,
+            ),
+        }
+        for part_number in part_numbers
+    ]
+
+
+def complete_direct_upload(
+        user_id: int,
+        file_name: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> dict:
+    """
+    Фиксация файла, загруженного браузером напрямую в MinIO.
+    Проверяет, что объект действительно появился в хранилище
+    и его настоящий размер укладывается в квоту: при получении ссылок
+    квота проверялась по размеру, который заявил клиент.
+    :param user_id:
+    :param file_name:
+    :param bucket_name:
+    :return: метаданные загруженного файла
+    """
+    key = get_user_file_path(user_id, file_name)
+    metadata = stat_file(user_id, file_name, bucket_name, key=key)
+    try:
+        check_quota(user_id, metadata["size"], [file_name])
+    except QuotaExceededError:
+        reject_direct_upload(user_id, file_name, key, bucket_name)
+        raise
+    catalog.record_file(user_id, file_name, size=metadata["size"],
+                        etag=metadata["etag"],
+                        content_type=metadata["content_type"],
+                        modified_at=metadata["last_modified"])
+    invalidate_listing(user_id, get_parent_paths(file_name))
+    return metadata
+
+
+def reject_direct_upload(user_id: int, file_name: str, key: str,
+                         bucket_name: str) -> None:
+    """
+    Удаление объекта, загруженного сверх квоты. Файл, который лежал
+    по тому же пути, этим объектом уже перезаписан, поэтому его запись
+    тоже убирается из каталога.
+    :param user_id:
+    :param file_name:
+    :param key:
+    :param bucket_name:
+    :return:
+    """
+    delete_objects([key], bucket_name)
+    replaced = catalog.get_plain_files(user_id, [file_name])
+    if replaced:
+        with transaction.atomic():
+            catalog.remove_entries(user_id, replaced)
+            log_changes(user_id, [{"action": StorageChange.DELETE,
+                                   "path": file_name}])
+        invalidate_listing(user_id, get_parent_paths(file_name))
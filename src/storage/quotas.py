@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db.models import Sum
+
+from src.storage.exceptions import QuotaExceededError
+from src.storage.models import StorageUsage, StoredObject
+
+
+def get_usage(user_id: int) -> dict:
+    """
+    Занятое пользователем место по счётчикам, без обхода файлов.
+    :param user_id:
+    :return: ``bytes``, ``objects`` и квота ``quota`` (None - без ограничения)
+    """
+    usage = StorageUsage.objects.filter(owner_id=user_id).first()
+    if usage is None:
+        return {"bytes": 0, "objects": 0, "quota": settings.STORAGE_DEFAULT_QUOTA}
+    return {
+        "bytes": usage.bytes_used,
+        "objects": usage.objects_count,
+        "quota": usage.quota if usage.quota is not None
+        else settings.STORAGE_DEFAULT_QUOTA,
+    }
+
+
+def check_quota(user_id: int, size: int, paths: list[str] = ()) -> None:
+    """
+    Проверка квоты перед началом передачи файлов в хранилище.
+    Место, которое занимают перезаписываемые файлы, освобождается.
+    Одновременные загрузки проверяются независимо, поэтому квота
+    может быть превышена на их суммарный размер.
+    :param user_id:
+    :param size: общий размер загружаемых файлов
+    :param paths: пути загружаемых файлов
+    :return:
+    """
+    usage = get_usage(user_id)
+    if usage["quota"] is None:
+        return
+    replaced = 0
+    if paths:
+        replaced = (StoredObject.objects
+                    .filter(owner_id=user_id, path__in=paths, is_folder=False)
+                    .aggregate(total=Sum("size"))["total"] or 0)
+    available = usage["quota"] - usage["bytes"] + replaced
+    if size > available:
+        raise QuotaExceededError(size, available)
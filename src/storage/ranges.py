@@ -0,0 +1,205 @@
+from datetime import datetime
+
+from django.utils.http import parse_http_date_safe
+
+
+# Больше диапазонов в одном запросе не обслуживаем: отдаём файл целиком
+MAX_RANGES = 16
+
+
+def parse_range_header(header: str, size: int) -> list[tuple[int, int]] | None:
+    """
+    Разбор заголовка Range (RFC 9110, единица измерения bytes).
+    Диапазоны возвращаются в виде пар (start, end) включительно,
+    отсортированными и склеенными, если они пересекаются или соприкасаются.
+    :param header: значение заголовка Range
+    :param size: размер файла в байтах
+    :return: None, если заголовок нужно проигнорировать (ошибка синтаксиса,
+    другая единица, слишком много диапазонов); пустой список, если ни один
+    диапазон не попадает в файл (ответ 416)
+    """
+    unit, separator, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not separator or not specs.strip():
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        first, dash, last = (part.strip() for part in spec.partition("-"))
+        if not dash:
+            return None
+        if not first:
+            # Суффиксный диапазон: последние N байт файла
+            if not last.isdigit():
+                return None
+            length = int(last)
+            if length == 0 or size == 0:
+                continue
+            ranges.append((max(size - length, 0), size - 1))
+            continue
+        if not first.isdigit() or (last and not last.isdigit()):
+            return None
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+
+    ranges = coalesce_ranges(ranges)
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+def coalesce_ranges(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Склейка пересекающихся и соседних диапазонов,
+    чтобы не читать из хранилища одни и те же байты дважды.
+    :param ranges:
+    :return:
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(
+        if_range: str | None,
+        etag: str | None,
+        last_modified: datetime | None
+) -> bool:
+    """
+    Проверка заголовка If-Range: диапазоны обслуживаются,
+    только если у клиента та же версия файла.
+    :param if_range: значение заголовка If-Range
+    :param etag: ETag объекта в хранилище
+    :param last_modified: время изменения объекта в хранилище
+    :return:
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith("W/"):
+        # Для If-Range допустимо только строгое сравнение ETag
+        return False
+    if if_range.startswith('"'):
+        return etag is not None and if_range == etag
+    timestamp = parse_http_date_safe(if_range)
+    return (timestamp is not None and last_modified is not None
+            and int(last_modified.timestamp()) == timestamp)
+
+
+def content_range(start: int, end: int, size: int) -> str:
+    """
+    Значение заголовка Content-Range для диапазона.
+    :param start:
+    :param end:
+    :param size:
+    :return:
+    """
+    return f"bytes {start}-{end}/{size}"
+
+
+def multipart_part_header(
+        boundary: str,
+        content_type: str,
+        start: int,
+        end: int,
+        size: int
+) -> bytes:
+    """
+    Заголовок одной части ответа multipart/byteranges.
+    :param boundary:
+    :param content_type:
+    :param start:
+    :param end:
+    :param size:
+    :return:
+    """
+    return (
+        f"--{boundary}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Range: {content_range(start, end, size)}\r\n"
+        f"\r\n"
+    ).encode("latin-1")
+
+
+def multipart_length(
+        ranges: list[tuple[int, int]],
+        boundary: str,
+        content_type: str,
+        size: int
+) -> int:
+    """
+    Полная длина тела ответа multipart/byteranges,
+    чтобы отдать Content-Length до начала передачи.
+    :param ranges:
+    :param boundary:
+    :param content_type:
+    :param size:
+    :return:
+    """
+    length = len(f"--{boundary}--\r\n")
+    for start, end in ranges:
+        header = multipart_part_header(boundary, content_type, start, end, size)
+        length += len(header) + (end - start + 1) + len(b"\r\n")
+    return length
+
+
+def iter_multipart_byteranges(
+        ranges: list[tuple[int, int]],
+        boundary: str,
+        content_type: str,
+        size: int,
+        open_range
+):
+    """
+    Тело ответа multipart/byteranges.
+    Каждый диапазон открывается через ``open_range(start, end)`` только когда
+    до него доходит очередь, поэтому при обрыве соединения оставшиеся
+    диапазоны из хранилища не читаются.
+    :param ranges:
+    :param boundary:
+    :param content_type:
+    :param size:
+    :param open_range: функция, возвращающая итератор кусков диапазона
+    :return:
+    """
+    for start, end in ranges:
+        yield multipart_part_header(boundary, content_type, start, end, size)
+        yield from open_range(start, end)
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("latin-1")
+
+
+async def aiter_multipart_byteranges(
+        ranges: list[tuple[int, int]],
+        boundary: str,
+        content_type: str,
+        size: int,
+        open_range
+):
+    """
+    Асинхронный вариант ``iter_multipart_byteranges``.
+    :param ranges:
+    :param boundary:
+    :param content_type:
+    :param size:
+    :param open_range: функция, возвращающая асинхронный итератор
+    кусков диапазона
+    :return:
+    """
+    for start, end in ranges:
+        yield multipart_part_header(boundary, content_type, start, end, size)
+        async for chunk in open_range(start, end):
+            yield chunk
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("latin-1")
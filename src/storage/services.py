@@ -1,26 +1,42 @@
-import boto3
+import math
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import chain
+
 from botocore.exceptions import (
     ClientError,
     NoCredentialsError
 )
 from django.conf import settings
+from django.db import transaction
 
+from src.storage import blobs, catalog
+from src.storage.changes import log_changes
+from src.storage.clients import get_s3_client, get_transfer_config
 from src.storage.exceptions import (
     BucketCreationError,
     FileUploadError,
     FileDownloadError,
-    StorageError,
     FileDeleteError,
+    FileNotfoundError,
+    UploadPartError,
+)
+from src.storage.listing_cache import (
+    get_cached_listing,
+    get_parent_paths,
+    invalidate_listing,
+    invalidate_user_listings,
+    set_cached_listing,
 )
+from src.storage.metrics import bind_context
+from src.storage.models import StorageChange
 
+# Размер куска при потоковой отдаче файла клиенту
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
-# Инициализация клиента S3 (MinIO)
-s3_client = boto3.client(
-    "s3",
-    endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-)
+# Бакеты, существование которых уже проверено этим процессом
+ready_buckets: set[str] = set()
+ready_buckets_lock = threading.Lock()
 
 
 # Создание бакета в MinIO
@@ -32,21 +48,68 @@ def create_bucket(bucket_name: str) -> None:
     """
     try:
         # Проверяем, существует ли бакет
-        s3_client.head_bucket(Bucket=bucket_name)
+        get_s3_client().head_bucket(Bucket=bucket_name)
     except ClientError:
         # Если бакет не существует, создаем его
         try:
-            s3_client.create_bucket(Bucket=bucket_name)
+            get_s3_client().create_bucket(Bucket=bucket_name)
         except ClientError as exc:
-            raise BucketCreationError(
-                f"Ошибка при создании бакета {bucket_name}: {exc}"
-            )
+            raise BucketCreationError(bucket_name, exc)
+
+
+def ensure_bucket(bucket_name: str) -> None:
+    """
+    Создание бакета, если его нет. Проверка выполняется один раз
+    на процесс: повторно бакет проверяется только после ошибки NoSuchBucket.
+    :param bucket_name:
+    :return:
+    """
+    if bucket_name in ready_buckets:
+        return
+    with ready_buckets_lock:
+        if bucket_name not in ready_buckets:
+            create_bucket(bucket_name)
+            ready_buckets.add(bucket_name)
+
+
+def is_no_such_bucket(exc: ClientError) -> bool:
+    return exc.response.get("Error", {}).get("Code") == "NoSuchBucket"
+
+
+def retry_on_missing_bucket(operation, bucket_name: str):
+    """
+    Выполнение запроса записи в бакет. Если бакет не найден
+    (например, его удалили после запуска), он создаётся
+    и запрос повторяется один раз.
+    :param operation: функция без аргументов, выполняющая запрос к MinIO
+    :param bucket_name:
+    :return: результат ``operation``
+    """
+    try:
+        return operation()
+    except ClientError as exc:
+        if not is_no_such_bucket(exc):
+            raise
+    ready_buckets.discard(bucket_name)
+    ensure_bucket(bucket_name)
+    return operation()
 
 
 def get_user_file_path(user_id: int, file_name: str) -> str:
     return f"user-{user_id}-files/{file_name}"
 
 
+def is_safe_file_name(file_name: str) -> bool:
+    """
+    Проверка пути файла, пришедшего от клиента:
+    путь не должен выходить за пределы папки пользователя.
+    :param file_name:
+    :return:
+    """
+    return (bool(file_name) and not file_name.startswith("/")
+            and ".." not in file_name.split("/"))
+
+
 # def get_file_url(user_id: int, file_name: str) -> str:
 #     """
 #     Получаем URL для файла в MinIO.
@@ -69,65 +132,666 @@ bucket_name=settings.AWS_STORAGE_BUCKET_NAME) -> str:
     :param bucket_name:
     :return:
     """
-    create_bucket(bucket_name)
-    full_file_path = get_user_file_path(user_id, file_name)
+    content_type = getattr(file, "content_type", None) or "application/octet-stream"
+    target = get_upload_target(file, user_id, file_name)
     try:
-        s3_client.upload_fileobj(file, bucket_name, full_file_path)
+        etag = put_file(file, target, content_type, bucket_name)
     except (NoCredentialsError, ClientError) as exc:
+        release_upload_target(target)
         raise FileUploadError(file_name, exc)
 
+    record_uploads(user_id, [{
+        "file_name": file_name, "size": file.size, "etag": etag,
+        "content_type": content_type, "blob": target["blob"],
+    }], bucket_name)
     return file_name
 
 
+def get_upload_target(file, user_id: int, file_name: str) -> dict:
+    """
+    Куда записать принятый файл. С дедупликацией (STORAGE_DEDUP)
+    файл записывается в блоб по SHA-256 содержимого, и если такое
+    содержимое уже есть в хранилище, передавать байты не нужно.
+    Иначе - под своим путём в папке пользователя.
+    :param file:
+    :param user_id:
+    :param file_name:
+    :return: ключ объекта ``key`` и блоб ``blob`` (или None)
+    """
+    if not settings.STORAGE_DEDUP or hasattr(file, "commit"):
+        return {"key": get_user_file_path(user_id, file_name), "blob": None}
+    sha256 = blobs.hash_file(file)
+    return {"key": blobs.get_blob_key(sha256),
+            "blob": blobs.acquire_blob(sha256, file.size)}
+
+
+def release_upload_target(target: dict) -> None:
+    """
+    Снятие ссылки на блоб после неудачной загрузки.
+    :param target:
+    :return:
+    """
+    if target["blob"] is not None:
+        blobs.release_blobs([target["blob"].sha256])
+
+
+def put_file(file, target: dict, content_type: str, bucket_name: str) -> str:
+    """
+    Запись принятого файла в MinIO без обновления каталога.
+    Обращается только к MinIO, поэтому вызывается и из пула потоков.
+    :param file:
+    :param target: результат ``get_upload_target``
+    :param content_type:
+    :param bucket_name:
+    :return: ETag записанного объекта
+    """
+    if hasattr(file, "commit"):
+        # Файл уже передан в MinIO по частям во время приёма запроса
+        return file.commit()
+    blob = target["blob"]
+    if blob is not None and blob.stored:
+        # Такое содержимое уже хранится: байты в MinIO не передаются
+        return blob.etag
+
+    key = target["key"]
+    transfer_config = get_transfer_config("upload")
+
+    def send() -> str:
+        file.seek(0)
+        if file.size <= transfer_config.multipart_threshold:
+            # Небольшой файл - одним запросом, ETag приходит в ответе
+            return get_s3_client().put_object(
+                Bucket=bucket_name, Key=key, Body=file,
+                ContentType=content_type,
+            )["ETag"]
+        get_s3_client().upload_fileobj(
+            file, bucket_name, key,
+            ExtraArgs={"ContentType": content_type}, Config=transfer_config,
+        )
+        return get_s3_client().head_object(Bucket=bucket_name, Key=key)["ETag"]
+
+    return retry_on_missing_bucket(send, bucket_name)
+
+
+def record_uploads(
+        user_id: int,
+        uploads: list[dict],
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> None:
+    """
+    Запись загруженных файлов в каталог и сброс кэша списков.
+    Объекты в папке пользователя, которые заменили файлы из блобов,
+    удаляются из MinIO.
+    :param user_id:
+    :param uploads: описания файлов для ``catalog.record_files``
+    с блобом ``blob`` (или None) вместо ``blob_id``
+    :param bucket_name:
+    :return:
+    """
+    files = []
+    for upload in uploads:
+        blob = upload.pop("blob", None)
+        if blob is not None and not blob.stored:
+            blobs.mark_stored(blob.sha256, upload["etag"])
+        files.append({**upload, "blob_id": blob.sha256 if blob else None})
+
+    replaced = catalog.get_plain_files(
+        user_id, [file["file_name"] for file in files if file["blob_id"]]
+    )
+    catalog.record_files(user_id, files)
+    if replaced:
+        delete_objects([get_user_file_path(user_id, path) for path in replaced],
+                       bucket_name)
+    invalidate_listing(user_id, sorted({
+        path for file in files for path in get_parent_paths(file["file_name"])
+    }))
+
+
+def upload_existing_blob(
+        user_id: int,
+        file_name: str,
+        sha256: str,
+        size: int,
+        content_type: str = ""
+) -> bool:
+    """
+    Мгновенная загрузка: файл с известным хэшем записывается в каталог
+    как ссылка на уже хранящийся блоб, без передачи содержимого.
+    :param user_id:
+    :param file_name:
+    :param sha256: SHA-256 содержимого, посчитанный клиентом
+    :param size:
+    :param content_type:
+    :return: False, если такого содержимого в хранилище нет
+    """
+    if blobs.find_blob(sha256, size, user_id) is None:
+        return False
+    blob = blobs.acquire_blob(sha256, size)
+    if not blob.stored:
+        # Блоб успели удалить между проверкой и новой ссылкой
+        blobs.release_blobs([sha256])
+        return False
+    record_uploads(user_id, [{
+        "file_name": file_name, "size": size, "etag": blob.etag,
+        "content_type": content_type, "blob": blob,
+    }])
+    return True
+
+
+def upload_files(
+        files: list[tuple[str, object]],
+        user_id: int,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> list[dict]:
+    """
+    Загрузка нескольких файлов (например, папки) одним пакетом.
+    Файлы отправляются в MinIO параллельно, не больше
+    STORAGE_BATCH_UPLOAD_CONCURRENCY одновременно; каталог и кэш
+    списков обновляются один раз для всех загруженных файлов.
+    Недостающие папки создаются в каталоге по путям файлов.
+    :param files: пары (путь файла, принятый файл)
+    :param user_id:
+    :param bucket_name:
+    :return: результат по каждому файлу в исходном порядке:
+    ``file_name`` и ``error``, если файл загрузить не удалось
+    """
+    results = [{"file_name": file_name} for file_name, _ in files]
+    uploaded = []
+
+    with ThreadPoolExecutor(
+            max_workers=settings.STORAGE_BATCH_UPLOAD_CONCURRENCY) as executor:
+        futures = {}
+        for index, (file_name, file) in enumerate(files):
+            if not is_safe_file_name(file_name) or file_name.endswith("/"):
+                results[index]["error"] = "Некорректный путь файла"
+                continue
+            content_type = (getattr(file, "content_type", None)
+                            or "application/octet-stream")
+            # Запросы к базе - в текущем потоке, в пуле - только MinIO
+            target = get_upload_target(file, user_id, file_name)
+            future = executor.submit(bind_context(put_file), file, target,
+                                     content_type, bucket_name)
+            futures[future] = (index, target, content_type)
+        for future, (index, target, content_type) in futures.items():
+            file_name, file = files[index]
+            try:
+                etag = future.result()
+            except (NoCredentialsError, ClientError) as exc:
+                release_upload_target(target)
+                results[index]["error"] = str(FileUploadError(file_name, exc))
+                continue
+            uploaded.append({
+                "file_name": file_name, "size": file.size, "etag": etag,
+                "content_type": content_type, "blob": target["blob"],
+            })
+
+    if uploaded:
+        record_uploads(user_id, uploaded, bucket_name)
+    return results
+
+
+def get_object_key(user_id: int, file_name: str) -> str:
+    """
+    Ключ объекта MinIO с содержимым файла: блоб, если файл хранится
+    с дедупликацией, иначе путь в папке пользователя.
+    Файл должен быть в каталоге: объект файла в корзине остаётся
+    под прежним ключом до очистки, но скачать его нельзя.
+    :param user_id:
+    :param file_name:
+    :return:
+    """
+    entry = catalog.get_live_file(user_id, file_name)
+    if entry is None:
+        raise FileNotfoundError(file_name)
+    if entry["blob_id"] is not None:
+        return blobs.get_blob_key(entry["blob_id"])
+    return get_user_file_path(user_id, file_name)
+
+
 def download_file(
         user_id: int,
         file_name: str,
-        bucket_name=settings.AWS_STORAGE_BUCKET_NAME
-) -> str:
+        bucket_name=settings.AWS_STORAGE_BUCKET_NAME,
+        byte_range: tuple[int, int] | None = None,
+        if_match: str | None = None
+) -> dict:
+    """
+    Открытие потока на чтение файла из MinIO.
+    Тело объекта не сохраняется на диск и не читается целиком в память:
+    оно отдаётся кусками по мере чтения из MinIO.
+    :param user_id:
+    :param file_name:
+    :param bucket_name:
+    :param byte_range: диапазон байт (start, end) включительно
+    :param if_match: ETag версии файла, которую нужно прочитать
+    :return: поток ``body`` и метаданные объекта
     """
-    Скачивание файла из MinIO.
+    params = {"Bucket": bucket_name, "Key": get_object_key(user_id, file_name)}
+    if byte_range is not None:
+        params["Range"] = "bytes={}-{}".format(*byte_range)
+    if if_match is not None:
+        params["IfMatch"] = if_match
+
+    try:
+        response = get_s3_client().get_object(**params)
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            raise FileNotfoundError(file_name, exc)
+        raise FileDownloadError(file_name, exc)
+    except NoCredentialsError as exc:
+        raise FileDownloadError(file_name, exc)
+
+    return {
+        "body": iter_file_chunks(response["Body"]),
+        **get_object_metadata(response),
+    }
+
+
+def stat_file(
+        user_id: int,
+        file_name: str,
+        bucket_name=settings.AWS_STORAGE_BUCKET_NAME,
+        key: str | None = None
+) -> dict:
+    """
+    Метаданные файла в MinIO без чтения его содержимого.
     :param user_id:
     :param file_name:
     :param bucket_name:
+    :param key: ключ объекта (по умолчанию - по записи каталога)
     :return:
     """
-    full_file_path = get_user_file_path(user_id, file_name)
+    key = key or get_object_key(user_id, file_name)
+    try:
+        response = get_s3_client().head_object(Bucket=bucket_name, Key=key)
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            raise FileNotfoundError(file_name, exc)
+        raise FileDownloadError(file_name, exc)
+    except NoCredentialsError as exc:
+        raise FileDownloadError(file_name, exc)
+
+    return get_object_metadata(response)
+
+
+def get_object_metadata(response: dict) -> dict:
+    """
+    Метаданные объекта из ответа get_object/head_object.
+    :param response:
+    :return:
+    """
+    return {
+        "size": response["ContentLength"],
+        "content_type": response.get("ContentType"),
+        "etag": response.get("ETag"),
+        "last_modified": response.get("LastModified"),
+    }
+
 
+def iter_file_chunks(body, chunk_size: int = DOWNLOAD_CHUNK_SIZE):
+    """
+    Чтение потока объекта MinIO кусками фиксированного размера.
+    Поток закрывается и при полном чтении, и при обрыве соединения клиентом.
+    :param body:
+    :param chunk_size:
+    :return:
+    """
     try:
-        with open(file_name, 'wb') as file:
-            s3_client.download_fileobj(bucket_name, full_file_path, file)
+        yield from body.iter_chunks(chunk_size)
+    finally:
+        body.close()
+
+
+def get_parts_count(size: int,
+                    part_size: int = settings.STORAGE_MULTIPART_PART_SIZE) -> int:
+    """
+    Количество частей составной загрузки для файла заданного размера.
+    :param size:
+    :param part_size:
+    :return:
+    """
+    return max(math.ceil(size / part_size), 1)
+
+
+def create_multipart_upload(
+        user_id: int,
+        file_name: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> str:
+    """
+    Начало составной (multipart) загрузки файла.
+    :param user_id:
+    :param file_name:
+    :param bucket_name:
+    :return: идентификатор загрузки
+    """
+    try:
+        response = retry_on_missing_bucket(
+            lambda: get_s3_client().create_multipart_upload(
+                Bucket=bucket_name,
+                Key=get_user_file_path(user_id, file_name),
+            ),
+            bucket_name,
+        )
     except (NoCredentialsError, ClientError) as exc:
-        raise FileDownloadError(file_name, exc)
+        raise FileUploadError(file_name, exc)
+    return response["UploadId"]
 
-    return file_name
 
+def complete_multipart_upload(
+        user_id: int,
+        file_name: str,
+        upload_id: str,
+        parts: list[dict],
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> str:
+    """
+    Завершение составной загрузки: MinIO собирает объект из частей.
+    :param user_id:
+    :param file_name:
+    :param upload_id:
+    :param parts: список словарей с ключами part_number и etag
+    :param bucket_name:
+    :return: ETag собранного объекта
+    """
+    try:
+        response = get_s3_client().complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=get_user_file_path(user_id, file_name),
+            UploadId=upload_id,
+            MultipartUpload={"Parts": [
+                {"PartNumber": int(part["part_number"]), "ETag": part["etag"]}
+                for part in sorted(parts, key=lambda x: int(x["part_number"]))
+            ]},
+        )
+    except (NoCredentialsError, ClientError) as exc:
+        raise FileUploadError(file_name, exc)
+    return response["ETag"]
 
-def delete_file(
+
+def upload_part(
         user_id: int,
         file_name: str,
-        bucket_name=settings.AWS_STORAGE_BUCKET_NAME
-) -> bool:
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> str:
     """
-    Удаление файла из MinIO.
+    Загрузка одной части составной загрузки.
     :param user_id:
     :param file_name:
+    :param upload_id:
+    :param part_number: номер части, начиная с 1
+    :param data: содержимое части
+    :param bucket_name:
+    :return: ETag загруженной части
+    """
+    try:
+        response = get_s3_client().upload_part(
+            Bucket=bucket_name,
+            Key=get_user_file_path(user_id, file_name),
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+    except (NoCredentialsError, ClientError) as exc:
+        raise UploadPartError(part_number, exc)
+    return response["ETag"]
+
+
+def list_uploaded_parts(
+        user_id: int,
+        file_name: str,
+        upload_id: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> list[dict]:
+    """
+    Список частей составной загрузки, уже полученных хранилищем.
+    :param user_id:
+    :param file_name:
+    :param upload_id:
+    :param bucket_name:
+    :return: список словарей с ключами part_number, etag и size
+    """
+    parts = []
+    paginator = get_s3_client().get_paginator("list_parts")
+    try:
+        for page in paginator.paginate(
+                Bucket=bucket_name,
+                Key=get_user_file_path(user_id, file_name),
+                UploadId=upload_id):
+            parts.extend(
+                {"part_number": part["PartNumber"], "etag": part["ETag"],
+                 "size": part["Size"]}
+                for part in page.get("Parts", [])
+            )
+    except (NoCredentialsError, ClientError) as exc:
+        raise FileUploadError(file_name, exc)
+    return parts
+
+
+def abort_multipart_upload(
+        user_id: int,
+        file_name: str,
+        upload_id: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+) -> None:
+    """
+    Отмена составной загрузки и удаление уже загруженных частей.
+    :param user_id:
+    :param file_name:
+    :param upload_id:
     :param bucket_name:
     :return:
     """
-    full_file_path = get_user_file_path(user_id, file_name)
     try:
-        included_files = s3_client.list_objects_v2(
+        get_s3_client().abort_multipart_upload(
             Bucket=bucket_name,
-            Prefix=full_file_path
+            Key=get_user_file_path(user_id, file_name),
+            UploadId=upload_id,
         )
-        objects_to_delete = [{"Key": obj["Key"]} for obj in included_files[
-                "Contents"]]
-        s3_client.delete_objects(Bucket=bucket_name,
-                                 Delete={"Objects": objects_to_delete})
+    except (NoCredentialsError, ClientError) as exc:
+        raise FileUploadError(file_name, exc)
+
+
+def delete_file(
+        user_id: int,
+        file_name: str,
+        bucket_name=settings.AWS_STORAGE_BUCKET_NAME,
+        on_progress=None
+) -> dict:
+    """
+    Удаление файла или папки со всем содержимым из MinIO.
+    Путь с "/" в конце - папка; путь без него - файл и одноимённая папка.
+    Соседние объекты с тем же началом имени ("report-old" при удалении
+    "report") не затрагиваются.
+    :param user_id:
+    :param file_name:
+    :param bucket_name:
+    :param on_progress: вызывается после каждого удалённого пакета
+    с количеством удалённых объектов ``objects``
+    :return: количество удалённых объектов ``deleted`` и ошибки по ключам
+    ``errors``
+    """
+    full_file_path = get_user_file_path(user_id, file_name)
+    if file_name.endswith("/"):
+        keys = iter_object_keys(full_file_path, bucket_name)
+    else:
+        keys = chain([full_file_path],
+                     iter_object_keys(full_file_path + "/", bucket_name))
+
+    user_prefix = get_user_file_path(user_id, "")
+    progress = {"objects": 0}
+    # Записи корней удаляются из каталога вместе с пакетами объектов,
+    # а в журнал изменений попадают после удаления всего содержимого
+    roots = catalog.get_existing_paths(user_id, catalog.get_root_paths(file_name))
+
+    def on_batch_deleted(deleted_keys: list[str]) -> None:
+        catalog.remove_entries(
+            user_id, [key.removeprefix(user_prefix) for key in deleted_keys]
+        )
+        progress["objects"] += len(deleted_keys)
+        if on_progress is not None:
+            on_progress(dict(progress))
+
+    try:
+        result = delete_objects(keys, bucket_name, on_batch_deleted)
     except ClientError as exc:
         raise FileDeleteError(file_name, exc)
-    else:
-        return True
+
+    if not result["errors"]:
+        # Папки (в том числе опустевшие вложенные) удаляются из каталога,
+        # только если удалось удалить всё содержимое
+        catalog.remove_path(user_id, file_name, roots)
+    elif progress["objects"]:
+        # Удалена только часть файлов: клиентам синхронизации
+        # нужно перечитать папку
+        log_changes(user_id, [{"action": StorageChange.RESCAN,
+                               "path": file_name}])
+    invalidate_listing(user_id, get_parent_paths(file_name))
+    if result["deleted"] > 1 or file_name.endswith("/"):
+        # Удалена папка: устарели и списки всех вложенных папок
+        invalidate_user_listings(user_id)
+    return result
+
+
+def iter_objects(
+        prefix: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+):
+    """
+    Обход всех объектов с заданным префиксом постранично.
+    :param prefix:
+    :param bucket_name:
+    :return: описания объектов из ответа list_objects_v2 (Key, Size, ETag...)
+    """
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        yield from page.get("Contents", [])
+
+
+def iter_object_keys(
+        prefix: str,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+):
+    """
+    Обход ключей всех объектов с заданным префиксом постранично.
+    :param prefix:
+    :param bucket_name:
+    :return:
+    """
+    for obj in iter_objects(prefix, bucket_name):
+        yield obj["Key"]
+
+
+def iter_batches(items, size: int):
+    """
+    Разбиение потока элементов на списки не длиннее size.
+    :param items:
+    :param size:
+    :return:
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def delete_object_batch(keys: list[str], bucket_name: str) -> list[dict]:
+    """
+    Удаление пачки объектов одним запросом DeleteObjects.
+    :param keys: не больше 1000 ключей
+    :param bucket_name:
+    :return: ошибки по ключам, которые не удалось удалить
+    """
+    try:
+        response = get_s3_client().delete_objects(
+            Bucket=bucket_name,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+    except ClientError as exc:
+        error = exc.response.get("Error", {})
+        return [{"key": key, "code": error.get("Code"),
+                 "message": error.get("Message")} for key in keys]
+    return [
+        {"key": error["Key"], "code": error.get("Code"),
+         "message": error.get("Message")}
+        for error in response.get("Errors", [])
+    ]
+
+
+def purge_blobs(bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME) -> dict:
+    """
+    Удаление блобов, на которые больше не ссылается ни один файл.
+    Блобы блокируются на время удаления пачкой, поэтому новая ссылка
+    на удаляемый блоб дождётся конца транзакции и создаст его заново.
+    :param bucket_name:
+    :return: количество удалённых блобов и ошибки удаления объектов
+    """
+    deleted, errors = 0, []
+    while True:
+        with transaction.atomic():
+            batch = blobs.get_unreferenced_blobs(settings.STORAGE_DELETE_BATCH_SIZE)
+            if not batch:
+                break
+            keys = {blobs.get_blob_key(blob.sha256): blob.sha256 for blob in batch}
+            batch_errors = delete_object_batch(list(keys), bucket_name)
+            failed = {keys[error["key"]] for error in batch_errors}
+            deleted += blobs.delete_blobs(
+                [sha256 for sha256 in keys.values() if sha256 not in failed]
+            )
+        errors.extend(batch_errors)
+        if failed:
+            # Не удалённые объекты остаются до следующего запуска
+            break
+    return {"deleted": deleted, "errors": errors}
+
+
+def delete_objects(
+        keys,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME,
+        on_batch_deleted=None
+) -> dict:
+    """
+    Удаление объектов пачками по STORAGE_DELETE_BATCH_SIZE ключей.
+    Пачки отправляются параллельно, но не больше
+    STORAGE_DELETE_CONCURRENCY запросов одновременно; ключи читаются
+    из потока по мере отправки, весь список в памяти не собирается.
+    :param keys: поток ключей объектов
+    :param bucket_name:
+    :param on_batch_deleted: вызывается в текущем потоке со списком
+    успешно удалённых ключей каждой пачки
+    :return: количество удалённых объектов ``deleted`` и ошибки ``errors``
+    """
+    concurrency = settings.STORAGE_DELETE_CONCURRENCY
+    result = {"deleted": 0, "errors": []}
+    pending = {}
+
+    def collect(done) -> None:
+        for future in done:
+            batch = pending.pop(future)
+            errors = future.result()
+            failed = {error["key"] for error in errors}
+            deleted_keys = [key for key in batch if key not in failed]
+            result["deleted"] += len(deleted_keys)
+            result["errors"].extend(errors)
+            if on_batch_deleted is not None and deleted_keys:
+                on_batch_deleted(deleted_keys)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for batch in iter_batches(keys, settings.STORAGE_DELETE_BATCH_SIZE):
+            if len(pending) >= concurrency:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(bind_context(delete_object_batch), batch,
+                                    bucket_name)] = batch
+        collect(wait(pending).done)
+    return result
 
 
 def list_user_files(
@@ -136,40 +800,69 @@ def list_user_files(
         bucket_name=settings.AWS_STORAGE_BUCKET_NAME
 ) -> list[dict]|list:
     """
-    Получение списка файлов пользователя.
+    Получение полного списка файлов и папок внутри папки пользователя
+    (только прямые потомки, без обхода вложенных папок).
     :param user_id:
     :param path:
     :param bucket_name:
     :return:
     """
-    full_file_path = get_user_file_path(user_id, path)
-    # Префикс папки пользователя
     files = []
-    exist_files = set()
-    try:
-        response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=full_file_path)
-        for obj in response.get("Contents", []):
-            # Адрес вглубь от текущей папки для определения папка/файл
-            long_file_name = obj["Key"].removeprefix(full_file_path)
-            # Имя только текущего файла
-            file_name = long_file_name.split("/")[0]
-            if "/" in long_file_name:
-                file_name += "/"
-            file_path = path + file_name
-            if file_name in exist_files or file_name == ".keep":
-                continue
-            exist_files.add(file_name)
-            files.append({
-                "id": file_path, # Используем путь в качестве ID
-                "name": file_name,
-                "is_folder": "/" in long_file_name
-            })
-    except ClientError as exc:
-        raise StorageError(f"Ошибка при получении списка файлов пользователя "
-                           f"{user_id}: {exc}")
+    cursor = None
+    while True:
+        page = list_user_files_page(user_id, path, cursor,
+                                    bucket_name=bucket_name)
+        files.extend(page["files"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
     return sorted(files, key=lambda x: not x["is_folder"])
 
 
+def list_user_files_page(
+        user_id: int,
+        path: str = "",
+        cursor: str | None = None,
+        limit: int = settings.STORAGE_LIST_PAGE_SIZE,
+        bucket_name=settings.AWS_STORAGE_BUCKET_NAME
+) -> dict:
+    """
+    Одна страница содержимого папки пользователя.
+    Список строится по каталогу в PostgreSQL (см. ``catalog``),
+    MinIO при просмотре папок не запрашивается.
+    :param user_id:
+    :param path: путь папки с "/" в конце (пустая строка - корень)
+    :param cursor: курсор следующей страницы из предыдущего ответа
+    :param limit: максимальное количество записей на странице
+    :param bucket_name:
+    :return: словарь со списком ``files`` и курсором ``next_cursor``
+    """
+    page, cache_key = get_cached_listing(user_id, path, cursor, limit)
+    if page is None:
+        page = catalog.list_folder_page(user_id, path, cursor, limit)
+        set_cached_listing(cache_key, page)
+    return page
+
+
+def iter_user_objects(
+        user_id: int,
+        bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME
+):
+    """
+    Обход всех объектов пользователя в MinIO постранично.
+    :param user_id:
+    :param bucket_name:
+    :return: пары (путь относительно папки пользователя, метаданные)
+    """
+    prefix = get_user_file_path(user_id, "")
+    for obj in iter_objects(prefix, bucket_name):
+        yield obj["Key"].removeprefix(prefix), {
+            "size": obj["Size"],
+            "etag": obj.get("ETag"),
+            "last_modified": obj.get("LastModified"),
+        }
+
+
 def generate_breadcrumbs(path: str) -> list[dict]:
     """
     Генерация списка breadcrumbs для навигации.
@@ -187,28 +880,6 @@ def generate_breadcrumbs(path: str) -> list[dict]:
     return breadcrumbs
 
 
-def rename_file(file_name: str, new_name: str, bucket_name: str =
-settings.AWS_STORAGE_BUCKET_NAME) -> None:
-    """
-    Rename file in minio.
-    :param file_id:
-    :param new_name:
-    :param bucket_name:
-    :return:
-    """
-
-    # Формируем новый путь файла в MinIO
-    new_key = "/".join(file_name.split("/")[:-1]) + "/" + new_name
-
-    # Переименование файла в MinIO (копируем и удаляем старый)
-    s3_client.copy_object(
-        Bucket=bucket_name,
-        CopySource={"Bucket": bucket_name, "Key": file_name},
-        Key=new_key
-    )
-    s3_client.delete_object(Bucket=bucket_name, Key=file_name)
-
-
 def create_folder(user_id: int, file_name: str,
     bucket_name: str = settings.AWS_STORAGE_BUCKET_NAME) -> bool:
     """
@@ -219,59 +890,34 @@ def create_folder(user_id: int, file_name: str,
     :return:
     """
     full_file_path = get_user_file_path(user_id, file_name)
-    placeholder_file = full_file_path + "/.keep"
+    placeholder_file = full_file_path.rstrip("/") + "/.keep"
     try:
         # Создаем папку (загружаем пустой объект)
-        s3_client.put_object(Bucket=bucket_name, Key=placeholder_file, Body=b'')
+        retry_on_missing_bucket(
+            lambda: get_s3_client().put_object(Bucket=bucket_name,
+                                               Key=placeholder_file, Body=b''),
+            bucket_name,
+        )
     except ClientError as exc:
         raise Exception(f"Не удалось создать папку: {str(exc)}")
-    else:
-        return True
 
+    catalog.record_folder(user_id, file_name.rstrip("/") + "/")
+    invalidate_listing(user_id, get_parent_paths(file_name))
+    return True
 
-def search_files(user_id: int, query: str,
-    bucket_name=settings.AWS_STORAGE_BUCKET_NAME) -> list[dict]:
+
+def search_files(
+        user_id: int,
+        query: str,
+        page: int = 1,
+        limit: int = settings.STORAGE_SEARCH_PAGE_SIZE
+) -> dict:
     """
-    Поиск файлов и папок в хранилище MinIO/S3 по имени.
+    Поиск файлов и папок пользователя по имени в каталоге.
     :param user_id:
     :param query:
-    :param bucket_name:
-    :return:
+    :param page: номер страницы, начиная с 1
+    :param limit: количество результатов на странице
+    :return: словарь со списком ``files`` и признаком ``has_next``
     """
-    full_prefix = get_user_file_path(user_id, "")  # Префикс папки пользователя
-
-    try:
-        response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=full_prefix)
-        results = []
-        seen_folders = set()
-
-        for obj in response.get("Contents", []):
-            # Убираем user-{user_id}-files/
-            full_path = obj["Key"].removeprefix(full_prefix)
-            parts = full_path.split("/")
-
-            # Файл
-            if query.lower() in parts[-1].lower():
-                results.append({
-                    "name": parts[-1],
-                    "folder_path": "/".join(parts[:-1]),  # Родительская папка
-                    "is_folder": False
-                })
-
-            # Папка (проверяем все уровни пути)
-            for i in range(len(parts) - 1):
-                folder_name = parts[i]
-                folder_path = "/".join(parts[:i + 1])
-
-                if query.lower() in folder_name.lower() and folder_path not in seen_folders:
-                    results.append({
-                        "name": folder_name + "/",
-                        "folder_path": "/".join(parts[:i]),  # Родительская папка
-                        "is_folder": True
-                    })
-                    seen_folders.add(folder_path)
-
-        return results
-
-    except ClientError as exc:
-        raise StorageError(f"Ошибка поиска файлов пользователя {user_id}: {exc}")
+    return catalog.search_entries(user_id, query, page, limit)
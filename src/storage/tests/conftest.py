@@ -0,0 +1,52 @@
+import logging
+from urllib.request import urlopen
+
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+
+from src.storage.clients import get_s3_client, reset_clients
+from src.storage.services import ready_buckets
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(username="owner", password="@Test123")
+
+
+@pytest.fixture(scope="session")
+def moto_endpoint():
+    """
+    S3-совместимый сервер moto в отдельном потоке на свободном порту.
+    :return: адрес сервера
+    """
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def s3(moto_endpoint):
+    """
+    Пустой бакет хранилища на сервере moto. Клиенты создаются заново
+    с адресом сервера, кэш списков папок очищается.
+    :param moto_endpoint:
+    :return: клиент S3
+    """
+    urlopen(f"{moto_endpoint}/moto-api/reset", data=b"")
+    ready_buckets.clear()
+    cache.clear()
+    with override_settings(AWS_S3_ENDPOINT_URL=moto_endpoint,
+                           AWS_S3_PUBLIC_ENDPOINT_URL=moto_endpoint):
+        reset_clients()
+        client = get_s3_client()
+        client.create_bucket(Bucket=settings.AWS_STORAGE_BUCKET_NAME)
+        yield client
+    reset_clients()
@@ -0,0 +1,59 @@
+import io
+import zipfile
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+from botocore.response import StreamingBody
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from src.storage import archives, services, trash
+
+
+def test_folder_archive_is_streamed_zip():
+    """
+    Test folder objects are packed into a valid ZIP built without seeking.
+    :return:
+    """
+    contents = {
+        "user-1-files/docs/a.txt": b"hello",
+        "user-1-files/docs/sub/b.bin": b"x" * 300_000,
+    }
+    modified = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    objects = [{"Key": key, "ObjectKey": key, "Size": len(data),
+                "LastModified": modified}
+               for key, data in contents.items()]
+
+    def open_object(key, bucket_name):
+        return StreamingBody(io.BytesIO(contents[key]), len(contents[key]))
+
+    with mock.patch.object(archives, "iter_file_objects", return_value=iter(objects)), \
+            mock.patch.object(archives, "open_object", side_effect=open_object):
+        chunks = list(archives.iter_folder_archive(1, "docs"))
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ["docs/a.txt", "docs/sub/b.bin"]
+        assert archive.read("docs/a.txt") == b"hello"
+        assert archive.read("docs/sub/b.bin") == b"x" * 300_000
+        assert archive.getinfo("docs/a.txt").date_time == (2024, 5, 1, 12, 30, 0)
+
+
+@pytest.mark.django_db
+def test_folder_archive_lists_catalog_files(user, s3):
+    """
+    Test folder markers and trashed files are left out of the archive.
+    :param user:
+    :param s3:
+    :return:
+    """
+    services.create_folder(user.id, "z/")
+    for name in ("secret.txt", "keep.txt"):
+        services.upload_file(SimpleUploadedFile(name, name.encode()), user.id,
+                             f"z/{name}")
+    trash.trash_file(user.id, "z/secret.txt")
+
+    chunks = list(archives.iter_folder_archive(user.id, "z"))
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == ["z/keep.txt"]
+        assert archive.read("z/keep.txt") == b"keep.txt"
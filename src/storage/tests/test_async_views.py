@@ -0,0 +1,123 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, AsyncRequestFactory
+from django.urls import path
+from django.utils.crypto import get_random_string
+
+from src.storage import async_views, catalog, services
+
+# Маршрут загрузки, как при STORAGE_ASYNC_VIEWS: проверка CSRF идёт через middleware
+urlpatterns = [
+    path("storage/files/upload/", async_views.upload_file_view, name="file-upload"),
+]
+
+
+def build_request(user, path="/", method="get", **kwargs):
+    """
+    Запрос к асинхронному view от имени пользователя.
+    :param user:
+    :param path:
+    :param method:
+    :param kwargs: данные и заголовки запроса
+    :return:
+    """
+    request = getattr(AsyncRequestFactory(), method)(path, **kwargs)
+
+    async def auser():
+        return user
+
+    request.user, request.auser = user, auser
+    # Как тестовый клиент Django: CSRF проверяется отдельным тестом
+    request._dont_enforce_csrf_checks = True
+    return request
+
+
+async def read_content(response):
+    """
+    Тело потокового ответа асинхронного view целиком.
+    :param response:
+    :return:
+    """
+    return b"".join([chunk async for chunk in response.streaming_content])
+
+
+@pytest.mark.django_db
+def test_direct_download_redirects_to_presigned_url(user, s3, settings):
+    """
+    Test direct transfer mode redirects without touching the ORM in the loop.
+    :param user:
+    :param s3:
+    :param settings:
+    :return:
+    """
+    settings.STORAGE_DIRECT_TRANSFER = True
+    services.upload_file(SimpleUploadedFile("a.txt", b"hello"), user.id, "a.txt")
+    view = async_to_sync(async_views.download_file_view)
+
+    response = view(build_request(user), "a.txt")
+    assert response.status_code == 302
+    assert f"user-{user.id}-files/a.txt" in response["Location"]
+    assert view(build_request(user), "missing.txt").status_code == 404
+
+
+@pytest.mark.django_db
+def test_async_upload_and_download(user, s3):
+    """
+    Test a file uploaded by the async view is streamed back whole and by range.
+    :param user:
+    :param s3:
+    :return:
+    """
+    upload = async_to_sync(async_views.upload_file_view)
+    download = async_to_sync(async_views.download_file_view)
+    response = upload(build_request(user, method="post", data={
+        "current_path": "docs/", "file": SimpleUploadedFile("a.txt", b"hello world"),
+    }))
+    assert response.status_code == 201
+    assert catalog.get_entry(user.id, "docs/a.txt").size == 11
+
+    response = download(build_request(user), "docs/a.txt")
+    assert response.status_code == 200
+    assert async_to_sync(read_content)(response) == b"hello world"
+
+    request = build_request(user, headers={"Range": "bytes=6-"})
+    response = download(request, "docs/a.txt")
+    assert response.status_code == 206
+    assert response["Content-Range"] == "bytes 6-10/11"
+    assert async_to_sync(read_content)(response) == b"world"
+
+    etag = response["ETag"]
+    request = build_request(user, headers={"If-None-Match": etag})
+    response = download(request, "docs/a.txt")
+    assert response.status_code == 304
+    assert download(build_request(user), "docs/b.txt").status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.urls("src.storage.tests.test_async_views")
+def test_async_upload_passes_csrf_check(user, s3):
+    """
+    Test the async upload view works behind the CSRF middleware.
+    :param user:
+    :param s3:
+    :return:
+    """
+    client = AsyncClient(enforce_csrf_checks=True)
+    async_to_sync(client.aforce_login)(user)
+    token = get_random_string(32)
+    client.cookies[settings.CSRF_COOKIE_NAME] = token
+    response = async_to_sync(client.post)("/storage/files/upload/", {
+        "csrfmiddlewaretoken": token,
+        "current_path": "docs/",
+        "file": SimpleUploadedFile("a.txt", b"hello"),
+    })
+    assert response.status_code == 201
+    assert catalog.get_entry(user.id, "docs/a.txt").size == 5
+
+    response = async_to_sync(client.post)("/storage/files/upload/", {
+        "file": SimpleUploadedFile("b.txt", b"hello"),
+    })
+    assert response.status_code == 403
+    assert catalog.get_entry(user.id, "b.txt") is None
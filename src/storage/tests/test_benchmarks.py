@@ -0,0 +1,22 @@
+from src.storage.benchmarks import compare_results, percentile, summarize
+
+
+def test_summary_and_baseline_comparison():
+    """
+    Test percentiles of samples and regression detection against a baseline.
+    :return:
+    """
+    samples = [0.01 * number for number in range(1, 101)]
+    summary = summarize(samples, size=1024)
+    assert summary["count"] == 100
+    assert summary["p50"] == percentile(samples, 0.5) == 0.5
+    assert summary["p99"] == 0.99
+    assert summary["bytes_per_sec"] == summary["ops_per_sec"] * 1024
+
+    baseline = {"upload_file/1000/1024": {"p50": 0.45, "ops_per_sec": 2.0},
+                "search_files/1000/0": {"p50": 0.1, "ops_per_sec": 10.0}}
+    results = {"upload_file/1000/1024": summary,
+               "list_user_files/1000/0": summary}
+    assert compare_results(results, baseline, tolerance=0.2) == []
+    regressions = compare_results(results, baseline, tolerance=0.05)
+    assert [item["metric"] for item in regressions] == ["p50"]
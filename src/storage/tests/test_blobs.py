@@ -0,0 +1,49 @@
+import pytest
+
+from src.storage import blobs, catalog
+from src.storage.models import Blob
+
+SHA_A = "a" * 64
+SHA_B = "b" * 64
+
+
+@pytest.mark.django_db
+def test_references_follow_catalog_entries(user):
+    """
+    Test blob references are counted on record, overwrite and delete.
+    :param user:
+    :return:
+    """
+    for path in ("one.iso", "dir/two.iso"):
+        blobs.acquire_blob(SHA_A, 10)
+        catalog.record_file(user.id, path, size=10, blob_id=SHA_A)
+    assert Blob.objects.get(sha256=SHA_A).refcount == 2
+
+    # Перезапись файла другим содержимым снимает ссылку на прежний блоб
+    blobs.acquire_blob(SHA_B, 5)
+    catalog.record_file(user.id, "one.iso", size=5, blob_id=SHA_B)
+    assert Blob.objects.get(sha256=SHA_A).refcount == 1
+
+    catalog.move_path(user.id, "dir/", "moved/")
+    assert Blob.objects.get(sha256=SHA_A).refcount == 1
+
+    catalog.remove_path(user.id, "moved/")
+    assert Blob.objects.get(sha256=SHA_A).refcount == 0
+    assert Blob.objects.get(sha256=SHA_B).refcount == 1
+
+
+@pytest.mark.django_db
+def test_reconcile_keeps_blob_entries(user):
+    """
+    Test files stored in blobs survive reconciliation with the bucket.
+    :param user:
+    :return:
+    """
+    blobs.acquire_blob(SHA_A, 10)
+    catalog.record_file(user.id, "media/movie.mkv", size=10, blob_id=SHA_A)
+    catalog.record_file(user.id, "gone.txt", size=1)
+
+    assert catalog.reconcile_user(user.id, []) == {"upserted": 0, "deleted": 1}
+    assert catalog.get_blob_id(user.id, "media/movie.mkv") == SHA_A
+    assert catalog.get_entry(user.id, "media/") is not None
+    assert blobs.is_valid_sha256(SHA_A) and not blobs.is_valid_sha256("xyz")
@@ -0,0 +1,147 @@
+from datetime import datetime, timezone
+
+import pytest
+from django.core.cache import cache
+
+from src.storage import catalog
+from src.storage.models import StoredObject
+
+
+def list_names(user_id, path, limit=100):
+    """
+    Все имена в папке, прочитанные постранично.
+    :param user_id:
+    :param path:
+    :param limit:
+    :return:
+    """
+    names, cursor = [], None
+    while True:
+        page = catalog.list_folder_page(user_id, path, cursor, limit)
+        names.extend(entry["name"] for entry in page["files"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return names
+
+
+@pytest.mark.django_db
+def test_record_file_creates_folders_and_pages(user):
+    """
+    Test parent folders are created and listing is paginated folders first.
+    :param user:
+    :return:
+    """
+    for name in ("b.txt", "a.txt", "c.txt"):
+        catalog.record_file(user.id, f"docs/{name}", size=1, etag='"1"')
+    catalog.record_folder(user.id, "docs/inner/")
+
+    assert list_names(user.id, "") == ["docs/"]
+    assert list_names(user.id, "docs/", limit=2) == [
+        "inner/", "a.txt", "b.txt", "c.txt"
+    ]
+
+
+@pytest.mark.django_db
+def test_record_files_batch(user):
+    """
+    Test a batch of files is recorded with shared folders and indexed.
+    :param user:
+    :return:
+    """
+    catalog.record_files(user.id, [
+        {"file_name": f"album/day{i % 2}/photo{i}.jpg", "size": i}
+        for i in range(6)
+    ])
+
+    assert list_names(user.id, "album/") == ["day0/", "day1/"]
+    assert list_names(user.id, "album/day1/") == [
+        "photo1.jpg", "photo3.jpg", "photo5.jpg"
+    ]
+    found = catalog.search_entries(user.id, "photo3", page=1, limit=10)
+    assert [entry["name"] for entry in found["files"]] == ["photo3.jpg"]
+
+
+@pytest.mark.django_db
+def test_move_and_remove_folder(user):
+    """
+    Test folder subtree is moved and removed as a whole.
+    :param user:
+    :return:
+    """
+    catalog.record_file(user.id, "old/sub/file.txt", size=5)
+    catalog.move_path(user.id, "old/", "new/")
+
+    entry = catalog.get_entry(user.id, "new/sub/file.txt")
+    assert entry is not None and entry.parent == "new/sub/"
+    assert not StoredObject.objects.filter(path__startswith="old/").exists()
+
+    assert catalog.remove_path(user.id, "new/") == 3
+    assert not StoredObject.objects.filter(owner=user).exists()
+
+
+@pytest.mark.django_db
+def test_reconcile_user(user):
+    """
+    Test reconcile restores missing entries and drops stale ones.
+    :param user:
+    :return:
+    """
+    catalog.record_file(user.id, "stale.txt", size=1)
+    modified = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    objects = [
+        ("photos/cat.jpg", {"size": 10, "etag": '"a"', "last_modified": modified}),
+        ("empty/.keep", {"size": 0, "etag": '"b"', "last_modified": modified}),
+    ]
+
+    result = catalog.reconcile_user(user.id, objects)
+
+    assert result == {"upserted": 3, "deleted": 1}
+    assert list_names(user.id, "") == ["empty/", "photos/"]
+    assert catalog.get_entry(user.id, "photos/cat.jpg").size == 10
+    assert catalog.reconcile_user(user.id, objects) == {"upserted": 0, "deleted": 0}
+
+
+@pytest.mark.django_db
+def test_search_ranked_and_paginated(user):
+    """
+    Test search uses the index after rename/delete and ranks exact matches first.
+    :param user:
+    :return:
+    """
+    catalog.record_file(user.id, "reports/annual-report.pdf", size=1)
+    catalog.record_file(user.id, "report", size=1)
+    catalog.record_file(user.id, "drafts/old.txt", size=1)
+    catalog.move_path(user.id, "drafts/", "report-drafts/")
+    catalog.record_file(user.id, "tmp/report.tmp", size=1)
+    catalog.remove_path(user.id, "tmp/")
+
+    first = catalog.search_entries(user.id, "REPORT", page=1, limit=2)
+    second = catalog.search_entries(user.id, "REPORT", page=2, limit=2)
+
+    assert [f["name"] for f in first["files"]] == ["report", "reports/"]
+    assert first["has_next"] is True
+    assert [f["name"] for f in second["files"]] == [
+        "report-drafts/", "annual-report.pdf"
+    ]
+    assert second["has_next"] is False
+    assert catalog.search_entries(user.id, "old", 1, 10)["files"] == [
+        {"name": "old.txt", "folder_path": "report-drafts", "is_folder": False}
+    ]
+
+
+@pytest.mark.django_db
+def test_malformed_cursor_starts_from_first_page(user, client):
+    """
+    Test a cursor of the wrong shape is ignored instead of failing the listing.
+    :param user:
+    :param client:
+    :return:
+    """
+    cache.clear()
+    catalog.record_file(user.id, "a.txt", size=1)
+    client.force_login(user)
+    # base64 от JSON "5", [true] и ["a", "b"]
+    for cursor in ("NQ==", "W3RydWVd", "WyJhIiwgImIiXQ==", "not-base64"):
+        response = client.get("/storage/files/", {"cursor": cursor})
+        assert response.status_code == 200
+        assert [entry["name"] for entry in response.json()["files"]] == ["a.txt"]
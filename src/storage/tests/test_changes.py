@@ -0,0 +1,56 @@
+import pytest
+
+from src.storage import catalog
+from src.storage.changes import get_changes, get_head, prune_changes
+from src.storage.exceptions import ChangeCursorExpiredError
+from src.storage.models import StorageChange
+
+
+@pytest.mark.django_db
+def test_catalog_changes_are_logged_in_order(user):
+    """
+    Test upload, folder creation, move and delete each add one log entry.
+    :param user:
+    :return:
+    """
+    catalog.record_file(user.id, "docs/a.txt", size=5, etag='"e1"')
+    catalog.record_folder(user.id, "empty/")
+    catalog.move_path(user.id, "docs/", "papers/")
+    catalog.remove_path(user.id, "papers/")
+    assert get_head(user.id) == 4
+
+    page = get_changes(user.id, 0, 10)
+    assert page["changes"] == [
+        {"action": "upload", "path": "docs/a.txt", "size": 5, "etag": '"e1"'},
+        {"action": "create_folder", "path": "empty/"},
+        {"action": "move", "path": "docs/", "new_path": "papers/"},
+        {"action": "delete", "path": "papers/"},
+    ]
+    assert page["cursor"] == "4" and not page["has_more"]
+
+    page = get_changes(user.id, 1, 2)
+    assert [change["action"] for change in page["changes"]] == [
+        "create_folder", "move"
+    ]
+    assert page["cursor"] == "3" and page["has_more"]
+    assert get_changes(user.id, 4, 10)["changes"] == []
+
+
+@pytest.mark.django_db
+def test_pruned_cursor_expires(user):
+    """
+    Test a cursor older than the retained log requires a full resync.
+    :param user:
+    :return:
+    """
+    catalog.record_file(user.id, "a.txt", size=1)
+    catalog.record_file(user.id, "b.txt", size=1)
+    StorageChange.objects.filter(owner=user, seq=1).update(
+        created_at="2000-01-01T00:00:00Z"
+    )
+    assert prune_changes(days=1) == 1
+    with pytest.raises(ChangeCursorExpiredError):
+        get_changes(user.id, 0, 10)
+    assert get_changes(user.id, 1, 10)["cursor"] == "2"
+    with pytest.raises(ChangeCursorExpiredError):
+        get_changes(user.id, 5, 10)
@@ -0,0 +1,36 @@
+from django.test import override_settings
+
+from src.storage import clients
+
+
+# Клиент не соединяется с сервером при создании: адрес из окружения не нужен
+@override_settings(AWS_S3_ENDPOINT_URL="http://localhost:9000")
+def test_client_is_created_once_and_reset_after_fork():
+    """
+    Test the S3 client is built lazily, reused and dropped by reset.
+    :return:
+    """
+    clients.reset_clients()
+    client = clients.get_s3_client()
+    assert clients.get_s3_client() is client
+    assert client.meta.config.max_pool_connections == 50
+    assert client.meta.config.retries["mode"] == "standard"
+
+    clients.reset_clients()
+    assert clients.get_s3_client() is not client
+    clients.reset_clients()
+
+
+@override_settings(STORAGE_TRANSFER_CONFIG={
+    "copy": {"multipart_threshold": 10, "multipart_chunksize": 5,
+             "max_concurrency": 2},
+})
+def test_transfer_config_from_settings():
+    """
+    Test transfer parameters are read per operation.
+    :return:
+    """
+    config = clients.get_transfer_config("copy")
+    assert config.multipart_threshold == 10
+    assert config.multipart_chunksize == 5
+    assert config.max_concurrency == 2
@@ -0,0 +1,95 @@
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from src.storage import catalog, services
+from src.storage.changes import get_changes
+
+
+def upload_files(user_id, names):
+    for name in names:
+        services.upload_file(SimpleUploadedFile(name, b"data"), user_id, name)
+
+
+def list_keys(user_id):
+    return sorted(key.removeprefix(f"user-{user_id}-files/") for key in
+                  services.iter_object_keys(f"user-{user_id}-files/"))
+
+
+def test_keys_are_sent_in_batches_of_1000(s3, monkeypatch):
+    """
+    Test a stream of keys is split into DeleteObjects requests of 1000.
+    :param s3:
+    :param monkeypatch:
+    :return:
+    """
+    batches = []
+    delete_object_batch = services.delete_object_batch
+
+    def record_batch(keys, bucket_name):
+        batches.append(len(keys))
+        return delete_object_batch(keys, bucket_name)
+
+    monkeypatch.setattr(services, "delete_object_batch", record_batch)
+    keys = (f"bulk/{number:05d}" for number in range(2001))
+    result = services.delete_objects(keys)
+    assert result == {"deleted": 2001, "errors": []}
+    assert sorted(batches) == [1, 1000, 1000]
+
+
+@pytest.mark.django_db
+@override_settings(STORAGE_DELETE_BATCH_SIZE=2, STORAGE_DELETE_CONCURRENCY=1)
+def test_folder_delete_reports_progress_per_batch(user, s3):
+    """
+    Test a folder delete removes objects and catalog entries batch by batch.
+    :param user:
+    :param s3:
+    :return:
+    """
+    upload_files(user.id, [f"docs/{name}.txt" for name in "abcde"] + ["docs-old.txt"])
+    progress = []
+    result = services.delete_file(user.id, "docs/", on_progress=progress.append)
+    assert result == {"deleted": 5, "errors": []}
+    assert [item["objects"] for item in progress] == [2, 4, 5]
+    assert list_keys(user.id) == ["docs-old.txt"]
+    assert catalog.get_entry(user.id, "docs/") is None
+    assert get_changes(user.id, 0, 100)["changes"][-1] == {
+        "action": "delete", "path": "docs/"
+    }
+
+
+@pytest.mark.django_db
+@override_settings(STORAGE_DELETE_BATCH_SIZE=2)
+def test_failed_keys_stay_in_catalog(user, s3, monkeypatch):
+    """
+    Test keys rejected by DeleteObjects keep their catalog entries and folder.
+    :param user:
+    :param s3:
+    :param monkeypatch:
+    :return:
+    """
+    upload_files(user.id, ["docs/a.txt", "docs/b.txt", "docs/sub/c.txt"])
+    failed_key = f"user-{user.id}-files/docs/b.txt"
+    delete_object_batch = services.delete_object_batch
+
+    def fail_one_key(keys, bucket_name):
+        errors = delete_object_batch([key for key in keys if key != failed_key],
+                                     bucket_name)
+        if failed_key in keys:
+            errors.append({"key": failed_key, "code": "AccessDenied",
+                           "message": "Access Denied"})
+        return errors
+
+    monkeypatch.setattr(services, "delete_object_batch", fail_one_key)
+    result = services.delete_file(user.id, "docs/")
+    assert result["deleted"] == 2
+    assert [error["key"] for error in result["errors"]] == [failed_key]
+
+    assert list_keys(user.id) == ["docs/b.txt"]
+    assert catalog.get_entry(user.id, "docs/a.txt") is None
+    assert catalog.get_entry(user.id, "docs/b.txt") is not None
+    assert catalog.get_entry(user.id, "docs/").total_objects == 1
+    # Клиентам синхронизации - перечитать папку, а не удалить её
+    assert get_changes(user.id, 0, 100)["changes"][-1] == {
+        "action": "rescan", "path": "docs/"
+    }
@@ -0,0 +1,123 @@
+import time
+
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django_redis import get_redis_connection
+
+from src.storage import jobs
+
+
+@pytest.fixture
+def queue():
+    cache.clear()
+    connection = get_redis_connection("default")
+    connection.delete(jobs.QUEUE_KEY, jobs.PROCESSING_KEY)
+    yield connection
+    connection.delete(jobs.QUEUE_KEY, jobs.PROCESSING_KEY)
+
+
+def test_job_is_deduplicated_and_runs_once(queue, monkeypatch):
+    """
+    Test a repeated submit returns the active job and the worker completes it.
+    :param queue:
+    :return:
+    """
+    calls = []
+
+    def handler(job, report):
+        calls.append(job["params"])
+        report({"objects": 1, "total_objects": 1})
+        return {"deleted": 1}
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "purge", handler)
+    job = jobs.submit_job(1, "purge", {"item_id": 7})
+    assert jobs.submit_job(1, "purge", {"item_id": 7})["job_id"] == job["job_id"]
+    assert queue.llen(jobs.QUEUE_KEY) == 1
+
+    assert jobs.run_next_job(timeout=1)["status"] == jobs.DONE
+    state = jobs.get_job(1, job["job_id"])
+    assert state["result"] == {"deleted": 1}
+    assert state["progress"]["objects"] == 1
+    assert calls == [{"item_id": 7}]
+    assert queue.llen(jobs.PROCESSING_KEY) == 0
+    with pytest.raises(jobs.JobNotFoundError):
+        jobs.get_job(2, job["job_id"])
+
+    # Завершённая задача не мешает поставить такую же новую
+    assert jobs.submit_job(1, "purge", {"item_id": 7})["job_id"] != job["job_id"]
+
+
+@override_settings(STORAGE_JOB_LEASE=0)
+def test_abandoned_job_is_resumed(queue, monkeypatch):
+    """
+    Test a job whose worker stopped renewing the lease goes back to the queue.
+    :param queue:
+    :return:
+    """
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "reconcile", lambda job, report: {})
+    job = jobs.submit_job(1, "reconcile", {})
+    claimed = jobs.claim_job(timeout=1)
+    assert claimed["job_id"] == job["job_id"]
+    # Воркер "упал", не завершив задачу
+    assert jobs.recover_jobs() == 1
+
+    finished = jobs.run_next_job(timeout=1)
+    assert finished["job_id"] == job["job_id"]
+    assert finished["status"] == jobs.DONE
+    assert finished["attempts"] == 2
+
+
+@override_settings(STORAGE_JOB_LEASE=2)
+def test_lease_is_renewed_while_handler_runs(queue, monkeypatch):
+    """
+    Test a long step without progress keeps the lease and the job
+    is not handed to a second worker.
+    :param queue:
+    :return:
+    """
+    recovered = []
+
+    def handler(job, report):
+        time.sleep(2.5)
+        recovered.append(jobs.recover_jobs())
+        # Задача снова в очереди, как после возврата по истёкшей аренде,
+        # но она ещё выполняется - второй воркер её не берёт
+        queue.lrem(jobs.PROCESSING_KEY, 1, job["job_id"])
+        queue.rpush(jobs.QUEUE_KEY, job["job_id"])
+        recovered.append(jobs.claim_job(timeout=1))
+        return {}
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "reconcile", handler)
+    job = jobs.submit_job(1, "reconcile", {})
+    finished = jobs.run_next_job(timeout=1)
+    assert finished["job_id"] == job["job_id"]
+    assert finished["status"] == jobs.DONE
+    assert recovered == [0, None]
+    assert finished["attempts"] == 1
+    assert queue.llen(jobs.PROCESSING_KEY) == 0
+
+
+@pytest.mark.django_db
+def test_expired_export_is_gone(user, s3, client):
+    """
+    Test downloading an export whose archive was removed answers 410.
+    :param user:
+    :param s3:
+    :param client:
+    :return:
+    """
+    job = {"job_id": "export-1", "user_id": user.id, "kind": "export",
+           "status": jobs.DONE, "params": {"folder": "docs"},
+           "result": {"key": "exports/export-1.zip", "size": 3}}
+    jobs.save_job(job)
+    client.force_login(user)
+    url = "/storage/jobs/export-1/download/"
+    assert client.get(url).status_code == 410
+
+    s3.put_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+                  Key="exports/export-1.zip", Body=b"zip")
+    response = client.get(url)
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == b"zip"
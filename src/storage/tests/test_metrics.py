@@ -0,0 +1,50 @@
+import pytest
+from botocore.stub import Stubber
+from django.test import override_settings
+
+from src.storage import clients
+from src.storage.metrics import RequestStats, request_stats
+
+
+def test_s3_calls_are_counted_per_request():
+    """
+    Test botocore hooks add S3 calls to the statistics of the current request.
+    :return:
+    """
+    client = clients.create_s3_client("http://localhost:9000")
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    try:
+        with Stubber(client) as stubber:
+            stubber.add_response("head_object", {"ContentLength": 10})
+            stubber.add_response("head_object", {"ContentLength": 10})
+            stubber.add_client_error("delete_object", "AccessDenied")
+            client.head_object(Bucket="bucket", Key="a")
+            client.head_object(Bucket="bucket", Key="b")
+            with pytest.raises(client.exceptions.ClientError):
+                client.delete_object(Bucket="bucket", Key="a")
+    finally:
+        request_stats.reset(token)
+
+    assert stats.s3["HeadObject"][0] == 2
+    assert stats.s3["DeleteObject"][0] == 1
+    assert stats.get_s3_totals()[0] == 3
+
+
+@pytest.mark.django_db
+@override_settings(STORAGE_SERVER_TIMING=True)
+def test_metrics_endpoint_and_server_timing(client):
+    """
+    Test the Server-Timing header and the Prometheus endpoint.
+    :param client:
+    :return:
+    """
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "total;dur=" in response["Server-Timing"]
+    assert 's3;dur=0.0;desc="0 calls, 0 bytes"' in response["Server-Timing"]
+
+    response = client.get("/metrics")
+    body = response.content.decode()
+    assert 'storage_request_duration_seconds_count{method="GET",view="metrics"}' in body
+    assert "storage_request_s3_calls_bucket" in body
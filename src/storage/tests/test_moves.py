@@ -0,0 +1,112 @@
+import pytest
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from src.storage import catalog, moves, services
+from src.storage.exceptions import FileMoveError
+
+MB = 1024 * 1024
+
+
+def upload_files(user_id, contents):
+    for name, data in contents.items():
+        services.upload_file(SimpleUploadedFile(name, data), user_id, name)
+
+
+def list_keys(user_id):
+    return sorted(key.removeprefix(f"user-{user_id}-files/") for key in
+                  services.iter_object_keys(f"user-{user_id}-files/"))
+
+
+def read_file(user_id, file_name):
+    return b"".join(services.download_file(user_id, file_name)["body"])
+
+
+@pytest.mark.django_db
+def test_rename_file(user, s3):
+    """
+    Test a renamed file is copied, verified and removed from the old key.
+    :param user:
+    :param s3:
+    :return:
+    """
+    upload_files(user.id, {"docs/a.txt": b"hello"})
+    assert moves.rename_file(user.id, "docs/a.txt", "b.txt") == "docs/b.txt"
+    assert list_keys(user.id) == ["docs/b.txt"]
+    assert catalog.get_entry(user.id, "docs/a.txt") is None
+    assert read_file(user.id, "docs/b.txt") == b"hello"
+
+
+@pytest.mark.django_db
+def test_move_folder(user, s3):
+    """
+    Test a folder moves with nested files and its marker.
+    :param user:
+    :param s3:
+    :return:
+    """
+    services.create_folder(user.id, "docs/")
+    upload_files(user.id, {"docs/a.txt": b"a", "docs/sub/b.txt": b"bb",
+                           "docs-old.txt": b"old"})
+    progress = []
+    result = moves.move_file(user.id, "docs/", "archive/2024/",
+                             on_progress=progress.append)
+    assert (result["objects"], result["bytes"], result["errors"]) == (3, 3, [])
+    assert progress[-1]["total_objects"] == 2
+    assert list_keys(user.id) == ["archive/2024/.keep", "archive/2024/a.txt",
+                                  "archive/2024/sub/b.txt", "docs-old.txt"]
+    assert catalog.get_entry(user.id, "docs/") is None
+    assert catalog.get_entry(user.id, "archive/2024/").total_objects == 2
+    assert read_file(user.id, "archive/2024/sub/b.txt") == b"bb"
+
+
+@pytest.mark.django_db
+def test_failed_copy_rolls_back(user, s3, monkeypatch):
+    """
+    Test a failure mid-copy removes the copies and keeps the sources.
+    :param user:
+    :param s3:
+    :param monkeypatch:
+    :return:
+    """
+    upload_files(user.id, {f"docs/{name}.txt": name.encode() for name in "abc"})
+    copy_single_object = moves.copy_single_object
+
+    def fail_on_b(source, key, bucket_name):
+        if source["Key"].endswith("/b.txt"):
+            raise ClientError({"Error": {"Code": "InternalError"}}, "CopyObject")
+        copy_single_object(source, key, bucket_name)
+
+    monkeypatch.setattr(moves, "copy_single_object", fail_on_b)
+    with pytest.raises(FileMoveError):
+        moves.move_file(user.id, "docs/", "moved/")
+    assert list_keys(user.id) == ["docs/a.txt", "docs/b.txt", "docs/c.txt"]
+    assert catalog.get_entry(user.id, "moved/") is None
+    assert catalog.get_entry(user.id, "docs/").total_objects == 3
+
+
+@pytest.mark.django_db
+@override_settings(STORAGE_TRANSFER_CONFIG={
+    "upload": {"multipart_threshold": 8 * MB, "multipart_chunksize": 8 * MB,
+               "max_concurrency": 2},
+    "copy": {"multipart_threshold": 8 * MB, "multipart_chunksize": 5 * MB,
+             "max_concurrency": 2},
+})
+def test_large_object_is_copied_in_parts(user, s3):
+    """
+    Test objects over the copy threshold are moved with upload_part_copy.
+    :param user:
+    :param s3:
+    :return:
+    """
+    data = bytes(range(256)) * (11 * MB // 256)
+    upload_files(user.id, {"big.bin": data})
+    moves.rename_file(user.id, "big.bin", "moved.bin")
+    assert list_keys(user.id) == ["moved.bin"]
+    # ETag составного объекта: хэш частей и их количество (5 + 5 + 1 МБ)
+    etag = s3.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+                          Key=f"user-{user.id}-files/moved.bin")["ETag"]
+    assert etag.endswith('-3"')
+    assert read_file(user.id, "moved.bin") == data
@@ -0,0 +1,126 @@
+import json
+
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from src.storage import catalog, notifications, trash
+from src.storage.changes import get_head
+from src.storage.models import TrashItem
+from src.storage.quotas import get_usage
+
+
+@pytest.fixture
+def queue():
+    cache.clear()
+    connection = get_redis_connection("default")
+    keys = (settings.STORAGE_NOTIFY_QUEUE, notifications.get_processing_key("test"))
+    connection.delete(*keys)
+    yield connection
+    connection.delete(*keys)
+
+
+def build_record(event_name, key, event_time, size=0, etag=""):
+    return {
+        "eventName": event_name,
+        "eventTime": event_time,
+        "s3": {"object": {"key": key, "size": size, "eTag": etag}},
+    }
+
+
+@pytest.mark.django_db
+def test_events_are_applied_once(user, queue):
+    """
+    Test created and removed objects reach the catalog and redelivery is a no-op.
+    :param user:
+    :param queue:
+    :return:
+    """
+    catalog.record_file(user.id, "old.txt", size=10)
+    message = json.dumps({"Records": [
+        build_record("s3:ObjectCreated:Put", f"user-{user.id}-files/docs/a+b.txt",
+                     "2030-01-01T00:00:00Z", size=5, etag="e1"),
+        build_record("s3:ObjectCreated:Put", f"user-{user.id}-files/new/.keep",
+                     "2030-01-01T00:00:00Z"),
+        build_record("s3:ObjectRemoved:Delete", f"user-{user.id}-files/old.txt",
+                     "2030-01-01T00:00:01Z"),
+        build_record("s3:ObjectCreated:Put", "blobs/ab/abcdef", "2030-01-01T00:00:00Z"),
+    ]})
+    queue.rpush(settings.STORAGE_NOTIFY_QUEUE, message)
+    result = notifications.consume_batch("test", timeout=1)
+    assert result == {"created": 2, "deleted": 1, "skipped": 1, "messages": 1}
+    assert catalog.get_entry(user.id, "docs/a b.txt").etag == '"e1"'
+    assert catalog.get_entry(user.id, "new/") is not None
+    assert catalog.get_entry(user.id, "old.txt") is None
+    assert get_usage(user.id)["bytes"] == 5
+    assert queue.llen(notifications.get_processing_key("test")) == 0
+
+    head = get_head(user.id)
+    queue.rpush(settings.STORAGE_NOTIFY_QUEUE, message)
+    result = notifications.consume_batch("test", timeout=1)
+    assert result["created"] == 0 and result["deleted"] == 0
+    assert get_head(user.id) == head
+
+
+@pytest.mark.django_db
+def test_stale_event_does_not_override_newer_entry(user):
+    """
+    Test an event older than the catalog entry is skipped.
+    :param user:
+    :return:
+    """
+    catalog.record_file(user.id, "a.txt", size=3, etag='"new"')
+    result = notifications.apply_events([
+        build_record("s3:ObjectRemoved:Delete", f"user-{user.id}-files/a.txt",
+                     "2000-01-01T00:00:00Z"),
+    ])
+    assert result == {"created": 0, "deleted": 0, "skipped": 1}
+    assert catalog.get_entry(user.id, "a.txt") is not None
+
+
+@pytest.mark.django_db
+def test_redelivered_event_does_not_revive_trashed_file(user):
+    """
+    Test a late create event for a trashed object leaves it in trash.
+    :param user:
+    :return:
+    """
+    catalog.record_file(user.id, "a.txt", size=5, etag='"e1"')
+    catalog.record_folder(user.id, "docs/")
+    trash.trash_file(user.id, "a.txt")
+    trash.trash_file(user.id, "docs/")
+    result = notifications.apply_events([
+        build_record("s3:ObjectCreated:Put", f"user-{user.id}-files/a.txt",
+                     "2030-01-01T00:00:00Z", size=5, etag="e1"),
+        build_record("s3:ObjectCreated:Put", f"user-{user.id}-files/docs/.keep",
+                     "2030-01-01T00:00:00Z"),
+    ])
+    assert result == {"created": 0, "deleted": 0, "skipped": 2}
+    assert catalog.get_entry(user.id, "a.txt") is None
+    assert catalog.get_entry(user.id, "docs/") is None
+    assert TrashItem.objects.filter(owner_id=user.id).count() == 2
+
+
+@pytest.mark.django_db
+def test_malformed_record_does_not_block_queue(user, queue):
+    """
+    Test a record with an impossible date is skipped and the rest applied.
+    :param user:
+    :param queue:
+    :return:
+    """
+    queue.rpush(settings.STORAGE_NOTIFY_QUEUE, json.dumps({"Records": [
+        build_record("s3:ObjectCreated:Put", f"user-{user.id}-files/bad.txt",
+                     "2030-13-45T00:00:00Z", size=1),
+        build_record("s3:ObjectCreated:Put", f"user-{user.id}-files/size.txt",
+                     "2030-01-01T00:00:00Z", size="big"),
+        "not a record",
+        build_record("s3:ObjectCreated:Put", f"user-{user.id}-files/a.txt",
+                     "2030-01-01T00:00:00Z", size=5, etag="e1"),
+    ]}))
+    result = notifications.consume_batch("test", timeout=1)
+    assert result == {"created": 1, "deleted": 0, "skipped": 3, "messages": 1}
+    assert catalog.get_entry(user.id, "a.txt").size == 5
+    assert catalog.get_entry(user.id, "bad.txt") is None
+    assert queue.llen(notifications.get_processing_key("test")) == 0
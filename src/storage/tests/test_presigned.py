@@ -0,0 +1,108 @@
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import Request, urlopen
+
+import pytest
+
+from src.storage import catalog, services
+from src.storage.quotas import get_usage
+
+MB = 1024 * 1024
+
+
+def put(url, data):
+    request = Request(url, data=data, method="PUT",
+                      headers={"Content-Type": "application/octet-stream"})
+    with urlopen(request) as response:
+        return response.headers["ETag"]
+
+
+@pytest.mark.django_db
+def test_complete_rejects_upload_over_quota(user, s3, client, settings):
+    """
+    Test the real object size is checked against the quota on completion.
+    :param user:
+    :param s3:
+    :param client:
+    :param settings:
+    :return:
+    """
+    settings.STORAGE_DIRECT_TRANSFER = True
+    settings.STORAGE_DEFAULT_QUOTA = 10
+    client.force_login(user)
+    target = client.post("/storage/files/presign/upload/",
+                         {"file_name": "a.txt", "size": 5},
+                         content_type="application/json").json()
+    # Размер входит в подпись ссылки: MinIO не примет тело другой длины
+    signed_headers = parse_qs(urlsplit(target["url"]).query)["X-Amz-SignedHeaders"]
+    assert "content-length" in signed_headers[0].split(";")
+
+    # moto подпись не проверяет - как клиент, обошедший её
+    put(target["url"], b"x" * 20)
+    response = client.post("/storage/files/presign/complete/",
+                           {"file_name": "a.txt"}, content_type="application/json")
+    assert response.status_code == 413
+    assert list(services.iter_object_keys(f"user-{user.id}-files/")) == []
+    assert catalog.get_entry(user.id, "a.txt") is None
+    assert get_usage(user.id)["bytes"] == 0
+
+
+@pytest.mark.django_db
+def test_direct_upload_is_recorded_on_complete(user, s3, client, settings):
+    """
+    Test a file put by the browser through a signed URL appears in the catalog.
+    :param user:
+    :param s3:
+    :param client:
+    :param settings:
+    :return:
+    """
+    settings.STORAGE_DIRECT_TRANSFER = True
+    client.force_login(user)
+    target = client.post("/storage/files/presign/upload/",
+                         {"file_name": "a.txt", "current_path": "docs/", "size": 5},
+                         content_type="application/json").json()
+    assert target["file_name"] == "docs/a.txt"
+    put(target["url"], b"hello")
+    assert catalog.get_entry(user.id, "docs/a.txt") is None
+
+    response = client.post("/storage/files/presign/complete/",
+                           {"file_name": "docs/a.txt"},
+                           content_type="application/json")
+    assert response.status_code == 201
+    assert catalog.get_entry(user.id, "docs/a.txt").size == 5
+    assert get_usage(user.id)["bytes"] == 5
+    assert b"".join(services.download_file(user.id, "docs/a.txt")["body"]) == b"hello"
+
+
+@pytest.mark.django_db
+def test_direct_multipart_upload(user, s3, client, settings):
+    """
+    Test a large file is put part by part and assembled on completion.
+    :param user:
+    :param s3:
+    :param client:
+    :param settings:
+    :return:
+    """
+    settings.STORAGE_DIRECT_TRANSFER = True
+    settings.STORAGE_MULTIPART_THRESHOLD = 6 * MB
+    settings.STORAGE_MULTIPART_PART_SIZE = 5 * MB
+    data = bytes(range(256)) * (7 * MB // 256)
+    client.force_login(user)
+    target = client.post("/storage/files/presign/upload/",
+                         {"file_name": "big.bin", "size": len(data)},
+                         content_type="application/json").json()
+    assert [part["part_number"] for part in target["parts"]] == [1, 2]
+
+    part_size = target["part_size"]
+    parts = []
+    for part in target["parts"]:
+        start = (part["part_number"] - 1) * part_size
+        etag = put(part["url"], data[start:start + part_size])
+        parts.append({"part_number": part["part_number"], "etag": etag})
+    response = client.post("/storage/files/presign/complete/",
+                           {"file_name": "big.bin", "upload_id": target["upload_id"],
+                            "parts": parts}, content_type="application/json")
+    assert response.status_code == 201
+    assert catalog.get_entry(user.id, "big.bin").size == len(data)
+    assert b"".join(services.download_file(user.id, "big.bin")["body"]) == data
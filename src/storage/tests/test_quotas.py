@@ -0,0 +1,72 @@
+import pytest
+from django.test import override_settings
+
+from src.storage import catalog
+from src.storage.exceptions import QuotaExceededError
+from src.storage.models import StorageUsage
+from src.storage.quotas import check_quota, get_usage
+
+
+def folder_totals(user_id, path):
+    entry = catalog.get_entry(user_id, path)
+    return entry.total_size, entry.total_objects
+
+
+@pytest.mark.django_db
+def test_counters_follow_catalog_changes(user):
+    """
+    Test user and folder counters on upload, overwrite, move and delete.
+    :param user:
+    :return:
+    """
+    catalog.record_files(user.id, [
+        {"file_name": "a/b/one.bin", "size": 100},
+        {"file_name": "a/two.bin", "size": 20},
+    ])
+    catalog.record_file(user.id, "a/b/one.bin", size=150)
+    assert get_usage(user.id)["bytes"] == 170
+    assert get_usage(user.id)["objects"] == 2
+    assert folder_totals(user.id, "a/") == (170, 2)
+    assert folder_totals(user.id, "a/b/") == (150, 1)
+
+    catalog.move_path(user.id, "a/b/", "c/b/")
+    assert folder_totals(user.id, "a/") == (20, 1)
+    assert folder_totals(user.id, "c/") == (150, 1)
+    assert folder_totals(user.id, "c/b/") == (150, 1)
+
+    catalog.remove_path(user.id, "c/")
+    catalog.remove_entries(user.id, ["a/two.bin"])
+    assert get_usage(user.id)["bytes"] == 0
+    assert folder_totals(user.id, "a/") == (0, 0)
+
+
+@pytest.mark.django_db
+def test_recompute_fixes_drift(user):
+    """
+    Test reconciliation restores counters from the catalog.
+    :param user:
+    :return:
+    """
+    catalog.record_file(user.id, "docs/report.pdf", size=40)
+    StorageUsage.objects.filter(owner_id=user.id).update(bytes_used=999)
+    catalog.StoredObject.objects.filter(path="docs/").update(total_size=7)
+
+    result = catalog.recompute_usage(user.id)
+    assert result["before"]["bytes"] == 999
+    assert result["after"] == {"bytes": 40, "objects": 1}
+    assert folder_totals(user.id, "docs/") == (40, 1)
+
+
+@pytest.mark.django_db
+@override_settings(STORAGE_DEFAULT_QUOTA=100)
+def test_quota_counts_replaced_files(user):
+    """
+    Test quota check before upload, with space freed by overwritten files.
+    :param user:
+    :return:
+    """
+    catalog.record_file(user.id, "big.iso", size=80)
+    check_quota(user.id, 20)
+    with pytest.raises(QuotaExceededError):
+        check_quota(user.id, 30, ["new.iso"])
+    check_quota(user.id, 90, ["big.iso"])
@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+
+from django.test import RequestFactory
+from django.utils.http import http_date
+
+from src.storage.ranges import (
+    if_range_matches,
+    iter_multipart_byteranges,
+    multipart_length,
+    parse_range_header,
+)
+from src.storage.views import get_not_modified_response
+
+
+def test_parse_single_and_open_ranges():
+    """
+    Test regular, open-ended and suffix ranges.
+    :return:
+    """
+    assert parse_range_header("bytes=0-99", 1000) == [(0, 99)]
+    assert parse_range_header("bytes=900-", 1000) == [(900, 999)]
+    assert parse_range_header("bytes=-100", 1000) == [(900, 999)]
+    assert parse_range_header("bytes=500-5000", 1000) == [(500, 999)]
+
+
+def test_parse_coalesces_overlapping_ranges():
+    """
+    Test overlapping and adjacent ranges are merged.
+    :return:
+    """
+    assert parse_range_header("bytes=50-99,0-49,200-299", 1000) == [
+        (0, 99), (200, 299)
+    ]
+
+
+def test_parse_invalid_and_unsatisfiable():
+    """
+    Test malformed headers are ignored and out-of-file ranges give 416.
+    :return:
+    """
+    assert parse_range_header("items=0-1", 1000) is None
+    assert parse_range_header("bytes=", 1000) is None
+    assert parse_range_header("bytes=10-5", 1000) is None
+    assert parse_range_header("bytes=abc", 1000) is None
+    assert parse_range_header("bytes=1000-", 1000) == []
+    assert parse_range_header("bytes=-0", 1000) == []
+
+
+def test_if_range():
+    """
+    Test If-Range with strong ETag, weak ETag and HTTP date.
+    :return:
+    """
+    modified = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+    assert if_range_matches(None, '"abc"', modified)
+    assert if_range_matches('"abc"', '"abc"', modified)
+    assert not if_range_matches('"old"', '"abc"', modified)
+    assert not if_range_matches('W/"abc"', '"abc"', modified)
+    assert if_range_matches(http_date(modified.timestamp()), '"abc"', modified)
+
+
+def test_multipart_length_matches_body():
+    """
+    Test the announced Content-Length equals the generated body length.
+    :return:
+    """
+    data = bytes(range(256)) * 4
+    ranges = [(0, 9), (100, 199)]
+
+    def open_range(start, end):
+        return iter([data[start:end + 1]])
+
+    body = b"".join(iter_multipart_byteranges(
+        ranges, "b0undary", "text/plain", len(data), open_range
+    ))
+    assert len(body) == multipart_length(ranges, "b0undary", "text/plain",
+                                         len(data))
+    assert b"Content-Range: bytes 100-199/1024" in body
+    assert body.endswith(b"--b0undary--\r\n")
+
+
+def test_not_modified_response():
+    """
+    Test conditional download answers 304/412 from object metadata only.
+    :return:
+    """
+    modified = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+    stored_file = {"size": 10, "etag": '"abc"', "last_modified": modified}
+    factory = RequestFactory()
+
+    response = get_not_modified_response(
+        factory.get("/", HTTP_IF_NONE_MATCH='"abc"'), stored_file
+    )
+    assert response.status_code == 304
+    assert response["ETag"] == '"abc"'
+    assert response["Last-Modified"] == http_date(modified.timestamp())
+
+    response = get_not_modified_response(
+        factory.get("/", HTTP_IF_MODIFIED_SINCE=http_date(modified.timestamp())),
+        stored_file
+    )
+    assert response.status_code == 304
+    assert get_not_modified_response(
+        factory.get("/", HTTP_IF_NONE_MATCH='"old"'), stored_file
+    ) is None
+    response = get_not_modified_response(
+        factory.get("/", HTTP_IF_MATCH='"old"'), stored_file
+    )
+    assert response.status_code == 412
@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from src.storage import async_services, catalog, services, trash
+from src.storage.moves import move_file
+from src.storage.exceptions import FileNotfoundError, RestoreConflictError
+from src.storage.presigned import generate_download_url
+from src.storage.models import TrashItem
+from src.storage.quotas import get_usage
+
+
+def list_names(user_id, path=""):
+    return [entry["name"] for entry in
+            catalog.list_folder_page(user_id, path, None, 100)["files"]]
+
+
+@pytest.mark.django_db
+def test_trash_and_restore_folder(user):
+    """
+    Test a trashed folder disappears from listings and search and comes back.
+    :param user:
+    :return:
+    """
+    catalog.record_files(user.id, [
+        {"file_name": "docs/a.txt", "size": 10},
+        {"file_name": "docs/sub/b.txt", "size": 5},
+    ])
+    [item] = trash.trash_file(user.id, "docs/")
+    assert item["objects"] == 2 and item["size"] == 15
+    assert list_names(user.id) == []
+    assert catalog.search_entries(user.id, "a.txt", 1, 10)["files"] == []
+    # Корзина занимает место до очистки
+    assert get_usage(user.id)["bytes"] == 15
+
+    restored = trash.restore_file(user.id, item["id"])
+    assert (restored["id"], restored["path"]) == (item["id"], "docs/")
+    assert list_names(user.id) == ["docs/"]
+    assert list_names(user.id, "docs/sub/") == ["b.txt"]
+    assert catalog.get_entry(user.id, "docs/").total_size == 15
+    assert not TrashItem.objects.exists()
+
+
+@pytest.mark.django_db
+def test_overwrite_drops_trashed_file(user):
+    """
+    Test re-uploading a trashed path drops it from trash and blocks restore.
+    :param user:
+    :return:
+    """
+    catalog.record_file(user.id, "a.txt", size=10)
+    [item] = trash.trash_file(user.id, "a.txt")
+    catalog.record_file(user.id, "a.txt", size=3)
+    assert get_usage(user.id)["bytes"] == 3
+    with pytest.raises(RestoreConflictError):
+        trash.restore_file(user.id, item["id"])
+
+
+@pytest.mark.django_db
+def test_purge_deletes_expired_objects_in_batches(user, monkeypatch):
+    """
+    Test purge removes objects of expired items only and frees the space.
+    :param user:
+    :param monkeypatch:
+    :return:
+    """
+    deleted = []
+
+    def delete_objects(keys, bucket_name, on_batch_deleted):
+        batch = list(keys)
+        deleted.extend(batch)
+        on_batch_deleted(batch)
+        return {"deleted": len(batch), "errors": []}
+
+    monkeypatch.setattr(trash, "delete_objects", delete_objects)
+    catalog.record_files(user.id, [{"file_name": "old/a.txt", "size": 10},
+                                   {"file_name": "new.txt", "size": 1}])
+    trash.trash_file(user.id, "old/")
+    trash.trash_file(user.id, "new.txt")
+    TrashItem.objects.filter(path="old/").update(
+        deleted_at=datetime.now(timezone.utc) - timedelta(days=60)
+    )
+    result = trash.purge_trash("bucket", days=30)
+    assert result == {"items": 1, "deleted": 1, "errors": []}
+    assert deleted == [f"user-{user.id}-files/old/a.txt"]
+    assert list(TrashItem.objects.values_list("path", flat=True)) == ["new.txt"]
+    assert get_usage(user.id)["bytes"] == 1
+
+
+@pytest.mark.django_db
+def test_trashed_file_cannot_be_downloaded(user, s3, client):
+    """
+    Test a trashed file is hidden from every download path until restored.
+    :param user:
+    :param s3:
+    :param client:
+    :return:
+    """
+    services.upload_file(SimpleUploadedFile("a.txt", b"hello"), user.id, "a.txt")
+    [item] = trash.trash_file(user.id, "a.txt")
+    client.force_login(user)
+    response = client.get("/storage/files/download/a.txt/")
+    assert response.status_code == 404
+    with pytest.raises(FileNotfoundError):
+        generate_download_url(user.id, "a.txt")
+    with pytest.raises(FileNotfoundError):
+        async_to_sync(async_services.download_file)(user.id, "a.txt")
+    with pytest.raises(FileNotfoundError):
+        services.download_file(user.id, catalog.get_trash_prefix(item["id"]) + "a.txt")
+
+    trash.restore_file(user.id, item["id"])
+    response = client.get("/storage/files/download/a.txt/")
+    assert b"".join(response.streaming_content) == b"hello"
+
+
+@pytest.mark.django_db
+def test_folder_move_leaves_trashed_children(user, s3):
+    """
+    Test moving a folder skips objects of its trashed files.
+    :param user:
+    :param s3:
+    :return:
+    """
+    services.create_folder(user.id, "docs/")
+    for name in ("a.txt", "b.txt"):
+        services.upload_file(SimpleUploadedFile(name, name.encode()), user.id,
+                             f"docs/{name}")
+    [item] = trash.trash_file(user.id, "docs/a.txt")
+    result = move_file(user.id, "docs/", "renamed/")
+    assert (result["objects"], result["errors"]) == (2, [])
+    assert sorted(services.iter_object_keys(f"user-{user.id}-files/")) == [
+        f"user-{user.id}-files/docs/a.txt",
+        f"user-{user.id}-files/renamed/.keep",
+        f"user-{user.id}-files/renamed/b.txt",
+    ]
+
+    trash.restore_file(user.id, item["id"])
+    body = services.download_file(user.id, "docs/a.txt")["body"]
+    assert b"".join(body) == b"a.txt"
+
+
+def test_purge_window():
+    """
+    Test purge window bounds, including windows past midnight.
+    :return:
+    """
+    night = datetime(2025, 1, 1, 2, 0, tzinfo=timezone.utc)
+    noon = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+    assert trash.get_window_end("01:00-05:00", night).hour == 5
+    assert trash.get_window_end("01:00-05:00", noon) is None
+    end = trash.get_window_end("23:00-05:00", night)
+    assert (end.day, end.hour) == (1, 5)
+    assert trash.get_window_end("23:00-05:00", noon) is None
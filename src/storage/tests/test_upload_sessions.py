@@ -0,0 +1,73 @@
+import pytest
+
+from src.storage import catalog, services
+
+MB = 1024 * 1024
+
+
+@pytest.mark.django_db
+def test_upload_session_resumes_and_completes(user, s3, client, settings):
+    """
+    Test a file uploaded part by part in any order is assembled on completion.
+    :param user:
+    :param s3:
+    :param client:
+    :param settings:
+    :return:
+    """
+    settings.STORAGE_MULTIPART_PART_SIZE = 5 * MB
+    data = bytes(range(256)) * (6 * MB // 256)
+    client.force_login(user)
+    response = client.post("/storage/files/uploads/",
+                           {"file_name": "big.bin", "current_path": "docs/",
+                            "size": len(data)}, content_type="application/json")
+    assert response.status_code == 201
+    session = response.json()
+    assert (session["file_name"], session["parts_count"]) == ("docs/big.bin", 2)
+    session_url = f"/storage/files/uploads/{session['session_id']}/"
+
+    def put_part(part_number, body):
+        return client.put(f"{session_url}parts/{part_number}/", body,
+                          content_type="application/octet-stream")
+
+    assert put_part(2, data[5 * MB:]).status_code == 200
+    assert put_part(1, data[:MB]).status_code == 400
+    # Обрыв связи: клиент узнаёт у сервера, какие части уже получены
+    state = client.get(session_url).json()
+    assert state["parts"] == [{"part_number": 2, "size": MB}]
+    assert client.post(f"{session_url}complete/").status_code == 400
+
+    assert put_part(1, data[:5 * MB]).status_code == 200
+    response = client.post(f"{session_url}complete/")
+    assert response.status_code == 201
+    assert response.json()["file_url"] == "docs/big.bin"
+    assert catalog.get_entry(user.id, "docs/big.bin").size == len(data)
+    assert b"".join(services.download_file(user.id, "docs/big.bin")["body"]) == data
+    assert client.get(session_url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_cancelled_session_leaves_no_parts(user, s3, client, settings):
+    """
+    Test DELETE aborts the multipart upload and forgets the session.
+    :param user:
+    :param s3:
+    :param client:
+    :param settings:
+    :return:
+    """
+    settings.STORAGE_MULTIPART_PART_SIZE = 5 * MB
+    client.force_login(user)
+    session = client.post("/storage/files/uploads/",
+                          {"file_name": "a.bin", "size": 10},
+                          content_type="application/json").json()
+    session_url = f"/storage/files/uploads/{session['session_id']}/"
+    client.put(f"{session_url}parts/1/", b"x" * 10,
+               content_type="application/octet-stream")
+
+    assert client.delete(session_url).status_code == 200
+    assert client.get(session_url).status_code == 404
+    assert s3.list_multipart_uploads(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME
+    ).get("Uploads", []) == []
+    assert catalog.get_entry(user.id, "a.bin") is None
@@ -0,0 +1,78 @@
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from src.storage import catalog, services
+
+MB = 1024 * 1024
+
+
+@pytest.mark.django_db
+def test_upload_rejects_unsafe_current_path(user, s3, client):
+    """
+    Test a current path leaving the user's folder is refused before upload.
+    :param user:
+    :param s3:
+    :param client:
+    :return:
+    """
+    client.force_login(user)
+    for current_path in ("../user-2-files/", "/abs/"):
+        response = client.post("/storage/files/upload/", {
+            "current_path": current_path,
+            "file": SimpleUploadedFile("a.txt", b"hello"),
+        })
+        assert response.status_code == 400
+    assert list(services.iter_object_keys("")) == []
+
+
+@pytest.mark.django_db
+def test_upload_is_streamed_to_storage_in_parts(user, s3, client, settings):
+    """
+    Test a file posted with current_path in the query is sent to storage part by part.
+    :param user:
+    :param s3:
+    :param client:
+    :param settings:
+    :return:
+    """
+    settings.STORAGE_MULTIPART_PART_SIZE = 5 * MB
+    data = bytes(range(256)) * (11 * MB // 256)
+    client.force_login(user)
+    response = client.post("/storage/files/upload/?current_path=docs/", {
+        "file": SimpleUploadedFile("big.bin", data),
+    })
+    assert response.status_code == 201
+    assert response.json()["file_url"] == "docs/big.bin"
+    # Составной объект из частей обработчика: 5 + 5 + 1 МБ
+    head = s3.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+                          Key=f"user-{user.id}-files/docs/big.bin")
+    assert head["ETag"].endswith('-3"')
+    assert head["ContentLength"] == len(data)
+    assert catalog.get_entry(user.id, "docs/big.bin").size == len(data)
+    assert b"".join(services.download_file(user.id, "docs/big.bin")["body"]) == data
+    assert s3.list_multipart_uploads(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME
+    ).get("Uploads", []) == []
+
+
+@pytest.mark.django_db
+def test_streamed_upload_over_quota_is_rejected(user, s3, client, settings):
+    """
+    Test a streamed upload over the quota never reaches storage.
+    :param user:
+    :param s3:
+    :param client:
+    :param settings:
+    :return:
+    """
+    settings.STORAGE_MULTIPART_PART_SIZE = 5 * MB
+    settings.STORAGE_DEFAULT_QUOTA = MB
+    client.force_login(user)
+    response = client.post("/storage/files/upload/?current_path=", {
+        "file": SimpleUploadedFile("big.bin", b"x" * 6 * MB),
+    })
+    assert response.status_code == 413
+    assert list(services.iter_object_keys("")) == []
+    assert s3.list_multipart_uploads(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME
+    ).get("Uploads", []) == []
@@ -0,0 +1,174 @@
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from src.storage import catalog
+from src.storage.exceptions import TrashItemNotFoundError
+from src.storage.listing_cache import (
+    get_parent_paths,
+    invalidate_listing,
+    invalidate_user_listings,
+)
+from src.storage.models import TrashItem
+from src.storage.services import delete_objects, get_user_file_path
+
+
+def serialize_trash_item(item: TrashItem) -> dict:
+    return {
+        "id": item.id,
+        "path": item.path,
+        "is_folder": item.path.endswith("/"),
+        "objects": item.objects_count,
+        "size": item.size,
+        "deleted_at": item.deleted_at.isoformat(),
+        "expires_at": (item.deleted_at
+                       + timedelta(days=settings.STORAGE_TRASH_TTL_DAYS)).isoformat(),
+    }
+
+
+def trash_file(user_id: int, file_name: str) -> list[dict]:
+    """
+    Удаление файла или папки в корзину. Объём работы не зависит
+    от размера папки: меняются только записи каталога, объекты MinIO
+    удаляет ``purge_trash`` после STORAGE_TRASH_TTL_DAYS дней.
+    :param user_id:
+    :param file_name: путь с "/" в конце - папка; без него - файл
+    и одноимённая папка
+    :return: записи корзины (пусто, если удалять нечего)
+    """
+    items = catalog.trash_path(user_id, file_name)
+    invalidate_listing(user_id, get_parent_paths(file_name))
+    if any(item.path.endswith("/") for item in items):
+        # Списки вложенных папок тоже устарели
+        invalidate_user_listings(user_id)
+    return [serialize_trash_item(item) for item in items]
+
+
+def restore_file(user_id: int, item_id: int) -> dict:
+    """
+    Восстановление файла или папки из корзины по исходному пути.
+    :param user_id:
+    :param item_id:
+    :return: восстановленная запись корзины
+    """
+    item = catalog.restore_trash_item(user_id, item_id)
+    invalidate_listing(user_id, get_parent_paths(item.path))
+    if item.path.endswith("/"):
+        invalidate_user_listings(user_id)
+    return serialize_trash_item(item)
+
+
+def list_trash(user_id: int, before: int | None = None,
+               limit: int = settings.STORAGE_LIST_PAGE_SIZE) -> dict:
+    """
+    Страница корзины пользователя, сначала недавно удалённое.
+    :param user_id:
+    :param before: id последней записи предыдущей страницы
+    :param limit:
+    :return: записи ``items`` и ``next_before`` для следующей страницы
+    """
+    items = TrashItem.objects.filter(owner_id=user_id).order_by("-id")
+    if before is not None:
+        items = items.filter(id__lt=before)
+    rows = list(items[:limit + 1])
+    return {
+        "items": [serialize_trash_item(item) for item in rows[:limit]],
+        "next_before": rows[limit - 1].id if len(rows) > limit else None,
+    }
+
+
+def get_trash_item(user_id: int, item_id: int) -> TrashItem:
+    item = TrashItem.objects.filter(owner_id=user_id, id=item_id).first()
+    if item is None:
+        raise TrashItemNotFoundError(item_id)
+    return item
+
+
+def purge_trash_item(
+        item: TrashItem,
+        bucket_name=settings.AWS_STORAGE_BUCKET_NAME,
+        on_progress=None
+) -> dict:
+    """
+    Окончательное удаление записи корзины: объекты удаляются из MinIO
+    пакетными DeleteObjects, записи каталога - вслед за каждым пакетом.
+    Если часть объектов удалить не удалось, запись корзины остаётся
+    и очищается при следующем запуске.
+    :param item:
+    :param bucket_name:
+    :param on_progress: вызывается после каждого удалённого пакета
+    с количеством удалённых объектов ``objects``
+    :return: количество удалённых объектов ``deleted`` и ошибки ``errors``
+    """
+    user_id = item.owner_id
+    prefix = catalog.get_trash_prefix(item.id)
+    user_prefix = get_user_file_path(user_id, "")
+    keys = (user_prefix + path.removeprefix(prefix)
+            for path in catalog.iter_trash_files(user_id, item.id))
+    progress = {"objects": 0}
+
+    def on_batch_deleted(deleted_keys: list[str]) -> None:
+        catalog.remove_entries(user_id, [
+            prefix + key.removeprefix(user_prefix) for key in deleted_keys
+        ])
+        progress["objects"] += len(deleted_keys)
+        if on_progress is not None:
+            on_progress(dict(progress))
+
+    result = delete_objects(keys, bucket_name, on_batch_deleted)
+    if not result["errors"]:
+        # Папки, файлы из блобов и перезаписанные файлы - только в каталоге
+        catalog.remove_path(user_id, prefix, roots=[])
+        item.delete()
+    return result
+
+
+def get_window_end(window: str, now: datetime) -> datetime | None:
+    """
+    Конец текущего окна очистки корзины.
+    :param window: окно в местном времени "ЧЧ:ММ-ЧЧ:ММ", может
+    переходить через полночь ("23:00-05:00")
+    :param now:
+    :return: конец окна или None, если ``now`` вне окна
+    """
+    start, end = (dt_time.fromisoformat(part.strip()) for part in window.split("-"))
+    now = timezone.localtime(now)
+    current = now.time()
+    if start <= end:
+        inside = start <= current < end
+    else:
+        inside = current >= start or current < end
+    if not inside:
+        return None
+    end_at = now.replace(hour=end.hour, minute=end.minute, second=0, microsecond=0)
+    return end_at if end_at > now else end_at + timedelta(days=1)
+
+
+def purge_trash(
+        bucket_name=settings.AWS_STORAGE_BUCKET_NAME,
+        deadline: datetime | None = None,
+        days: int = settings.STORAGE_TRASH_TTL_DAYS
+) -> dict:
+    """
+    Очистка корзин всех пользователей от записей старше ``days`` дней,
+    начиная с самых старых. Новая запись не начинается после ``deadline``.
+    :param bucket_name:
+    :param deadline: время, до которого идёт очистка (None - без ограничения)
+    :param days:
+    :return: количество очищенных записей ``items``, удалённых объектов
+    ``deleted`` и ошибки ``errors``
+    """
+    threshold = timezone.now() - timedelta(days=days)
+    expired = (TrashItem.objects.filter(deleted_at__lt=threshold)
+               .order_by("deleted_at", "id"))
+    total = {"items": 0, "deleted": 0, "errors": []}
+    for item in expired.iterator():
+        if deadline is not None and timezone.now() >= deadline:
+            break
+        result = purge_trash_item(item, bucket_name)
+        total["deleted"] += result["deleted"]
+        total["errors"].extend(result["errors"])
+        if not result["errors"]:
+            total["items"] += 1
+    return total
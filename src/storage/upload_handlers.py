@@ -0,0 +1,228 @@
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+
+from src.storage.clients import get_s3_client
+from src.storage.exceptions import QuotaExceededError
+from src.storage.quotas import check_quota
+from src.storage.services import (
+    get_user_file_path,
+    is_safe_file_name,
+    retry_on_missing_bucket,
+)
+
+
+class S3StreamedFile(UploadedFile):
+    """
+    Файл, переданный в MinIO по частям прямо во время приёма запроса.
+    Содержимое в памяти не хранится (кроме небольших файлов, которые
+    целиком поместились в одну часть). Объект становится видимым
+    в хранилище только после ``commit()``: если запрос не дошёл до view
+    (например, не прошла проверка CSRF), загрузка отменяется при закрытии.
+    """
+
+    def __init__(self, handler, size):
+        super().__init__(
+            file=None,
+            name=handler.file_name,
+            content_type=handler.content_type,
+            size=size,
+            charset=handler.charset,
+            content_type_extra=handler.content_type_extra,
+        )
+        self.file_name = handler.full_file_name
+        self.key = handler.key
+        self.bucket_name = handler.bucket_name
+        self.upload_id = handler.upload_id
+        self.parts = handler.parts
+        self.buffer = handler.buffer
+        self.error = handler.error
+        self.committed = False
+
+    def commit(self) -> str:
+        """
+        Завершение загрузки: сборка составного объекта
+        или запись небольшого файла одним запросом.
+        :return: ETag записанного объекта
+        """
+        if self.error is not None:
+            raise self.error
+        if self.upload_id is None:
+            response = retry_on_missing_bucket(
+                lambda: get_s3_client().put_object(
+                    Bucket=self.bucket_name, Key=self.key,
+                    Body=bytes(self.buffer),
+                    ContentType=self.content_type or "application/octet-stream",
+                ),
+                self.bucket_name,
+            )
+        else:
+            response = get_s3_client().complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )
+        self.buffer = bytearray()
+        self.committed = True
+        return response["ETag"]
+
+    def abort(self) -> None:
+        """
+        Отмена незавершённой составной загрузки.
+        :return:
+        """
+        if self.upload_id is not None and not self.committed:
+            try:
+                get_s3_client().abort_multipart_upload(
+                    Bucket=self.bucket_name, Key=self.key,
+                    UploadId=self.upload_id
+                )
+            except ClientError:
+                pass
+            self.upload_id = None
+
+    def open(self, mode=None):
+        raise ValueError("Файл уже передан в хранилище и не читается повторно.")
+
+    def close(self):
+        self.abort()
+
+
+class S3MultipartUploadHandler(FileUploadHandler):
+    """
+    Обработчик загрузки, который отправляет файл в MinIO частями
+    по мере поступления тела запроса, без временных файлов на диске.
+    В памяти держится не больше одной части (STORAGE_MULTIPART_PART_SIZE).
+    Работает только для view загрузки файла и только если клиент передал
+    current_path в строке запроса: путь файла нужен до начала его приёма.
+    При включённой дедупликации (STORAGE_DEDUP) не используется.
+    Остальные загрузки обрабатываются стандартными обработчиками Django.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.enabled = False
+        self.active = False
+        self.bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+        self.part_size = settings.STORAGE_MULTIPART_PART_SIZE
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        request = self.request
+        self.enabled = (
+            request is not None
+            and request.resolver_match is not None
+            and request.resolver_match.url_name == "file-upload"
+            and "current_path" in request.GET
+            and request.user.is_authenticated
+            # С дедупликацией файл сначала хэшируется целиком
+            and not settings.STORAGE_DEDUP
+        )
+        if self.enabled:
+            # Сверх квоты файл в хранилище не передаётся: view отклонит
+            # загрузку, не дожидаясь записи в MinIO
+            try:
+                check_quota(request.user.id, content_length)
+            except QuotaExceededError:
+                self.enabled = False
+
+    def new_file(self, field_name, file_name, content_type, content_length,
+                 charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length,
+                         charset, content_type_extra)
+        self.active = self.enabled and field_name == "file"
+        if not self.active:
+            return
+        self.full_file_name = f"{self.request.GET['current_path']}{file_name}"
+        if not is_safe_file_name(self.full_file_name):
+            self.active = False
+            return
+
+        self.key = get_user_file_path(self.request.user.id, self.full_file_name)
+        self.upload_id = None
+        self.parts = []
+        self.buffer = bytearray()
+        self.error = None
+        # Файл целиком обрабатывается здесь, стандартные обработчики не нужны
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        if self.error is not None:
+            # Загрузка уже не удалась: дочитываем тело запроса без записи
+            return None
+        self.buffer += raw_data
+        if len(self.buffer) >= self.part_size:
+            self.upload_buffered_part()
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.active = False
+        # Остаток буфера - последняя часть составной загрузки.
+        # Небольшой файл остаётся в буфере и записывается одним put_object.
+        if self.upload_id is not None and self.buffer and self.error is None:
+            self.upload_buffered_part()
+        return S3StreamedFile(self, file_size)
+
+    def upload_interrupted(self):
+        if self.active:
+            self.active = False
+            self.abort()
+
+    def abort(self) -> None:
+        """
+        Отмена начатой составной загрузки.
+        :return:
+        """
+        if self.upload_id is None:
+            return
+        try:
+            get_s3_client().abort_multipart_upload(
+                Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id
+            )
+        except ClientError:
+            pass
+        self.upload_id = None
+
+    def upload_buffered_part(self) -> None:
+        """
+        Отправка накопленного буфера в MinIO очередной частью.
+        Составная загрузка начинается только когда набралась первая часть.
+        Ошибка MinIO запоминается и отдаётся view при ``commit()``.
+        :return:
+        """
+        try:
+            self.send_part()
+        except ClientError as exc:
+            self.error = exc
+            self.abort()
+        self.buffer = bytearray()
+
+    def send_part(self) -> None:
+        """
+        Запрос upload_part для накопленного буфера.
+        :return:
+        """
+        if self.upload_id is None:
+            response = retry_on_missing_bucket(
+                lambda: get_s3_client().create_multipart_upload(
+                    Bucket=self.bucket_name, Key=self.key,
+                    ContentType=self.content_type or "application/octet-stream",
+                ),
+                self.bucket_name,
+            )
+            self.upload_id = response["UploadId"]
+        part_number = len(self.parts) + 1
+        response = get_s3_client().upload_part(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=bytes(self.buffer),
+        )
+        self.parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
@@ -0,0 +1,132 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+from src.storage import catalog
+from src.storage.exceptions import UploadPartError, UploadSessionNotFoundError
+from src.storage.listing_cache import get_parent_paths, invalidate_listing
+from src.storage.services import (
+    abort_multipart_upload,
+    complete_multipart_upload,
+    create_multipart_upload,
+    get_parts_count,
+    list_uploaded_parts,
+    upload_part,
+)
+
+
+def get_session_cache_key(session_id: str) -> str:
+    return f"storage:upload-session:{session_id}"
+
+
+def initiate_upload_session(user_id: int, file_name: str, size: int) -> dict:
+    """
+    Начало возобновляемой загрузки: составная загрузка в MinIO
+    и сессия в Redis, по которой клиент догружает части.
+    :param user_id:
+    :param file_name:
+    :param size: полный размер файла в байтах
+    :return: данные сессии
+    """
+    part_size = settings.STORAGE_MULTIPART_PART_SIZE
+    session = {
+        "session_id": secrets.token_urlsafe(16),
+        "user_id": user_id,
+        "file_name": file_name,
+        "size": size,
+        "part_size": part_size,
+        "parts_count": get_parts_count(size, part_size),
+        "upload_id": create_multipart_upload(user_id, file_name),
+    }
+    cache.set(get_session_cache_key(session["session_id"]), session,
+              timeout=settings.STORAGE_UPLOAD_SESSION_TTL)
+    return session
+
+
+def get_upload_session(user_id: int, session_id: str) -> dict:
+    """
+    Сессия загрузки текущего пользователя.
+    :param user_id:
+    :param session_id:
+    :return:
+    """
+    session = cache.get(get_session_cache_key(session_id))
+    if session is None or session["user_id"] != user_id:
+        raise UploadSessionNotFoundError(session_id)
+    return session
+
+
+def get_part_size(session: dict, part_number: int) -> int:
+    """
+    Ожидаемый размер части: все части, кроме последней, одного размера.
+    :param session:
+    :param part_number:
+    :return:
+    """
+    if part_number < session["parts_count"]:
+        return session["part_size"]
+    return session["size"] - session["part_size"] * (session["parts_count"] - 1)
+
+
+def upload_session_part(session: dict, part_number: int, data: bytes) -> str:
+    """
+    Загрузка одной части файла в рамках сессии.
+    Повторная загрузка той же части просто заменяет её в MinIO.
+    :param session:
+    :param part_number: номер части, начиная с 1
+    :param data: содержимое части
+    :return: ETag части
+    """
+    if not 1 <= part_number <= session["parts_count"]:
+        raise UploadPartError(part_number, "номер части вне диапазона")
+    expected_size = get_part_size(session, part_number)
+    if len(data) != expected_size:
+        raise UploadPartError(
+            part_number,
+            f"ожидалось {expected_size} байт, получено {len(data)}"
+        )
+    return upload_part(session["user_id"], session["file_name"],
+                       session["upload_id"], part_number, data)
+
+
+def list_session_parts(session: dict) -> list[dict]:
+    """
+    Части, которые хранилище уже получило: клиент догружает только остальные.
+    :param session:
+    :return:
+    """
+    return list_uploaded_parts(session["user_id"], session["file_name"],
+                               session["upload_id"])
+
+
+def complete_upload_session(session: dict) -> str:
+    """
+    Завершение сессии: сборка файла из всех частей.
+    ETag частей берутся из хранилища, клиенту их хранить не нужно.
+    :param session:
+    :return: путь загруженного файла
+    """
+    parts = list_session_parts(session)
+    received = {part["part_number"] for part in parts}
+    missing = set(range(1, session["parts_count"] + 1)) - received
+    if missing:
+        raise UploadPartError(min(missing), "часть ещё не загружена")
+    etag = complete_multipart_upload(session["user_id"], session["file_name"],
+                                     session["upload_id"], parts)
+    catalog.record_file(session["user_id"], session["file_name"],
+                        size=session["size"], etag=etag)
+    cache.delete(get_session_cache_key(session["session_id"]))
+    invalidate_listing(session["user_id"], get_parent_paths(session["file_name"]))
+    return session["file_name"]
+
+
+def abort_upload_session(session: dict) -> None:
+    """
+    Отмена сессии и удаление загруженных частей из MinIO.
+    :param session:
+    :return:
+    """
+    abort_multipart_upload(session["user_id"], session["file_name"],
+                           session["upload_id"])
+    cache.delete(get_session_cache_key(session["session_id"]))
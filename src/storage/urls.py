@@ -1,20 +1,75 @@
+from django.conf import settings
 from django.urls import path
 
 from src.storage.views import (
     upload_file_view,
+    upload_files_view,
+    upload_instant_view,
     download_file_view,
+    download_folder_view,
+    export_folder_view,
+    job_status_view,
+    job_download_view,
+    changes_view,
+    notifications_view,
+    trash_list_view,
+    trash_restore_view,
+    trash_purge_view,
     delete_file_view,
     # list_files_view,
     rename_file_view,
+    move_file_view,
     create_folder_view, list_files_view,
+    presign_upload_view,
+    presign_complete_view,
+    presign_abort_view,
+    upload_session_create_view,
+    upload_session_view,
+    upload_session_part_view,
+    upload_session_complete_view,
 )
 
+if settings.STORAGE_ASYNC_VIEWS:
+    # Под ASGI загрузка и скачивание обслуживаются асинхронными views
+    from src.storage.async_views import download_file_view, upload_file_view
+
 urlpatterns = [
     path('files/upload/', upload_file_view, name="file-upload"),
+    path('files/upload-batch/', upload_files_view, name="file-upload-batch"),
+    path('files/upload-instant/', upload_instant_view,
+         name="file-upload-instant"),
     path('files/download/<path:file_name>/', download_file_view,
          name="file-download"),
+    path('files/download-folder/<path:folder>/', download_folder_view,
+         name="folder-download"),
+    path('files/export-folder/<path:folder>/', export_folder_view,
+         name="folder-export"),
+    path('jobs/<str:job_id>/', job_status_view, name="job-status"),
+    path('jobs/<str:job_id>/download/', job_download_view, name="job-download"),
     path('files/delete/<path:file_name>/', delete_file_view, name="file-delete"),
     path('files/rename/', rename_file_view, name="file-rename"),
-    path('files/<path:path>/', list_files_view, name="file-list"),
+    path('files/move/', move_file_view, name="file-move"),
+    path('files/presign/upload/', presign_upload_view,
+         name="file-presign-upload"),
+    path('files/presign/complete/', presign_complete_view,
+         name="file-presign-complete"),
+    path('files/presign/abort/', presign_abort_view,
+         name="file-presign-abort"),
+    path('files/uploads/', upload_session_create_view,
+         name="upload-session-create"),
+    path('files/uploads/<str:session_id>/', upload_session_view,
+         name="upload-session"),
+    path('files/uploads/<str:session_id>/parts/<int:part_number>/',
+         upload_session_part_view, name="upload-session-part"),
+    path('files/uploads/<str:session_id>/complete/',
+         upload_session_complete_view, name="upload-session-complete"),
+    path('changes/', changes_view, name="changes"),
+    path('notifications/', notifications_view, name="notifications"),
+    path('trash/', trash_list_view, name="trash"),
+    path('trash/<int:item_id>/', trash_purge_view, name="trash-purge"),
+    path('trash/<int:item_id>/restore/', trash_restore_view, name="trash-restore"),
+    # Создание папки раньше списка файлов: иначе files/create/ попадёт в него
     path('files/create/', create_folder_view, name="create-folder"),
+    path('files/', list_files_view, name="file-list-root"),
+    path('files/<path:path>/', list_files_view, name="file-list"),
 ]
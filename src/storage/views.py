@@ -1,22 +1,82 @@
+from django.conf import settings
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect, render
-from django.http import JsonResponse, FileResponse
+from django.urls import reverse
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.http import content_disposition_header, http_date, quote_etag
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_http_methods, \
     require_GET
 import json
+import mimetypes
+import os
+import secrets
+
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from src.storage.services import (
     upload_file,
+    upload_files,
+    upload_existing_blob,
     download_file,
-    delete_file,
-    list_user_files,
+    list_user_files_page,
     generate_breadcrumbs,
-    rename_file, create_folder, search_files,
+    create_folder, search_files, stat_file, is_safe_file_name,
+    abort_multipart_upload,
+    complete_multipart_upload,
+    create_multipart_upload,
+    get_parts_count,
+    iter_file_chunks,
+)
+from src.storage import catalog
+from src.storage.changes import get_changes, get_head
+from src.storage.blobs import is_valid_sha256
+from src.storage.archives import iter_folder_archive, open_export
+from src.storage.jobs import get_job, submit_job
+from src.storage.listing_cache import get_page_etag
+from src.storage.notifications import enqueue_notification
+from src.storage.trash import get_trash_item, list_trash, restore_file, trash_file
+from src.storage.moves import check_move, get_renamed_path, move_file, rename_file
+from src.storage.quotas import check_quota, get_usage
+from src.storage.upload_sessions import (
+    abort_upload_session,
+    complete_upload_session,
+    get_upload_session,
+    initiate_upload_session,
+    list_session_parts,
+    upload_session_part,
+)
+from src.storage.upload_handlers import S3StreamedFile
+from src.storage.presigned import (
+    complete_direct_upload,
+    generate_download_url,
+    generate_upload_part_urls,
+    generate_upload_url,
+)
+from src.storage.ranges import (
+    content_range,
+    if_range_matches,
+    iter_multipart_byteranges,
+    multipart_length,
+    parse_range_header,
 )
 
-from .exceptions import FileUploadError
+from .exceptions import (
+    ChangeCursorExpiredError,
+    RestoreConflictError,
+    TrashItemNotFoundError,
+    QuotaExceededError,
+    FileUploadError,
+    FileDownloadError,
+    FileNotfoundError,
+    JobNotFoundError,
+    UploadPartError,
+    UploadSessionNotFoundError,
+)
 
 
 def index_view(request):
@@ -24,8 +84,12 @@ def index_view(request):
     user_id = request.user.id if request.user.is_authenticated else None
     path = request.GET.get("path", "")  # Получаем текущий путь, если есть
     path = path.rstrip("/") + "/" if path else "" # Обязательный / в конце
-    # Получение файлов и папок из MinIO
-    files = list_user_files(user_id, path) if user_id else []
+    cursor = request.GET.get("cursor") or None
+    # Получение одной страницы файлов и папок из MinIO
+    page = (list_user_files_page(user_id, path, cursor) if user_id
+            else {"files": [], "next_cursor": None})
+    usage = get_usage(user_id) if user_id else None
+    files = page["files"]
 
     # Генерация breadcrumbs
     breadcrumbs = generate_breadcrumbs(path) if user_id else []
@@ -33,7 +97,14 @@ def index_view(request):
     return render(request, "index.html", {
         "files": files,
         "breadcrumbs": breadcrumbs,
-        "current_path": path
+        "current_path": path,
+        "cursor": cursor,
+        "next_cursor": page["next_cursor"],
+        "direct_transfer": settings.STORAGE_DIRECT_TRANSFER,
+        "multipart_threshold": settings.STORAGE_MULTIPART_THRESHOLD,
+        "batch_upload_max_files": settings.STORAGE_BATCH_UPLOAD_MAX_FILES,
+        "dedup": settings.STORAGE_DEDUP,
+        "usage": usage,
     })
 
 
@@ -53,15 +124,324 @@ def upload_file_view(request):
     user_id = request.user.id
     file_name = file.name
     full_file_name = f"{current_path}{file_name}" if current_path else file_name
+    if isinstance(file, S3StreamedFile):
+        # Путь файла определён обработчиком загрузки до приёма содержимого
+        full_file_name = file.file_name
+    if not is_safe_file_name(full_file_name) or full_file_name.endswith("/"):
+        return JsonResponse({"error": "Некорректное имя файла"}, status=400)
     try:
+        check_quota(user_id, file.size, [full_file_name])
         upload_file(file, user_id, full_file_name)
         return JsonResponse({
             "message": f"Файл {file_name} загружен.",
             "file_url": full_file_name,
             "file_name": file_name
         }, status=201)
+    except QuotaExceededError as exc:
+        return JsonResponse({"error": str(exc)}, status=413)
+    except FileUploadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+
+@login_required
+@require_POST
+def upload_files_view(request):
+    """
+    Загрузка нескольких файлов или папки одним запросом.
+    Файлы передаются в поле ``files``, их пути относительно текущей
+    папки - в поле ``paths`` в том же порядке (без путей используются
+    имена файлов).
+    :param request:
+    :return: результат по каждому файлу; 207, если часть файлов
+    загрузить не удалось
+    """
+    current_path = request.POST.get("current_path", "")
+    files = request.FILES.getlist("files")
+    if not files:
+        return JsonResponse({"error": "Файлы не найдены"}, status=400)
+    paths = request.POST.getlist("paths")
+    if paths and len(paths) != len(files):
+        return JsonResponse({"error": "Количество путей не совпадает "
+                                      "с количеством файлов"}, status=400)
+
+    names = [f"{current_path}{name}"
+             for name in (paths or [file.name for file in files])]
+    try:
+        check_quota(request.user.id, sum(file.size for file in files), names)
+        results = upload_files(list(zip(names, files)), request.user.id)
+    except QuotaExceededError as exc:
+        return JsonResponse({"error": str(exc)}, status=413)
+    finally:
+        for file in files:
+            file.close()
+    status = 207 if any("error" in result for result in results) else 201
+    return JsonResponse({"results": results}, status=status)
+
+
+@login_required
+@require_POST
+def upload_instant_view(request):
+    """
+    Проверка перед загрузкой: есть ли в хранилище файл с таким SHA-256.
+    Если есть, файл сразу записывается пользователю без передачи
+    содержимого (201); иначе клиент загружает файл обычным способом.
+    :param request:
+    :return:
+    """
+    if not settings.STORAGE_DEDUP:
+        return JsonResponse({"exists": False})
+    data = json.loads(request.body)
+    file_name = data.get("file_name")
+    full_file_name = f"{data.get('current_path', '')}{file_name}"
+    size = data.get("size")
+    sha256 = str(data.get("sha256", "")).lower()
+    if (not file_name or not isinstance(size, int) or size < 0
+            or not is_valid_sha256(sha256)):
+        return JsonResponse({"error": "Некорректные данные"}, status=400)
+    if not is_safe_file_name(full_file_name) or full_file_name.endswith("/"):
+        return JsonResponse({"error": "Некорректное имя файла"}, status=400)
+
+    try:
+        check_quota(request.user.id, size, [full_file_name])
+    except QuotaExceededError as exc:
+        return JsonResponse({"error": str(exc)}, status=413)
+    content_type = mimetypes.guess_type(file_name)[0] or ""
+    if not upload_existing_blob(request.user.id, full_file_name, sha256,
+                                size, content_type):
+        return JsonResponse({"exists": False})
+    return JsonResponse({
+        "exists": True,
+        "message": f"Файл {file_name} загружен.",
+        "file_url": full_file_name,
+        "file_name": file_name
+    }, status=201)
+
+
+def get_session_data(session: dict) -> dict:
+    """
+    Данные сессии загрузки для клиента (без внутренних идентификаторов).
+    :param session:
+    :return:
+    """
+    return {
+        "session_id": session["session_id"],
+        "file_name": session["file_name"],
+        "size": session["size"],
+        "part_size": session["part_size"],
+        "parts_count": session["parts_count"],
+    }
+
+
+@login_required
+@require_POST
+def upload_session_create_view(request):
+    """
+    Начало возобновляемой загрузки файла по частям.
+    :param request:
+    :return:
+    """
+    data = json.loads(request.body)
+    file_name = data.get("file_name")
+    current_path = data.get("current_path", "")
+    size = data.get("size")
+    if not file_name or not isinstance(size, int) or size <= 0:
+        return JsonResponse({"error": "Некорректные данные"}, status=400)
+    full_file_name = f"{current_path}{file_name}"
+    if not is_safe_file_name(full_file_name):
+        return JsonResponse({"error": "Некорректное имя файла"}, status=400)
+    if get_parts_count(size, settings.STORAGE_MULTIPART_PART_SIZE) > 10000:
+        return JsonResponse({"error": "Файл слишком большой"}, status=400)
+
+    try:
+        check_quota(request.user.id, size, [full_file_name])
+        session = initiate_upload_session(request.user.id, full_file_name, size)
+    except QuotaExceededError as exc:
+        return JsonResponse({"error": str(exc)}, status=413)
+    except FileUploadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse(get_session_data(session), status=201)
+
+
+@login_required
+@require_http_methods(["GET", "DELETE"])
+def upload_session_view(request, session_id):
+    """
+    Состояние сессии загрузки (GET) или её отмена (DELETE).
+    GET возвращает части, которые уже получены хранилищем.
+    :param request:
+    :param session_id:
+    :return:
+    """
+    try:
+        session = get_upload_session(request.user.id, session_id)
+        if request.method == "DELETE":
+            abort_upload_session(session)
+            return JsonResponse({"success": True}, status=200)
+        parts = list_session_parts(session)
+    except UploadSessionNotFoundError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+    except FileUploadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse({
+        **get_session_data(session),
+        "parts": [
+            {"part_number": part["part_number"], "size": part["size"]}
+            for part in parts
+        ],
+    })
+
+
+@login_required
+@require_http_methods(["PUT"])
+def upload_session_part_view(request, session_id, part_number):
+    """
+    Загрузка одной части файла. Тело запроса - содержимое части.
+    :param request:
+    :param session_id:
+    :param part_number:
+    :return:
+    """
+    try:
+        session = get_upload_session(request.user.id, session_id)
+        # Читаем не больше размера части, чтобы не держать в памяти лишнее
+        data = request.read(session["part_size"] + 1)
+        etag = upload_session_part(session, part_number, data)
+    except UploadSessionNotFoundError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+    except UploadPartError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse({"part_number": part_number, "etag": etag})
+
+
+@login_required
+@require_POST
+def upload_session_complete_view(request, session_id):
+    """
+    Завершение возобновляемой загрузки: сборка файла из частей.
+    :param request:
+    :param session_id:
+    :return:
+    """
+    try:
+        session = get_upload_session(request.user.id, session_id)
+        file_name = complete_upload_session(session)
+    except UploadSessionNotFoundError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+    except (UploadPartError, FileUploadError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    base_name = file_name.split("/")[-1]
+    return JsonResponse({
+        "message": f"Файл {base_name} загружен.",
+        "file_url": file_name,
+        "file_name": base_name
+    }, status=201)
+
+
+@login_required
+@require_POST
+def presign_upload_view(request):
+    """
+    Подписанные ссылки для загрузки файла браузером напрямую в MinIO.
+    Небольшие файлы загружаются одним PUT, большие - по частям.
+    :param request:
+    :return:
+    """
+    if not settings.STORAGE_DIRECT_TRANSFER:
+        return JsonResponse({"error": "Прямая загрузка отключена"}, status=404)
+    data = json.loads(request.body)
+    file_name = data.get("file_name")
+    current_path = data.get("current_path", "")
+    size = data.get("size")
+    if not file_name or not isinstance(size, int) or size < 0:
+        return JsonResponse({"error": "Некорректные данные"}, status=400)
+    full_file_name = f"{current_path}{file_name}"
+    if not is_safe_file_name(full_file_name):
+        return JsonResponse({"error": "Некорректное имя файла"}, status=400)
+
+    user_id = request.user.id
+    try:
+        check_quota(user_id, size, [full_file_name])
+    except QuotaExceededError as exc:
+        return JsonResponse({"error": str(exc)}, status=413)
+    if size <= settings.STORAGE_MULTIPART_THRESHOLD:
+        return JsonResponse({
+            "file_name": full_file_name,
+            "url": generate_upload_url(user_id, full_file_name, size),
+        })
+
+    part_size = settings.STORAGE_MULTIPART_PART_SIZE
+    parts_count = get_parts_count(size, part_size)
+    if parts_count > 10000:
+        return JsonResponse({"error": "Файл слишком большой"}, status=400)
+    try:
+        upload_id = create_multipart_upload(user_id, full_file_name)
     except FileUploadError as exc:
         return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse({
+        "file_name": full_file_name,
+        "upload_id": upload_id,
+        "part_size": part_size,
+        "parts": generate_upload_part_urls(
+            user_id, full_file_name, upload_id,
+            list(range(1, parts_count + 1))
+        ),
+    })
+
+
+@login_required
+@require_POST
+def presign_complete_view(request):
+    """
+    Завершение прямой загрузки в MinIO: сборка составного объекта
+    и фиксация загруженного файла.
+    :param request:
+    :return:
+    """
+    data = json.loads(request.body)
+    file_name = data.get("file_name")
+    upload_id = data.get("upload_id")
+    parts = data.get("parts", [])
+    if not file_name or not is_safe_file_name(file_name):
+        return JsonResponse({"error": "Некорректное имя файла"}, status=400)
+
+    user_id = request.user.id
+    try:
+        if upload_id:
+            complete_multipart_upload(user_id, file_name, upload_id, parts)
+        complete_direct_upload(user_id, file_name)
+    except QuotaExceededError as exc:
+        return JsonResponse({"error": str(exc)}, status=413)
+    except (FileUploadError, FileDownloadError, FileNotfoundError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    base_name = file_name.split("/")[-1]
+    return JsonResponse({
+        "message": f"Файл {base_name} загружен.",
+        "file_url": file_name,
+        "file_name": base_name
+    }, status=201)
+
+
+@login_required
+@require_POST
+def presign_abort_view(request):
+    """
+    Отмена прямой составной загрузки в MinIO.
+    :param request:
+    :return:
+    """
+    data = json.loads(request.body)
+    file_name = data.get("file_name")
+    upload_id = data.get("upload_id")
+    if not file_name or not upload_id or not is_safe_file_name(file_name):
+        return JsonResponse({"error": "Некорректные данные"}, status=400)
+    try:
+        abort_multipart_upload(request.user.id, file_name, upload_id)
+    except FileUploadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse({"success": True}, status=200)
 
 
 @login_required
@@ -69,17 +449,275 @@ def upload_file_view(request):
 def download_file_view(request, file_name):
     """
     View for download files.
+    Файл отдаётся потоком прямо из MinIO, без промежуточного файла на диске.
+    Поддерживаются заголовки Range и If-Range: из MinIO читаются
+    только запрошенные клиентом диапазоны байт.
+    На условный запрос (If-None-Match, If-Modified-Since) с актуальной
+    версией файла отвечает 304 после одного head_object.
     :param request:
     :param file_name:
     :return:
     """
     user_id = request.user.id
-    file_path = download_file(user_id, file_name)
+    range_header = request.headers.get("Range")
+    try:
+        if settings.STORAGE_DIRECT_TRANSFER:
+            # Браузер скачивает файл из MinIO сам, минуя воркер Django
+            return redirect(generate_download_url(user_id, file_name))
+        if range_header or is_conditional_request(request):
+            stored_file = stat_file(user_id, file_name)
+            # Версия файла у клиента актуальна: хватает одного head_object
+            not_modified = get_not_modified_response(request, stored_file)
+            if not_modified is not None:
+                return not_modified
+        if range_header:
+            ranges = parse_range_header(range_header, stored_file["size"])
+            if ranges is not None and if_range_matches(
+                    request.headers.get("If-Range"),
+                    stored_file["etag"],
+                    stored_file["last_modified"]):
+                return build_partial_response(
+                    file_name, stored_file, ranges,
+                    lambda start, end: download_file(
+                        user_id, file_name,
+                        byte_range=(start, end),
+                        if_match=stored_file["etag"]
+                    )["body"]
+                )
+        stored_file = download_file(user_id, file_name)
+    except FileNotfoundError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+    except FileDownloadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return build_file_response(stored_file, file_name)
 
-    if file_path:
-        return FileResponse(open(file_path, "rb"), as_attachment=True)
 
-    return JsonResponse({"error": "Файл не найден."}, status=404)
+@login_required
+@require_GET
+def download_folder_view(request, folder):
+    """
+    Скачивание папки одним ZIP-архивом, который собирается на лету
+    и отдаётся потоком по мере чтения файлов из MinIO.
+    :param request:
+    :param folder: путь папки
+    :return:
+    """
+    folder = folder.rstrip("/")
+    if not is_safe_file_name(folder):
+        return JsonResponse({"error": "Некорректный путь папки"}, status=400)
+    if catalog.get_entry(request.user.id, folder + "/") is None:
+        return JsonResponse({"error": f"Папка '{folder}' не найдена"}, status=404)
+
+    response = StreamingHttpResponse(
+        iter_folder_archive(request.user.id, folder),
+        content_type="application/zip"
+    )
+    response["Content-Disposition"] = content_disposition_header(
+        True, os.path.basename(folder) + ".zip"
+    )
+    return response
+
+
+@login_required
+@require_POST
+def export_folder_view(request, folder):
+    """
+    Сборка ZIP-архива папки фоновой задачей. Готовый архив
+    скачивается по ссылке из результата задачи.
+    :param request:
+    :param folder: путь папки
+    :return:
+    """
+    folder = folder.rstrip("/")
+    if not is_safe_file_name(folder):
+        return JsonResponse({"error": "Некорректный путь папки"}, status=400)
+    if catalog.get_entry(request.user.id, folder + "/") is None:
+        return JsonResponse({"error": f"Папка '{folder}' не найдена"}, status=404)
+    return build_job_response(submit_job(request.user.id, "export",
+                                         {"folder": folder}))
+
+
+@login_required
+@require_GET
+def job_status_view(request, job_id):
+    """
+    Состояние фоновой задачи: ``status`` (queued, running, done, failed),
+    прогресс, результат или ошибка.
+    :param request:
+    :param job_id:
+    :return:
+    """
+    try:
+        job = get_job(request.user.id, job_id)
+    except JobNotFoundError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+    data = {key: job[key] for key in ("job_id", "kind", "status", "progress",
+                                      "result", "error", "attempts")}
+    if job["kind"] == "export" and job["status"] == "done":
+        data["download_url"] = reverse("job-download", args=[job_id])
+    return JsonResponse(data)
+
+
+@login_required
+@require_GET
+def job_download_view(request, job_id):
+    """
+    Скачивание архива папки, собранного фоновой задачей.
+    :param request:
+    :param job_id:
+    :return:
+    """
+    try:
+        job = get_job(request.user.id, job_id)
+    except JobNotFoundError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+    if job["kind"] != "export" or job["status"] != "done":
+        return JsonResponse({"error": "Архив ещё не готов"}, status=409)
+
+    try:
+        body = open_export(job["result"]["key"], settings.AWS_STORAGE_BUCKET_NAME)
+    except FileNotfoundError:
+        return JsonResponse({"error": "Срок хранения архива истёк, "
+                                      "соберите его заново"}, status=410)
+    except FileDownloadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    response = StreamingHttpResponse(iter_file_chunks(body),
+                                     content_type="application/zip")
+    response["Content-Length"] = job["result"]["size"]
+    response["Content-Disposition"] = content_disposition_header(
+        True, os.path.basename(job["params"]["folder"]) + ".zip"
+    )
+    return response
+
+
+def get_content_type(stored_file: dict, file_name: str) -> str:
+    """
+    Тип содержимого файла: по расширению или из метаданных MinIO.
+    :param stored_file:
+    :param file_name:
+    :return:
+    """
+    return (mimetypes.guess_type(file_name)[0]
+            or stored_file["content_type"]
+            or "application/octet-stream")
+
+
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since",
+                       "If-Match", "If-Unmodified-Since")
+
+
+def is_conditional_request(request) -> bool:
+    return any(header in request.headers for header in CONDITIONAL_HEADERS)
+
+
+def set_validators(response, etag: str | None, last_modified=None) -> None:
+    """
+    Заголовки для кэширования ответа в браузере: ETag, Last-Modified
+    и Cache-Control из STORAGE_CACHE_CONTROL.
+    :param response:
+    :param etag: ETag в кавычках
+    :param last_modified: время изменения (datetime)
+    :return:
+    """
+    if etag:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    response["Cache-Control"] = settings.STORAGE_CACHE_CONTROL
+
+
+def get_not_modified_response(request, stored_file: dict) -> HttpResponse | None:
+    """
+    Ответ на условный запрос файла по его метаданным в MinIO:
+    304 Not Modified при совпадении If-None-Match или If-Modified-Since,
+    412 Precondition Failed при несовпадении If-Match или If-Unmodified-Since.
+    :param request:
+    :param stored_file: метаданные файла (stat_file)
+    :return: ответ или None, если файл нужно отдать
+    """
+    last_modified = stored_file["last_modified"]
+    response = get_conditional_response(
+        request,
+        etag=stored_file["etag"],
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, stored_file["etag"], last_modified)
+    return response
+
+
+def build_file_response(stored_file: dict, file_name: str) -> StreamingHttpResponse:
+    """
+    Потоковый ответ с содержимым файла и заголовками для скачивания.
+    :param stored_file:
+    :param file_name:
+    :return:
+    """
+    base_name = os.path.basename(file_name.rstrip("/"))
+    response = StreamingHttpResponse(
+        stored_file["body"],
+        content_type=get_content_type(stored_file, base_name)
+    )
+    response["Content-Length"] = stored_file["size"]
+    response["Content-Disposition"] = content_disposition_header(
+        True, base_name
+    )
+    response["Accept-Ranges"] = "bytes"
+    set_validators(response, stored_file.get("etag"), stored_file.get("last_modified"))
+    return response
+
+
+def build_partial_response(
+        file_name: str,
+        stored_file: dict,
+        ranges: list[tuple[int, int]],
+        open_range,
+        iter_multipart=iter_multipart_byteranges
+) -> HttpResponse:
+    """
+    Ответ 206 Partial Content на запрос с заголовком Range.
+    Один диапазон отдаётся как есть, несколько - как multipart/byteranges.
+    Каждый диапазон читается из MinIO отдельным get_object(Range=...)
+    с проверкой ETag, чтобы части не оказались от разных версий файла.
+    :param file_name:
+    :param stored_file: метаданные файла
+    :param ranges: диапазоны байт (start, end) включительно
+    :param open_range: функция, открывающая поток диапазона (start, end)
+    :param iter_multipart: генератор тела multipart/byteranges
+    :return:
+    """
+    size = stored_file["size"]
+    if not ranges:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    base_name = os.path.basename(file_name.rstrip("/"))
+    content_type = get_content_type(stored_file, base_name)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(open_range(start, end),
+                                         content_type=content_type, status=206)
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = content_range(start, end, size)
+    else:
+        boundary = secrets.token_hex(16)
+        response = StreamingHttpResponse(
+            iter_multipart(ranges, boundary, content_type, size, open_range),
+            content_type=f"multipart/byteranges; boundary={boundary}",
+            status=206
+        )
+        response["Content-Length"] = multipart_length(
+            ranges, boundary, content_type, size
+        )
+    response["Content-Disposition"] = content_disposition_header(
+        True, base_name
+    )
+    response["Accept-Ranges"] = "bytes"
+    set_validators(response, stored_file.get("etag"), stored_file.get("last_modified"))
+    return response
 
 
 @login_required
@@ -87,19 +725,49 @@ def download_file_view(request, file_name):
 def delete_file_view(request, file_name):
     """
     View for delete files.
+    Файл или папка переносится в корзину: ответ не ждёт удаления
+    объектов из MinIO и не зависит от размера папки.
     :param request:
     :param file_name:
     :return:
     """
-    user_id = request.user.id
-    print("name:", file_name)
     try:
-        delete_file(user_id, file_name)
-        return JsonResponse({"success": True}, status=204)
+        items = trash_file(request.user.id, file_name)
     except PermissionDenied as exc:
         return JsonResponse({"error": str(exc)}, status=403)
     except Exception as exc:
         return JsonResponse({"error": str(exc)}, status=400)
+    if not items:
+        return JsonResponse({"error": f"Файл '{file_name}' не найден"}, status=404)
+    return JsonResponse({"items": items}, status=200)
+
+
+def build_job_response(job: dict) -> JsonResponse:
+    """
+    Ответ 202 с задачей, состояние которой клиент опрашивает по ``status_url``.
+    :param job:
+    :return:
+    """
+    return JsonResponse({
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": reverse("job-status", args=[job["job_id"]]),
+    }, status=202)
+
+
+def submit_move_job(user_id: int, file_name: str, new_file_name: str) -> JsonResponse:
+    """
+    Перенос папки фоновой задачей. Некорректный путь отклоняется сразу,
+    а не после попыток выполнить задачу.
+    :param user_id:
+    :param file_name:
+    :param new_file_name:
+    :return:
+    """
+    check_move(user_id, file_name, new_file_name)
+    return build_job_response(submit_job(
+        user_id, "move", {"file_name": file_name, "new_file_name": new_file_name}
+    ))
 
 
 @login_required
@@ -112,19 +780,182 @@ def rename_file_view(request):
         new_name = data.get("new_name")
         if not file_id or not new_name:
             return JsonResponse({"error": "Некорректные данные"}, status=400)
-        rename_file(file_id, new_name)
+        if "/" in new_name or new_name in (".", ".."):
+            return JsonResponse({"error": "Некорректное имя"}, status=400)
+        if file_id.endswith("/"):
+            return submit_move_job(request.user.id, file_id,
+                                   get_renamed_path(file_id, new_name))
+        rename_file(request.user.id, file_id, new_name)
         return JsonResponse({"message": "Файл успешно переименован!"}, status=200)
     except Exception as exc:
         return JsonResponse({"error": str(exc)}, status=400)
 
 
+@login_required
+@require_http_methods(["PATCH"])
+def move_file_view(request):
+    """
+    Перенос файла или папки в другую папку.
+    Ожидает JSON с ``file_id`` и ``target_path`` (пустая строка - корень).
+    """
+    try:
+        data = json.loads(request.body)
+        file_id = data.get("file_id")
+        target_path = data.get("target_path", "")
+        if not file_id or target_path is None:
+            return JsonResponse({"error": "Некорректные данные"}, status=400)
+        target_path = target_path.strip("/") + "/" if target_path.strip("/") else ""
+        base_name = file_id.rstrip("/").split("/")[-1]
+        new_file_name = target_path + base_name + ("/" if file_id.endswith("/") else "")
+        if file_id.endswith("/"):
+            return submit_move_job(request.user.id, file_id, new_file_name)
+        result = move_file(request.user.id, file_id, new_file_name)
+        return JsonResponse(result, status=207 if result["errors"] else 200)
+    except Exception as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+
 @login_required
 @require_http_methods(["GET"])
-def list_files_view(request, path):
-    """Вьюха для получения списка файлов пользователя"""
+def list_files_view(request, path=""):
+    """
+    Вьюха для получения списка файлов пользователя.
+    Список отдаётся постранично: курсор следующей страницы передаётся
+    в параметре ``cursor``, размер страницы - в ``limit``.
+    """
+    user_id = request.user.id
+    path = path.rstrip("/") + "/" if path else ""
+    cursor = request.GET.get("cursor") or None
+    try:
+        limit = int(request.GET.get("limit", settings.STORAGE_LIST_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "Некорректный размер страницы"},
+                            status=400)
+    limit = min(max(limit, 1), 1000)
+    page = list_user_files_page(user_id, path, cursor, limit)
+    # Страница берётся из кэша списков, поэтому ответ 304 на повторный
+    # запрос обходится без PostgreSQL и без передачи списка
+    etag = quote_etag(get_page_etag(page))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(page, status=200)
+    set_validators(response, etag)
+    return response
+
+
+@login_required
+@require_GET
+def trash_list_view(request):
+    """
+    Корзина пользователя постранично: id последней записи страницы
+    передаётся в параметре ``before`` следующего запроса.
+    :param request:
+    :return:
+    """
+    try:
+        before = request.GET.get("before")
+        before = int(before) if before else None
+        limit = int(request.GET.get("limit", settings.STORAGE_LIST_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "Некорректные параметры"}, status=400)
+    limit = min(max(limit, 1), 1000)
+    return JsonResponse(list_trash(request.user.id, before, limit))
+
+
+@login_required
+@require_POST
+def trash_restore_view(request, item_id):
+    """
+    Восстановление файла или папки из корзины по исходному пути.
+    :param request:
+    :param item_id:
+    :return:
+    """
+    try:
+        item = restore_file(request.user.id, item_id)
+    except TrashItemNotFoundError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+    except RestoreConflictError as exc:
+        return JsonResponse({"error": str(exc)}, status=409)
+    return JsonResponse(item)
+
+
+@login_required
+@require_http_methods(["DELETE"])
+def trash_purge_view(request, item_id):
+    """
+    Окончательное удаление записи корзины фоновой задачей.
+    :param request:
+    :param item_id:
+    :return:
+    """
+    try:
+        get_trash_item(request.user.id, item_id)
+    except TrashItemNotFoundError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+    return build_job_response(submit_job(request.user.id, "purge",
+                                         {"item_id": item_id}))
+
+
+@csrf_exempt
+@require_POST
+def notifications_view(request):
+    """
+    Webhook для уведомлений MinIO о событиях бакета. Уведомление только
+    ставится в очередь Redis - применяет его команда
+    ``consume_notifications``, поэтому MinIO получает ответ сразу.
+    MinIO передаёт токен (auth_token цели webhook) в заголовке
+    Authorization; без STORAGE_NOTIFY_TOKEN webhook отключён.
+    :param request:
+    :return:
+    """
+    token = settings.STORAGE_NOTIFY_TOKEN
+    authorization = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not token or not constant_time_compare(authorization, token):
+        return JsonResponse({"error": "Доступ запрещён"}, status=403)
+    try:
+        json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Некорректное уведомление"}, status=400)
+    enqueue_notification(request.body)
+    return HttpResponse(status=204)
+
+
+@login_required
+@require_GET
+def changes_view(request):
+    """
+    Журнал изменений для клиентов синхронизации.
+    Без ``since`` возвращает текущий курсор: клиент получает полный
+    список файлов один раз, а затем забирает только изменения после
+    курсора (``since``) страницами до ``limit`` записей, пока
+    ``has_more`` не станет false. Повторное применение записей
+    безопасно, поэтому изменения, сделанные во время полного обхода,
+    можно просто применить ещё раз. Если курсор старше журнала,
+    отвечает 410 - клиенту нужна полная синхронизация.
+    :param request:
+    :return:
+    """
     user_id = request.user.id
-    files = list_user_files(user_id, path) if user_id else []
-    return JsonResponse({"files": files}, status=200)
+    since = request.GET.get("since")
+    if since is None:
+        return JsonResponse({"changes": [], "cursor": str(get_head(user_id)),
+                             "has_more": False})
+    try:
+        since = int(since)
+        limit = int(request.GET.get("limit", settings.STORAGE_CHANGES_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "Некорректный курсор или размер страницы"},
+                            status=400)
+    if since < 0:
+        return JsonResponse({"error": "Некорректный курсор"}, status=400)
+    limit = min(max(limit, 1), 1000)
+    try:
+        page = get_changes(user_id, since, limit)
+    except ChangeCursorExpiredError as exc:
+        return JsonResponse({"error": str(exc), "cursor": str(get_head(user_id))},
+                            status=410)
+    return JsonResponse(page)
 
 
 @login_required
@@ -161,7 +992,26 @@ def search_view(request):
     if not query:
         return render(request, "search.html", {"files": [], "query": query})
 
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+
     user_id = request.user.id
-    files = search_files(user_id, query)
+    result = search_files(user_id, query, page)
+
+    return render(request, "search.html", {
+        "files": result["files"],
+        "query": query,
+        "page": page,
+        "has_next": result["has_next"],
+    })
 
-    return render(request, "search.html", {"files": files, "query": query})
\ No newline at end of file
+
+@require_GET
+def metrics_view(request):
+    """
+    Метрики приложения в формате Prometheus: запросы к MinIO
+    по операциям и итоги HTTP-запросов по маршрутам.
+    """
+    return HttpResponse(generate_latest(), content_type=CONTENT_TYPE_LATEST)
@@ -16,12 +16,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
-from src.storage.views import index_view, search_view
+from src.storage.views import index_view, metrics_view, search_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', index_view, name="home"),
     path('search/', search_view, name="file-search"),
+    path('metrics', metrics_view, name="metrics"),
     path('users/', include("src.users.urls")),
     path('storage/', include("src.storage.urls")),
 ]
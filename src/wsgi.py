@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'src.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+from src.storage.jobs import start_workers  # noqa: E402
+
+if settings.STORAGE_JOB_WORKERS:
+    # Фоновые задачи выполняются в потоках процесса приложения
+    start_workers()